@@ -0,0 +1,283 @@
+from collections import OrderedDict
+from jose import jwt, JWTError
+from starlette.concurrency import run_in_threadpool
+import asyncio
+import hashlib
+import httpx
+import importlib.util
+import json
+import os
+import time
+
+
+TOKEN_CACHE_TTL = int(os.getenv("TOKEN_CACHE_TTL", "300"))
+TOKEN_CACHE_NEGATIVE_TTL = int(os.getenv("TOKEN_CACHE_NEGATIVE_TTL", "10"))
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+
+# "graph" asks Microsoft Graph for every new token, "jwks" verifies the signature locally
+AUTH_MODE = os.getenv("AUTH_MODE", "graph")
+JWKS_URL = os.getenv("JWKS_URL")
+JWKS_FILE = os.getenv("JWKS_FILE")
+JWKS_REFRESH_INTERVAL = int(os.getenv("JWKS_REFRESH_INTERVAL", "60"))
+JWT_AUDIENCE = os.getenv("JWT_AUDIENCE")
+JWT_ISSUER = os.getenv("JWT_ISSUER")
+
+# outbound HTTP client shared by all requests of a worker
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "5"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3"))
+
+http_client = None
+
+
+def create_http_client():
+    """
+    Create the pooled client used for calls to the identity provider.
+
+    Connections are kept alive and reused, HTTP/2 is used if the h2 package
+    is installed. The pool and all timeouts are bounded, so a stalled
+    upstream fails requests quickly instead of piling up sockets.
+
+    Returns:
+        httpx.AsyncClient: The configured client.
+    """
+
+    return httpx.AsyncClient(
+        http2=importlib.util.find_spec("h2") is not None,
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT, pool=HTTP_CONNECT_TIMEOUT),
+    )
+
+
+def get_http_client():
+    """
+    Return the shared client, creating it if the lifespan hook has not run.
+
+    Returns:
+        httpx.AsyncClient: The application-wide client.
+    """
+
+    global http_client
+    if http_client is None:
+        http_client = create_http_client()
+    return http_client
+
+
+async def close_http_client():
+    global http_client
+    if http_client is not None:
+        await http_client.aclose()
+        http_client = None
+
+
+class TokenCache:
+    """
+    In-memory cache of token validation results.
+
+    Tokens are stored by their SHA-256 hash, never in plain text. A valid
+    token is kept until its exp claim or the TTL runs out, whichever comes
+    first; an invalid one only for the shorter negative TTL. The least
+    recently used entry is evicted once the cache is full.
+    """
+
+    def __init__(self, ttl: int = TOKEN_CACHE_TTL, negative_ttl: int = TOKEN_CACHE_NEGATIVE_TTL, max_size: int = TOKEN_CACHE_SIZE):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(token: str):
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    @staticmethod
+    def token_expiry(token: str):
+        """
+        Read the exp claim of a token without verifying it.
+
+        Args:
+            token (str): The bearer token.
+
+        Returns:
+            float | None: The expiry as unix timestamp, None if the token is no JWT or has no exp claim.
+        """
+
+        try:
+            exp = jwt.get_unverified_claims(token).get("exp")
+        except JWTError:
+            return None
+        return float(exp) if exp is not None else None
+
+    def get(self, token: str):
+        """
+        Look up the cached validation result of a token.
+
+        Args:
+            token (str): The bearer token.
+
+        Returns:
+            bool | None: The cached result, None if the token is not cached or the entry expired.
+        """
+
+        key = self.key(token)
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        valid, expires_at = entry
+        if expires_at <= time.time():
+            del self.entries[key]
+            self.evictions += 1
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return valid
+
+    def set(self, token: str, valid: bool):
+        """
+        Store the validation result of a token.
+
+        Args:
+            token (str): The bearer token.
+            valid (bool): Whether the identity provider accepted the token.
+        """
+
+        now = time.time()
+        expires_at = now + (self.ttl if valid else self.negative_ttl)
+        exp = self.token_expiry(token)
+        if exp is not None:
+            expires_at = min(expires_at, exp)
+        if expires_at <= now:
+            return
+        key = self.key(token)
+        self.entries[key] = (valid, expires_at)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class KeySetUnavailable(Exception):
+    """
+    Raised when the key set cannot be loaded, says nothing about the token.
+    """
+
+
+class JWKSKeySet:
+    """
+    JSON Web Key Set loaded from a file or URL and kept in memory.
+
+    The set is loaded on first use and reloaded when a token names a key id
+    that is not known yet, at most once per refresh interval so that tokens
+    with made-up key ids cannot hammer the key endpoint. Loads are single
+    flight: concurrent requests for an unknown key id wait for one fetch.
+    """
+
+    def __init__(self, url: str = JWKS_URL, path: str = JWKS_FILE, refresh_interval: int = JWKS_REFRESH_INTERVAL):
+        self.url = url
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self.keys = {}
+        self.loaded_at = None
+        self.lock = asyncio.Lock()
+
+    def may_reload(self):
+        return self.loaded_at is None or time.monotonic() - self.loaded_at >= self.refresh_interval
+
+    def read_file(self):
+        with open(self.path) as f:
+            return json.load(f)
+
+    async def fetch(self):
+        if self.path:
+            # file reads block, keep them off the event loop
+            return await run_in_threadpool(self.read_file)
+        response = await get_http_client().get(self.url)
+        response.raise_for_status()
+        return response.json()
+
+    async def load(self):
+        """
+        Replace the keys with a freshly fetched key set.
+
+        Raises:
+            KeySetUnavailable: If the file is missing or unreadable, or the key set is no valid JSON or lacks keys or key ids.
+            httpx.HTTPError: If the key endpoint cannot be reached or fails.
+        """
+
+        try:
+            data = await self.fetch()
+            keys = {key["kid"]: key for key in data["keys"]}
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            raise KeySetUnavailable(str(e)) from e
+        self.keys = keys
+        self.loaded_at = time.monotonic()
+
+    async def get_key(self, kid: str):
+        """
+        Look up a public key by its key id.
+
+        Args:
+            kid (str): The key id from the token header.
+
+        Returns:
+            dict | None: The JWK, None if the key set does not contain it.
+        """
+
+        if kid not in self.keys and self.may_reload():
+            async with self.lock:
+                # another request may have loaded the set while this one waited
+                if kid not in self.keys and self.may_reload():
+                    await self.load()
+        return self.keys.get(kid)
+
+    async def verify(self, token: str, audience: str, issuer: str):
+        """
+        Verify signature, audience, issuer and expiry of a token locally.
+
+        Args:
+            token (str): The bearer token.
+            audience (str): The expected aud claim.
+            issuer (str): The expected iss claim.
+
+        Returns:
+            bool: True if the token is valid.
+        """
+
+        try:
+            header = jwt.get_unverified_header(token)
+        except JWTError:
+            return False
+        key = await self.get_key(header.get("kid"))
+        if key is None:
+            return False
+        try:
+            jwt.decode(token, key, algorithms=[key.get("alg", "RS256")], audience=audience, issuer=issuer)
+        except JWTError:
+            return False
+        return True
+
+
+token_cache = TokenCache()
+jwks = JWKSKeySet()
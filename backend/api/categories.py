@@ -1,15 +1,22 @@
-from api.model import RecipeDB, UserDB, PreparationStepDB, IngredientDB, CategoryDB, RatingSchema, RecipeSchema, CategorySchema
+from api.model import RecipeDB, UserDB, PreparationStepDB, IngredientDB, CategoryDB, RatingSchema, RecipeSchema, CategorySchema, CategoryBulkResult
 from crud import crud
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi_pagination import Page
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.session import get_session
 import uuid
 import httpx
 import os
 from api.users import oauth2_scheme, validate_token
+from api.conditional import conditional, content_etag
 
 router = APIRouter()
 
+CategoryPage = Page[CategoryDB]
+
 @router.post("/categories/", response_model=CategoryDB, status_code=201)
-async def create_category(category: CategorySchema, token: str = Depends(oauth2_scheme)):
+async def create_category(category: CategorySchema, token: str = Depends(oauth2_scheme), session: AsyncSession = Depends(get_session)):
     """
     Create a new category in the database.
 
@@ -23,14 +30,33 @@ async def create_category(category: CategorySchema, token: str = Depends(oauth2_
     if not await validate_token(token):
         raise HTTPException(status_code=401, detail="Invalid token")
     
-    db_category = await crud.create_category(category)
+    db_category = await crud.create_category(session, category)
     if not db_category:
         raise HTTPException(status_code=409, detail="Category already exists")
     return db_category
 
 
+@router.post("/categories/bulk", response_model=CategoryBulkResult)
+async def create_categories(categories: list[CategorySchema], token: str = Depends(oauth2_scheme), session: AsyncSession = Depends(get_session)):
+    """
+    Create many categories at once, skipping the ones that already exist.
+
+    Args:
+        categories (list[Category]): The categories to create.
+
+    Returns:
+        dict: The created and the already existing categories.
+    """
+
+    if not await validate_token(token):
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    result = await crud.create_categories(session, categories)
+    return result
+
+
 @router.get("/categories/{category_id}", response_model=CategoryDB)
-async def read_category(category_id: uuid.UUID):
+async def read_category(category_id: uuid.UUID, session: AsyncSession = Depends(get_session)):
     """
     Retrieve a category by its category ID.
 
@@ -41,30 +67,40 @@ async def read_category(category_id: uuid.UUID):
         dict: The category data if found.
     """
 
-    db_category = await crud.get_category(category_id)
+    db_category = await crud.get_category(session, category_id)
     if not db_category:
         raise HTTPException(status_code=404, detail="Category not found")
     return db_category
 
 
-@router.get("/categories/", response_model=list[CategoryDB])
-async def read_categories(token: str = Depends(oauth2_scheme)):
+@router.get("/categories/", response_model=Page[CategoryDB])
+async def read_categories(request: Request, response: Response, name_prefix: Optional[str] = None, token: str = Depends(oauth2_scheme), session: AsyncSession = Depends(get_session)):
     """
-    Retrieve a list of categories from the database.
+    Retrieve a page of categories ordered by name.
+
+    The ETag is a hash of the page, a matching If-None-Match is answered
+    with 304 without sending it again.
+
+    Args:
+        name_prefix (str, optional): Only return categories whose name starts with this, ignoring case.
 
     Returns:
-        list[dict]: A list of category data.
+        Page[CategoryDB]: The requested page of categories.
     """
 
     if not await validate_token(token):
         raise HTTPException(status_code=401, detail="Invalid token")
     
-    db_categories = await crud.get_categories()
+    # the ETag is computed over the same fields the response contains
+    db_categories = CategoryPage.model_validate(await crud.get_categories(session, name_prefix), from_attributes=True)
+    not_modified = conditional(request, response, content_etag(db_categories))
+    if not_modified is not None:
+        return not_modified
     return db_categories
 
 
 @router.put("/categories/{category_id}", response_model=CategoryDB)
-async def update_category(category_id: uuid.UUID, category: CategorySchema, token: str = Depends(oauth2_scheme)):
+async def update_category(category_id: uuid.UUID, category: CategorySchema, token: str = Depends(oauth2_scheme), session: AsyncSession = Depends(get_session)):
     """
     Update a category in the database.
 
@@ -74,19 +110,26 @@ async def update_category(category_id: uuid.UUID, category: CategorySchema, toke
 
     Returns:
         Category: The updated category object.
+
+    Raises:
+        HTTPException: If the token is invalid (status code 401), the category does not exist (status code 404)
+            or another category has the name (status code 409).
     """
 
     if not await validate_token(token):
         raise HTTPException(status_code=401, detail="Invalid token")
     
-    db_category = await crud.update_category(category_id, category)
+    try:
+        db_category = await crud.update_category(session, category_id, category)
+    except ValueError:
+        raise HTTPException(status_code=409, detail="Category already exists")
     if not db_category:
         raise HTTPException(status_code=404, detail="Category not found")
     return db_category
 
 
 @router.delete("/categories/{category_id}", response_model=CategoryDB)
-async def delete_category(category_id: uuid.UUID, token: str = Depends(oauth2_scheme)):
+async def delete_category(category_id: uuid.UUID, token: str = Depends(oauth2_scheme), session: AsyncSession = Depends(get_session)):
     """
     Delete a category from the database.
 
@@ -100,14 +143,14 @@ async def delete_category(category_id: uuid.UUID, token: str = Depends(oauth2_sc
     if not await validate_token(token):
         raise HTTPException(status_code=401, detail="Invalid token")
     
-    db_category = await crud.delete_category(category_id)
+    db_category = await crud.delete_category(session, category_id)
     if not db_category:
         raise HTTPException(status_code=404, detail="Category not found")
     return db_category
 
 
 @router.get("/categories/{category_id}/recipes/", response_model=list[RecipeDB])
-async def read_category_recipes(category_id: uuid.UUID):
+async def read_category_recipes(category_id: uuid.UUID, session: AsyncSession = Depends(get_session)):
     """
     Retrieve a list of recipes for a category.
 
@@ -118,5 +161,5 @@ async def read_category_recipes(category_id: uuid.UUID):
         list[dict]: A list of recipes for the category.
     """
     
-    db_recipes = await crud.get_category_recipes(category_id)
+    db_recipes = await crud.get_category_recipes(session, category_id)
     return db_recipes
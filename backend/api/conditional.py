@@ -0,0 +1,89 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+import hashlib
+import json
+
+
+def version_etag(recipe_id, version: int):
+    return f'"{recipe_id}-{version}"'
+
+
+def content_etag(content):
+    """
+    Build a strong ETag from the JSON encoded content of a response.
+
+    Args:
+        content: The response data, encoded like the response body.
+
+    Returns:
+        str: The quoted ETag.
+    """
+
+    data = json.dumps(jsonable_encoder(content), sort_keys=True, separators=(",", ":"))
+    return '"' + hashlib.sha256(data.encode()).hexdigest()[:32] + '"'
+
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime = None):
+    """
+    Check the conditional headers of a GET request against the current state.
+
+    If-None-Match takes precedence, If-Modified-Since is only checked when the
+    client sent no ETag.
+
+    Args:
+        request (Request): The incoming request.
+        etag (str): The current ETag.
+        last_modified (datetime, optional): The time of the last change.
+
+    Returns:
+        bool: True if the client's copy is still current.
+    """
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        # HTTP dates have whole seconds
+        return since.tzinfo is not None and last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def cache_headers(etag: str, last_modified: datetime = None):
+    # no-cache: clients may store the response, but must revalidate it before use
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified.astimezone(timezone.utc), usegmt=True)
+    return headers
+
+
+def conditional(request: Request, response: Response, etag: str, last_modified: datetime = None):
+    """
+    Answer a conditional GET.
+
+    Returns a 304 response if the client's copy is current, otherwise sets
+    the validator headers on the response and returns None, so the route
+    goes on to build the body.
+
+    Args:
+        request (Request): The incoming request.
+        response (Response): The response of the route.
+        etag (str): The current ETag.
+        last_modified (datetime, optional): The time of the last change.
+
+    Returns:
+        Response | None: The 304 response, None if the body has to be sent.
+    """
+
+    headers = cache_headers(etag, last_modified)
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,38 @@
+from api.model import RecipeFullSchema
+from crud import crud
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from db.session import new_session
+import os
+from api.users import oauth2_scheme, validate_token
+
+router = APIRouter()
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+
+
+async def recipe_lines():
+    # the response outlives the request dependencies, so the stream opens its own session
+    session = new_session()
+    try:
+        async for recipes in crud.export_recipes(session, EXPORT_BATCH_SIZE):
+            yield "".join(RecipeFullSchema.model_validate(recipe).model_dump_json() + "\n" for recipe in recipes)
+    finally:
+        await session.close()
+
+
+@router.get("/export/recipes.ndjson")
+async def export_recipes(token: str = Depends(oauth2_scheme)):
+    """
+    Export all recipes with their preparation steps, ingredients, categories and ratings.
+
+    The response is streamed as newline delimited JSON, one recipe per line.
+
+    Returns:
+        StreamingResponse: The recipes in the format of RecipeFullSchema.
+    """
+
+    if not await validate_token(token):
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    return StreamingResponse(recipe_lines(), media_type="application/x-ndjson")
@@ -1,6 +1,10 @@
 from api.model import *
 from crud import crud
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi_pagination import Page
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.session import get_session
 import uuid
 import httpx
 import os
@@ -10,7 +14,7 @@ router = APIRouter()
 
 
 @router.post("/ingredients/", response_model=IngredientDB, status_code=201)
-async def create_ingredient(ingredient: IngredientSchema):
+async def create_ingredient(ingredient: IngredientSchema, session: AsyncSession = Depends(get_session)):
     """
     Create a new ingredient in the database.
 
@@ -21,14 +25,47 @@ async def create_ingredient(ingredient: IngredientSchema):
         Ingredient: The created ingredient object.
     """
 
-    db_ingredient = await crud.create_ingredient(ingredient)
+    db_ingredient = await crud.create_ingredient(session, ingredient)
     if not db_ingredient:
         raise HTTPException(status_code=409, detail="Ingredient already exists")
     return db_ingredient
 
 
+@router.post("/ingredients/bulk", response_model=IngredientBulkResult)
+async def create_ingredients(ingredients: list[IngredientSchema], session: AsyncSession = Depends(get_session)):
+    """
+    Create many ingredients at once, skipping the ones that already exist.
+
+    Args:
+        ingredients (list[Ingredient]): The ingredients to create.
+
+    Returns:
+        dict: The created and the already existing ingredients.
+    """
+
+    result = await crud.create_ingredients(session, ingredients)
+    return result
+
+
+@router.get("/ingredients/suggest", response_model=list[IngredientDB])
+async def suggest_ingredients(q: str = Query(..., min_length=1), limit: int = Query(10, ge=1, le=50), session: AsyncSession = Depends(get_session)):
+    """
+    Suggest ingredients for the text typed into the ingredient picker.
+
+    Args:
+        q (str): The typed text, matched against the start of the name and of each word in it.
+        limit (int): The maximum number of suggestions.
+
+    Returns:
+        list[dict]: The suggested ingredients, similar names if nothing starts with q.
+    """
+
+    suggestions = await crud.suggest_ingredients(session, q, limit)
+    return suggestions
+
+
 @router.get("/ingredients/{ingredient_id}", response_model=IngredientDB)
-async def read_ingredient(ingredient_id: uuid.UUID):
+async def read_ingredient(ingredient_id: uuid.UUID, session: AsyncSession = Depends(get_session)):
     """
     Retrieve an ingredient by its ingredient ID.
 
@@ -39,27 +76,30 @@ async def read_ingredient(ingredient_id: uuid.UUID):
         dict: The ingredient data if found.
     """
     
-    db_ingredient = await crud.get_ingredient(ingredient_id)
+    db_ingredient = await crud.get_ingredient(session, ingredient_id)
     if not db_ingredient:
         raise HTTPException(status_code=404, detail="Ingredient not found")
     return db_ingredient
 
 
-@router.get("/ingredients/", response_model=list[IngredientDB])
-async def read_ingredients():
+@router.get("/ingredients/", response_model=Page[IngredientDB])
+async def read_ingredients(name_prefix: Optional[str] = None, session: AsyncSession = Depends(get_session)):
     """
-    Retrieve a list of ingredients from the database.
+    Retrieve a page of ingredients ordered by name.
+
+    Args:
+        name_prefix (str, optional): Only return ingredients whose name starts with this, ignoring case.
 
     Returns:
-        list[dict]: A list of ingredient data.
+        Page[IngredientDB]: The requested page of ingredients.
     """
     
-    db_ingredients = await crud.get_ingredients()
+    db_ingredients = await crud.get_ingredients(session, name_prefix)
     return db_ingredients
 
 
 @router.put("/ingredients/{ingredient_id}", response_model=IngredientDB)
-async def update_ingredient(ingredient_id: uuid.UUID, ingredient: IngredientSchema):
+async def update_ingredient(ingredient_id: uuid.UUID, ingredient: IngredientSchema, session: AsyncSession = Depends(get_session)):
     """
     Update an ingredient in the database.
 
@@ -69,16 +109,22 @@ async def update_ingredient(ingredient_id: uuid.UUID, ingredient: IngredientSche
 
     Returns:
         Ingredient: The updated ingredient object.
+
+    Raises:
+        HTTPException: If the ingredient does not exist (status code 404) or another ingredient has the name (status code 409).
     """
     
-    db_ingredient = await crud.update_ingredient(ingredient_id, ingredient)
+    try:
+        db_ingredient = await crud.update_ingredient(session, ingredient_id, ingredient)
+    except ValueError:
+        raise HTTPException(status_code=409, detail="Ingredient already exists")
     if not db_ingredient:
         raise HTTPException(status_code=404, detail="Ingredient not found")
     return db_ingredient
 
 
 @router.delete("/ingredients/{ingredient_id}", response_model=IngredientDB)
-async def delete_ingredient(ingredient_id: uuid.UUID):
+async def delete_ingredient(ingredient_id: uuid.UUID, session: AsyncSession = Depends(get_session)):
     """
     Delete an ingredient from the database.
 
@@ -86,7 +132,7 @@ async def delete_ingredient(ingredient_id: uuid.UUID):
         ingredient_id (uuid.UUID): The unique identifier of the ingredient to delete.
     """
     
-    db_ingredient = await crud.delete_ingredient(ingredient_id)
+    db_ingredient = await crud.delete_ingredient(session, ingredient_id)
     if not db_ingredient:
         raise HTTPException(status_code=404, detail="Ingredient not found")
     return db_ingredient
\ No newline at end of file
@@ -1,16 +1,30 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+import os
 
+from db.session import dispose_engine
+from api.auth import get_http_client, close_http_client
+from api.responses import FastJSONResponse
 
-from db.session import metadata, engine
-
-from api import users, recipes, categories, ingredients, preparation_steps, ratings, units
+from api import users, recipes, categories, ingredients, preparation_steps, ratings, units, export
 from fastapi_pagination import add_pagination
 
-metadata.create_all(engine)
+# responses smaller than GZIP_MIN_SIZE bytes are sent uncompressed, 0 disables compression
+GZIP_MIN_SIZE = int(os.getenv("GZIP_MIN_SIZE", "1000"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    get_http_client()
+    yield
+    await close_http_client()
+    await dispose_engine()
 
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
 add_pagination(app)
 
 app.add_middleware(
@@ -20,6 +34,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+if GZIP_MIN_SIZE > 0:
+    app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_SIZE, compresslevel=GZIP_LEVEL)
 
 app.include_router(users.router, tags=["users"])
 app.include_router(recipes.router, tags=["recipes"])
@@ -28,3 +44,4 @@ app.include_router(ingredients.router, tags=["ingredients"])
 app.include_router(preparation_steps.router, tags=["preparation_steps"])
 app.include_router(ratings.router, tags=["ratings"])
 app.include_router(units.router, tags=["units"])
+app.include_router(export.router, tags=["export"])
@@ -1,7 +1,10 @@
 from pydantic import BaseModel
 from enum import Enum as pyenum
+from typing import Generic, Optional, TypeVar
 import uuid
 
+T = TypeVar("T")
+
 class Unit(str, pyenum):
     TL = "TL"
     EL = "EL"
@@ -35,6 +38,10 @@ class IngredientSchema(BaseModel):
 class IngredientDB(IngredientSchema):
     ingredientId: uuid.UUID
 
+class IngredientBulkResult(BaseModel):
+    created: list[IngredientDB]
+    existing: list[IngredientDB]
+
 class RecipeIngredientSchema(BaseModel):
     recipeId: uuid.UUID
     ingredientId: uuid.UUID
@@ -60,6 +67,10 @@ class CategorySchema(BaseModel):
 class CategoryDB(CategorySchema):
     categoryId: uuid.UUID
 
+class CategoryBulkResult(BaseModel):
+    created: list[CategoryDB]
+    existing: list[CategoryDB]
+
 class RecipeCategorySchema(BaseModel):
     recipeId: uuid.UUID
     categoryId: uuid.UUID
@@ -69,5 +80,38 @@ class PublicRecipeSchema(RecipeDB):
     ratingAmount: int
     userName: str
 
+class IngredientMatchRecipeSchema(PublicRecipeSchema):
+    matchedIngredients: int
+    missingIngredients: int
+
 class PublicRecipeIngredientSchema(RecipeIngredientSchema):
-    name: str
\ No newline at end of file
+    name: str
+
+class RecipeFullSchema(PublicRecipeSchema):
+    steps: list[PreparationStepDB]
+    ingredients: list[PublicRecipeIngredientSchema]
+    categories: list[CategoryDB]
+
+class RecipeStepSchema(BaseModel):
+    stepNumber: int
+    description: str
+
+class RecipeStepReplaceSchema(BaseModel):
+    # existing steps are identified by stepId, new ones have none
+    stepId: Optional[uuid.UUID] = None
+    description: str
+
+class RecipeIngredientItemSchema(BaseModel):
+    ingredientId: uuid.UUID
+    amount: int
+    unit: Unit
+
+class RecipeFullCreateSchema(RecipeSchema):
+    steps: list[RecipeStepSchema] = []
+    ingredients: list[RecipeIngredientItemSchema] = []
+    categoryIds: list[uuid.UUID] = []
+
+class CursorPage(BaseModel, Generic[T]):
+    items: list[T]
+    size: int
+    nextCursor: Optional[str] = None
@@ -1,6 +1,9 @@
 from api.model import PreparationStepDB, PreparationStepSchema
 from crud import crud
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi_pagination import Page
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.session import get_session
 import uuid
 import httpx
 import os
@@ -10,7 +13,7 @@ router = APIRouter()
 
 
 @router.post("/preparation_steps/", response_model=PreparationStepDB, status_code=201)
-async def create_preparation_step(preparation_step: PreparationStepSchema):
+async def create_preparation_step(preparation_step: PreparationStepSchema, session: AsyncSession = Depends(get_session)):
     """
     Create a new preparation step in the database.
 
@@ -19,14 +22,22 @@ async def create_preparation_step(preparation_step: PreparationStepSchema):
 
     Returns:
         PreparationStep: The created preparation step object.
+
+    Raises:
+        HTTPException: If the recipe does not exist or already has a step with this number.
     """
     
-    db_preparation_step = await crud.create_preparation_step(preparation_step)
+    try:
+        db_preparation_step = await crud.create_preparation_step(session, preparation_step)
+    except LookupError:
+        raise HTTPException(status_code=404, detail="Recipe not found")
+    if db_preparation_step is None:
+        raise HTTPException(status_code=409, detail="Step number already used")
     return db_preparation_step
 
 
 @router.get("/preparation_steps/{preparation_step_id}", response_model=PreparationStepDB)
-async def read_preparation_step(preparation_step_id: uuid.UUID):
+async def read_preparation_step(preparation_step_id: uuid.UUID, session: AsyncSession = Depends(get_session)):
     """
     Retrieve a preparation step by its preparation step ID.
 
@@ -37,27 +48,27 @@ async def read_preparation_step(preparation_step_id: uuid.UUID):
         dict: The preparation step data if found.
     """
     
-    db_preparation_step = await crud.get_preparation_step(preparation_step_id)
+    db_preparation_step = await crud.get_preparation_step(session, preparation_step_id)
     if db_preparation_step is None:
         raise HTTPException(status_code=404, detail="Preparation step not found")
     return db_preparation_step
 
 
-@router.get("/preparation_steps/", response_model=list[PreparationStepDB])
-async def read_preparation_steps():
+@router.get("/preparation_steps/", response_model=Page[PreparationStepDB])
+async def read_preparation_steps(session: AsyncSession = Depends(get_session)):
     """
-    Retrieve a list of preparation steps from the database.
+    Retrieve a page of preparation steps, ordered by recipe and step number.
 
     Returns:
-        list[dict]: A list of preparation step data.
+        Page[PreparationStepDB]: The requested page of preparation steps.
     """
     
-    db_preparation_steps = await crud.get_preparation_steps()
+    db_preparation_steps = await crud.get_preparation_steps(session)
     return db_preparation_steps
 
 
 @router.put("/preparation_steps/{preparation_step_id}", response_model=PreparationStepDB)
-async def update_preparation_step(preparation_step_id: uuid.UUID, preparation_step: PreparationStepSchema):
+async def update_preparation_step(preparation_step_id: uuid.UUID, preparation_step: PreparationStepSchema, session: AsyncSession = Depends(get_session)):
     """
     Update a preparation step in the database.
 
@@ -67,16 +78,24 @@ async def update_preparation_step(preparation_step_id: uuid.UUID, preparation_st
 
     Returns:
         PreparationStep: The updated preparation step object.
+
+    Raises:
+        HTTPException: If the step or its new recipe does not exist, or its new number is already used.
     """
     
-    db_preparation_step = await crud.update_preparation_step(preparation_step_id, preparation_step)
+    try:
+        db_preparation_step = await crud.update_preparation_step(session, preparation_step_id, preparation_step)
+    except LookupError:
+        raise HTTPException(status_code=404, detail="Recipe not found")
+    except ValueError:
+        raise HTTPException(status_code=409, detail="Step number already used")
     if db_preparation_step is None:
         raise HTTPException(status_code=404, detail="Preparation step not found")
     return db_preparation_step
 
 
 @router.delete("/preparation_steps/{preparation_step_id}", response_model=PreparationStepDB)
-async def delete_preparation_step(preparation_step_id: uuid.UUID):
+async def delete_preparation_step(preparation_step_id: uuid.UUID, session: AsyncSession = Depends(get_session)):
     """
     Delete a preparation step from the database.
 
@@ -87,7 +106,7 @@ async def delete_preparation_step(preparation_step_id: uuid.UUID):
         PreparationStep: The deleted preparation step object.
     """
     
-    db_preparation_step = await crud.delete_preparation_step(preparation_step_id)
+    db_preparation_step = await crud.delete_preparation_step(session, preparation_step_id)
     if db_preparation_step is None:
         raise HTTPException(status_code=404, detail="Preparation step not found")
     return db_preparation_step
\ No newline at end of file
@@ -1,6 +1,9 @@
 from api.model import RatingSchema
 from crud import crud
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi_pagination import Page
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.session import get_session
 import uuid
 import httpx
 import os
@@ -9,7 +12,7 @@ from api.users import oauth2_scheme, validate_token
 router = APIRouter()
 
 @router.post("/ratings/", response_model=RatingSchema, status_code=201)
-async def create_rating(rating: RatingSchema):
+async def create_rating(rating: RatingSchema, session: AsyncSession = Depends(get_session)):
     """
     Create a new rating in the database.
 
@@ -20,12 +23,12 @@ async def create_rating(rating: RatingSchema):
         Rating: The created rating object.
     """
     
-    db_rating = await crud.create_rating(rating)
+    db_rating = await crud.create_rating(session, rating)
     return db_rating
 
 
 @router.get("/ratings/{recipeId}/{userId}", response_model=RatingSchema)
-async def read_rating(recipeId: uuid.UUID, userId: str):
+async def read_rating(recipeId: uuid.UUID, userId: str, session: AsyncSession = Depends(get_session)):
     """
     Retrieve a rating by its rating ID.
 
@@ -36,26 +39,26 @@ async def read_rating(recipeId: uuid.UUID, userId: str):
         dict: The rating data if found.
     """
     
-    db_rating = await crud.get_rating(recipeId, userId)
+    db_rating = await crud.get_rating(session, recipeId, userId)
     if db_rating is None:
         raise HTTPException(status_code=404, detail="Rating not found")
     return db_rating
 
 
-@router.get("/ratings/", response_model=list[RatingSchema])
-async def read_ratings():
+@router.get("/ratings/", response_model=Page[RatingSchema])
+async def read_ratings(session: AsyncSession = Depends(get_session)):
     """
-    Retrieve a list of ratings from the database.
+    Retrieve a page of ratings, ordered by recipe and user.
 
     Returns:
-        list[dict]: A list of rating data.
+        Page[RatingSchema]: The requested page of ratings.
     """
     
-    db_ratings = await crud.get_ratings()
+    db_ratings = await crud.get_ratings(session)
     return db_ratings
 
 @router.put("/ratings/{recipeId}/{userId}", response_model=RatingSchema)
-async def update_rating(recipeId: uuid.UUID, userId: str, rating: RatingSchema):
+async def update_rating(recipeId: uuid.UUID, userId: str, rating: RatingSchema, session: AsyncSession = Depends(get_session)):
     """
     Update a rating in the database.
 
@@ -68,14 +71,14 @@ async def update_rating(recipeId: uuid.UUID, userId: str, rating: RatingSchema):
         Rating: The updated rating object.
     """
     
-    db_rating = await crud.update_rating(recipeId, userId, rating)
+    db_rating = await crud.update_rating(session, recipeId, userId, rating)
     if db_rating is None:
         raise HTTPException(status_code=404, detail="Rating not found")
     return db_rating
 
 
 @router.delete("/ratings/{recipeId}/{userId}", response_model=RatingSchema)
-async def delete_rating(recipeId: uuid.UUID, userId: str):
+async def delete_rating(recipeId: uuid.UUID, userId: str, session: AsyncSession = Depends(get_session)):
     """
     Delete a rating from the database.
     
@@ -87,7 +90,7 @@ async def delete_rating(recipeId: uuid.UUID, userId: str):
         Rating: The deleted rating object.
     """
 
-    db_rating = await crud.delete_rating(recipeId, userId)
+    db_rating = await crud.delete_rating(session, recipeId, userId)
     if db_rating is None:
         raise HTTPException(status_code=404, detail="Rating not found")
     return db_rating
\ No newline at end of file
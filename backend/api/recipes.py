@@ -1,19 +1,42 @@
-from api.model import RecipeDB, UserDB, PreparationStepDB, IngredientDB, CategoryDB, RatingSchema, RecipeSchema, RecipeIngredientSchema, Unit, PublicRecipeSchema, PublicRecipeIngredientSchema
+from api.model import RecipeDB, UserDB, PreparationStepDB, IngredientDB, CategoryDB, RatingSchema, RecipeSchema, RecipeIngredientSchema, Unit, PublicRecipeSchema, PublicRecipeIngredientSchema, CursorPage, IngredientMatchRecipeSchema, RecipeFullSchema, RecipeFullCreateSchema, RecipeStepReplaceSchema
 from crud import crud
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.session import get_session
 import uuid
 import httpx
 import os
 from fastapi.security import OAuth2PasswordBearer
 from api.users import oauth2_scheme, validate_token
-from fastapi_pagination import Page
+from api.conditional import conditional, version_etag
+from fastapi_pagination import Page, pagination_ctx
+from fastapi_pagination.api import resolve_params
+from typing import Literal, Optional, Union
 
 
 router = APIRouter()
 
 
+async def check_recipe_version(session: AsyncSession, recipe_id: uuid.UUID, request: Request, response: Response):
+    """
+    Validate a conditional request against the version of a recipe.
+
+    Returns:
+        tuple: The current version, which the body has to be read at, and a
+            304 response if the client's copy is current, None otherwise.
+
+    Raises:
+        HTTPException: If the recipe does not exist.
+    """
+
+    version = await crud.get_recipe_version(session, recipe_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Recipe not found")
+    return version.version, conditional(request, response, version_etag(recipe_id, version.version), version.updatedAt)
+
+
 @router.post("/recipes/", response_model=RecipeDB, status_code=201)
-async def create_recipe(recipe: RecipeSchema):
+async def create_recipe(recipe: RecipeSchema, session: AsyncSession = Depends(get_session)):
     """
     Create a new recipe in the database.
 
@@ -24,14 +47,78 @@ async def create_recipe(recipe: RecipeSchema):
         Recipe: The created recipe object.
     """
 
-    db_recipe = await crud.create_recipe(recipe)
+    db_recipe = await crud.create_recipe(session, recipe)
+    return db_recipe
+
+@router.post("/recipes/full", response_model=RecipeFullSchema, status_code=201)
+async def create_recipe_full(recipe: RecipeFullCreateSchema, session: AsyncSession = Depends(get_session)):
+    """
+    Create a recipe with its preparation steps, ingredients and categories in one transaction.
+
+    Args:
+        recipe (RecipeFullCreateSchema): The recipe details with steps, ingredients and category IDs.
+
+    Returns:
+        dict: The created recipe with all its details.
+
+    Raises:
+        HTTPException: If a step number is given twice, or an ingredient or category does not exist or is given twice.
+    """
+
+    step_numbers = [step.stepNumber for step in recipe.steps]
+    if len(set(step_numbers)) != len(step_numbers):
+        raise HTTPException(status_code=400, detail="Duplicate step numbers")
+    db_recipe = await crud.create_recipe_full(session, recipe)
+    if db_recipe is None:
+        raise HTTPException(status_code=400, detail="Invalid ingredients or categories")
     return db_recipe
 
+@router.get("/recipes/search", response_model=Page[PublicRecipeSchema])
+async def search_recipes(q: str, session: AsyncSession = Depends(get_session)):
+    """
+    Full-text search over recipe titles, descriptions and preparation steps.
+
+    Args:
+        q (str): The search terms, German words are matched by their stem. Supports "quoted phrases", or and -exclusion.
+
+    Returns:
+        Page[PublicRecipeSchema]: The matching recipes, best match first.
+    """
+
+    db_recipes = await crud.search_public_recipes(session, q)
+    return db_recipes
+
+
+@router.get("/recipes/by-ingredients", response_model=Page[IngredientMatchRecipeSchema])
+async def read_recipes_by_ingredients(have: list[uuid.UUID] = Query([]), max_missing: Optional[int] = Query(None, ge=0), session: AsyncSession = Depends(get_session)):
+    """
+    Find recipes that can be cooked with the available ingredients.
+
+    Args:
+        have (list[uuid.UUID]): The IDs of the available ingredients, repeat the parameter for each one.
+        max_missing (int, optional): The maximum number of ingredients a recipe may be missing.
+
+    Returns:
+        Page[IngredientMatchRecipeSchema]: The recipes with the fewest missing ingredients first.
+
+    Raises:
+        HTTPException: If no ingredient is given.
+    """
+
+    if not have:
+        raise HTTPException(status_code=400, detail="No ingredients given")
+    db_recipes = await crud.get_public_recipes_by_ingredients(session, have, max_missing)
+    return db_recipes
+
+
 @router.get("/recipes/{recipe_id}", response_model=PublicRecipeSchema)
-async def read_recipe(recipe_id: uuid.UUID):
+async def read_recipe(recipe_id: uuid.UUID, request: Request, response: Response, session: AsyncSession = Depends(get_session)):
     """
     Retrieve a recipe by its recipe ID.
 
+    Sends an ETag and Last-Modified, a matching If-None-Match or
+    If-Modified-Since is answered with 304 without loading the recipe.
+
     Args:
         recipe_id (uuid.UUID): The unique identifier of the recipe to retrieve.
 
@@ -39,30 +126,64 @@ async def read_recipe(recipe_id: uuid.UUID):
         dict: The recipe data if found.
     """
 
-    db_recipe = await crud.get_recipe(recipe_id)
+    version, not_modified = await check_recipe_version(session, recipe_id, request, response)
+    if not_modified is not None:
+        return not_modified
+    db_recipe = await crud.get_recipe(session, recipe_id, version)
+    if db_recipe is None:
+        raise HTTPException(status_code=404, detail="Recipe not found")
+    return db_recipe
+
+
+@router.get("/recipes/{recipe_id}/full", response_model=RecipeFullSchema)
+async def read_recipe_full(recipe_id: uuid.UUID, session: AsyncSession = Depends(get_session)):
+    """
+    Retrieve a recipe with its preparation steps, ingredients and categories.
+
+    Args:
+        recipe_id (uuid.UUID): The unique identifier of the recipe to retrieve.
+
+    Returns:
+        dict: The recipe with all its details.
+
+    Raises:
+        HTTPException: If the recipe is not found.
+    """
+
+    db_recipe = await crud.get_recipe_full(session, recipe_id)
     if db_recipe is None:
         raise HTTPException(status_code=404, detail="Recipe not found")
     return db_recipe
 
 
-@router.get("/recipes/", response_model=Page[RecipeDB])
-async def read_recipes():
+@router.get("/recipes/", response_model=Union[Page[RecipeDB], CursorPage[RecipeDB]], dependencies=[Depends(pagination_ctx(Page[RecipeDB]))])
+async def read_recipes(cursor: Optional[str] = None, session: AsyncSession = Depends(get_session)):
     """
     Retrieve a list of recipes from the database.
 
     Args:
-        token (str): The OAuth2 token used for authentication.
+        cursor (str, optional): Switches to keyset pagination ordered by title. Empty for the first page,
+            afterwards the nextCursor of the previous page.
+
+    Raises:
+        HTTPException: If the cursor is invalid (status code 400).
 
     Returns:
-        list[dict]: A list of recipe data.
+        Page | CursorPage: A page of recipe data.
     """
-   
-    db_recipes = await crud.get_recipes()
+
+    if cursor is not None:
+        try:
+            return await crud.get_recipes_cursor(session, cursor, resolve_params().size)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    db_recipes = await crud.get_recipes(session)
     return db_recipes
 
 
 @router.put("/recipes/{recipe_id}", response_model=RecipeDB)
-async def update_recipe(recipe_id: uuid.UUID, recipe: RecipeDB, token: str = Depends(oauth2_scheme)):
+async def update_recipe(recipe_id: uuid.UUID, recipe: RecipeDB, token: str = Depends(oauth2_scheme), session: AsyncSession = Depends(get_session)):
     """
     Update a recipe in the database.
 
@@ -77,14 +198,14 @@ async def update_recipe(recipe_id: uuid.UUID, recipe: RecipeDB, token: str = Dep
     if not await validate_token(token):
         raise HTTPException(status_code=401, detail="Invalid token")
 
-    db_recipe = await crud.update_recipe(recipe_id, recipe)
+    db_recipe = await crud.update_recipe(session, recipe_id, recipe)
     if db_recipe is None:
         raise HTTPException(status_code=404, detail="Recipe not found")
     return db_recipe
 
 
 @router.delete("/recipes/{recipe_id}", response_model=RecipeDB)
-async def delete_recipe(recipe_id: uuid.UUID, token: str = Depends(oauth2_scheme)):
+async def delete_recipe(recipe_id: uuid.UUID, token: str = Depends(oauth2_scheme), session: AsyncSession = Depends(get_session)):
     """
     Delete a recipe from the database.
 
@@ -98,46 +219,99 @@ async def delete_recipe(recipe_id: uuid.UUID, token: str = Depends(oauth2_scheme
     if not await validate_token(token):
         raise HTTPException(status_code=401, detail="Invalid token")
     
-    db_recipe = await crud.delete_recipe(recipe_id)
+    db_recipe = await crud.delete_recipe(session, recipe_id)
     if db_recipe is None:
         raise HTTPException(status_code=404, detail="Recipe not found")
     return db_recipe
 
 
 @router.get("/recipes/{recipe_id}/preparation_steps/", response_model=list[PreparationStepDB])
-async def read_preparation_steps(recipe_id: uuid.UUID):
+async def read_preparation_steps(recipe_id: uuid.UUID, request: Request, response: Response, session: AsyncSession = Depends(get_session)):
     """
     Retrieve a list of preparation steps for a recipe.
 
+    Supports conditional requests like GET /recipes/{recipe_id}.
+
     Args:
         recipe_id (uuid.UUID): The unique identifier of the recipe to retrieve steps for.
 
     Returns:
         list[dict]: A list of preparation steps for the recipe.
+
+    Raises:
+        HTTPException: If the recipe does not exist.
     """
 
-    db_steps = await crud.get_recipe_preparation_steps(recipe_id)
+    _, not_modified = await check_recipe_version(session, recipe_id, request, response)
+    if not_modified is not None:
+        return not_modified
+    db_steps = await crud.get_recipe_preparation_steps(session, recipe_id)
+    if db_steps is None:
+        raise HTTPException(status_code=404, detail="Recipe not found")
+    return db_steps
+
+
+@router.put("/recipes/{recipe_id}/preparation_steps/", response_model=list[PreparationStepDB])
+async def replace_preparation_steps(recipe_id: uuid.UUID, steps: list[RecipeStepReplaceSchema], token: str = Depends(oauth2_scheme), session: AsyncSession = Depends(get_session)):
+    """
+    Replace the preparation steps of a recipe in one transaction.
+
+    Args:
+        recipe_id (uuid.UUID): The unique identifier of the recipe.
+        steps (list[RecipeStepReplaceSchema]): All steps in their new order. Steps with a stepId are kept and
+            updated, steps without one are created, steps left out are deleted. They are numbered from 1.
+
+    Returns:
+        list[dict]: The preparation steps of the recipe after the change.
+
+    Raises:
+        HTTPException: If the token is invalid, the recipe does not exist, or a stepId is given twice or is not one of its steps.
+    """
+
+    if not await validate_token(token):
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    step_ids = [step.stepId for step in steps if step.stepId is not None]
+    if len(set(step_ids)) != len(step_ids):
+        raise HTTPException(status_code=400, detail="Duplicate preparation steps")
+
+    try:
+        db_steps = await crud.replace_recipe_steps(session, recipe_id, steps)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Unknown preparation steps")
+    if db_steps is None:
+        raise HTTPException(status_code=404, detail="Recipe not found")
     return db_steps
 
 
 @router.get("/recipes/{recipe_id}/ingredients/", response_model=list[PublicRecipeIngredientSchema])
-async def read_ingredients(recipe_id: uuid.UUID):
+async def read_ingredients(recipe_id: uuid.UUID, request: Request, response: Response, session: AsyncSession = Depends(get_session)):
     """
     Retrieve a list of ingredients for a recipe.
 
+    Supports conditional requests like GET /recipes/{recipe_id}.
+
     Args:
         recipe_id (uuid.UUID): The unique identifier of the recipe to retrieve ingredients for.
 
     Returns:
         list[dict]: A list of ingredients for the recipe.
+
+    Raises:
+        HTTPException: If the recipe does not exist.
     """
 
-    db_ingredients = await crud.get_recipe_ingredients(recipe_id)
+    version, not_modified = await check_recipe_version(session, recipe_id, request, response)
+    if not_modified is not None:
+        return not_modified
+    db_ingredients = await crud.get_recipe_ingredients(session, recipe_id, version)
+    if db_ingredients is None:
+        raise HTTPException(status_code=404, detail="Recipe not found")
     return db_ingredients
 
 
 @router.get("/recipes/{recipe_id}/categories/", response_model=list[CategoryDB])
-async def read_categories(recipe_id: uuid.UUID, token: str = Depends(oauth2_scheme)):
+async def read_categories(recipe_id: uuid.UUID, token: str = Depends(oauth2_scheme), session: AsyncSession = Depends(get_session)):
     """
     Retrieve a list of categories for a recipe.
 
@@ -151,12 +325,12 @@ async def read_categories(recipe_id: uuid.UUID, token: str = Depends(oauth2_sche
     if not await validate_token(token):
         raise HTTPException(status_code=401, detail="Invalid token")
     
-    db_categories = await crud.get_recipe_categories(recipe_id)
+    db_categories = await crud.get_recipe_categories(session, recipe_id)
     return db_categories
 
 
 @router.get("/recipes/{recipe_id}/ratings/", response_model=list[RatingSchema])
-async def read_ratings(recipe_id: uuid.UUID, token: str = Depends(oauth2_scheme)):
+async def read_ratings(recipe_id: uuid.UUID, token: str = Depends(oauth2_scheme), session: AsyncSession = Depends(get_session)):
     """
     Retrieve a list of ratings for a recipe.
 
@@ -170,12 +344,12 @@ async def read_ratings(recipe_id: uuid.UUID, token: str = Depends(oauth2_scheme)
     if not await validate_token(token):
         raise HTTPException(status_code=401, detail="Invalid token")
     
-    db_ratings = await crud.get_recipe_ratings(recipe_id)
+    db_ratings = await crud.get_recipe_ratings(session, recipe_id)
     return db_ratings
 
 
 @router.get("/recipes/{recipe_id}/user/", response_model=UserDB)
-async def read_user(recipe_id: uuid.UUID, token: str = Depends(oauth2_scheme)):
+async def read_user(recipe_id: uuid.UUID, token: str = Depends(oauth2_scheme), session: AsyncSession = Depends(get_session)):
     """
     Retrieve the user associated with a recipe.
 
@@ -189,12 +363,12 @@ async def read_user(recipe_id: uuid.UUID, token: str = Depends(oauth2_scheme)):
     if not await validate_token(token):
         raise HTTPException(status_code=401, detail="Invalid token")
     
-    db_user = await crud.get_recipe_user(recipe_id)
+    db_user = await crud.get_recipe_user(session, recipe_id)
     return db_user
 
 
 @router.post("/recipes/{recipe_id}/category/{category_id}")
-async def add_recipe_to_category(recipe_id: uuid.UUID, category_id: uuid.UUID):
+async def add_recipe_to_category(recipe_id: uuid.UUID, category_id: uuid.UUID, session: AsyncSession = Depends(get_session)):
     """
     Add a recipe to a category.
 
@@ -206,12 +380,12 @@ async def add_recipe_to_category(recipe_id: uuid.UUID, category_id: uuid.UUID):
         dict: The updated recipe object.
     """
 
-    db_recipe = await crud.add_recipe_to_category(recipe_id, category_id)
+    db_recipe = await crud.add_recipe_to_category(session, recipe_id, category_id)
     return db_recipe
 
 
 @router.delete("/recipes/{recipe_id}/category/{category_id}")
-async def remove_recipe_from_category(recipe_id: uuid.UUID, category_id: uuid.UUID, token: str = Depends(oauth2_scheme)):
+async def remove_recipe_from_category(recipe_id: uuid.UUID, category_id: uuid.UUID, token: str = Depends(oauth2_scheme), session: AsyncSession = Depends(get_session)):
     """
     Remove a recipe from a category.
 
@@ -226,12 +400,12 @@ async def remove_recipe_from_category(recipe_id: uuid.UUID, category_id: uuid.UU
     if not await validate_token(token):
         raise HTTPException(status_code=401, detail="Invalid token")
 
-    db_recipe = await crud.remove_recipe_from_category(recipe_id, category_id)
+    db_recipe = await crud.remove_recipe_from_category(session, recipe_id, category_id)
     return db_recipe
 
 
 @router.post("/recipes/{recipe_id}/ingredient/{ingredientId}")
-async def add_recipe_ingredient(recipe_id: uuid.UUID, ingredientId: uuid.UUID, amount: int, unit: Unit):
+async def add_recipe_ingredient(recipe_id: uuid.UUID, ingredientId: uuid.UUID, amount: int, unit: Unit, session: AsyncSession = Depends(get_session)):
     """
     Add an ingredient to a recipe.
 
@@ -243,12 +417,12 @@ async def add_recipe_ingredient(recipe_id: uuid.UUID, ingredientId: uuid.UUID, a
         dict: The updated recipe object.
     """
 
-    db_recipe = await crud.add_ingredient_to_recipe(recipe_id, ingredientId, amount, unit)
+    db_recipe = await crud.add_ingredient_to_recipe(session, recipe_id, ingredientId, amount, unit)
     return db_recipe
 
 
 @router.delete("/recipes/{recipe_id}/ingredient/{ingredientId}")
-async def remove_recipe_ingredient(recipe_id: uuid.UUID, ingredientId: uuid.UUID, token: str = Depends(oauth2_scheme)):
+async def remove_recipe_ingredient(recipe_id: uuid.UUID, ingredientId: uuid.UUID, token: str = Depends(oauth2_scheme), session: AsyncSession = Depends(get_session)):
     """
     Remove an ingredient from a recipe.
 
@@ -263,25 +437,39 @@ async def remove_recipe_ingredient(recipe_id: uuid.UUID, ingredientId: uuid.UUID
     if not await validate_token(token):
         raise HTTPException(status_code=401, detail="Invalid token")
 
-    db_recipe = await crud.remove_ingredient_from_recipe(recipe_id, ingredientId)
+    db_recipe = await crud.remove_ingredient_from_recipe(session, recipe_id, ingredientId)
     return db_recipe
 
 
-@router.get("/recipes/public/", response_model=Page[PublicRecipeSchema])
-async def get_public_recipes():
+@router.get("/recipes/public/", response_model=Union[Page[PublicRecipeSchema], CursorPage[PublicRecipeSchema]], dependencies=[Depends(pagination_ctx(Page[PublicRecipeSchema]))])
+async def get_public_recipes(cursor: Optional[str] = None, sort: Literal["title", "stars"] = "title", session: AsyncSession = Depends(get_session)):
     """
     Retrieve a list of public recipes from the database.
 
+    Args:
+        cursor (str, optional): Switches to keyset pagination. Empty for the first page,
+            afterwards the nextCursor of the previous page.
+        sort (str, optional): Sort key, "title" or "stars", for both page and keyset pagination.
+
+    Raises:
+        HTTPException: If the cursor is invalid (status code 400).
+
     Returns:
-        list[dict]: A list of public recipe data.
+        Page | CursorPage: A page of public recipe data.
     """
 
-    db_recipes = await crud.get_public_recipes()
+    if cursor is not None:
+        try:
+            return await crud.get_public_recipes_cursor(session, cursor, resolve_params().size, sort)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    db_recipes = await crud.get_public_recipes(session, sort)
     return db_recipes
 
 
 @router.get("/recipes/public/{userId}", response_model=Page[PublicRecipeSchema])
-async def get_public_recipes(userId: str):
+async def get_public_recipes(userId: str, session: AsyncSession = Depends(get_session)):
     """
     Retrieve a list of public recipes from the database.
 
@@ -289,5 +477,5 @@ async def get_public_recipes(userId: str):
         list[dict]: A list of public recipe data.
     """
 
-    db_recipes = await crud.get_public_recipes_user(userId)
+    db_recipes = await crud.get_public_recipes_user(session, userId)
     return db_recipes
\ No newline at end of file
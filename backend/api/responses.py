@@ -0,0 +1,27 @@
+from decimal import Decimal
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+import orjson
+
+
+def orjson_default(value):
+    # orjson handles UUIDs, datetimes, enums and dataclasses itself
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    Default response class of the API, rendered with orjson.
+
+    The content of routes with a response model is already validated and
+    reduced to JSON types by FastAPI, so rendering only has to write the
+    bytes. Pydantic models, UUIDs and datetimes returned directly are
+    serialized without going through jsonable_encoder.
+    """
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=orjson_default, option=orjson.OPT_NON_STR_KEYS)
@@ -1,16 +1,25 @@
 from api.model import *
 from crud import crud
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from api.conditional import conditional, content_etag
 
 router = APIRouter()
 
+UNITS = [unit.value for unit in Unit]
+UNITS_ETAG = content_etag(UNITS)
+
 @router.get("/units/", response_model=list[Unit])
-async def read_units():
+async def read_units(request: Request, response: Response):
     """
     Retrieve a list of units according to the enum.
 
+    The list only changes with a deployment, its ETag is computed once.
+
     Returns:
         list[dict]: A list of unit data.
     """
 
-    return [unit.value for unit in Unit]
\ No newline at end of file
+    not_modified = conditional(request, response, UNITS_ETAG)
+    if not_modified is not None:
+        return not_modified
+    return UNITS
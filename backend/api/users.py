@@ -1,25 +1,42 @@
 from api.model import UserDB, RecipeDB, RatingSchema
 from crud import crud
 from fastapi import APIRouter, Depends, HTTPException
-import httpx
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.session import get_session
 from fastapi.security import OAuth2PasswordBearer
 from fastapi_pagination import Page
+from api import auth
+from api.auth import token_cache
+import httpx
 
 
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 async def validate_token(token: str):
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
+    try:
+        if auth.AUTH_MODE == "jwks":
+            return await auth.jwks.verify(token, auth.JWT_AUDIENCE, auth.JWT_ISSUER)
+        cached = token_cache.get(token)
+        if cached is not None:
+            return cached
+        response = await auth.get_http_client().get(
             "https://graph.microsoft.com/v1.0/me",
             headers={"Authorization": f"Bearer {token}"}
         )
-        return response.status_code == 200
+    except (httpx.HTTPError, auth.KeySetUnavailable):
+        # timeout, unreachable or failing key endpoint or broken key file, the token may well be valid
+        raise HTTPException(status_code=503, detail="Token validation unavailable")
+    if response.status_code not in (200, 401, 403):
+        # throttled or failing upstream, says nothing about the token, so nothing is cached
+        raise HTTPException(status_code=503, detail="Token validation unavailable")
+    valid = response.status_code == 200
+    token_cache.set(token, valid)
+    return valid
 
 
 @router.post("/users/", response_model=UserDB, status_code=201)
-async def create_user(user: UserDB):
+async def create_user(user: UserDB, session: AsyncSession = Depends(get_session)):
     """
     Create a new user in the database.
 
@@ -34,14 +51,14 @@ async def create_user(user: UserDB):
         User: The created user object.
     """
 
-    db_user = await crud.create_user(user)
+    db_user = await crud.create_user(session, user)
     if db_user is None:
         raise HTTPException(status_code=409, detail="User already exists")
     return db_user
 
 
 @router.get("/users/{user_id}", response_model=UserDB)
-async def read_user(user_id: str, token: str = Depends(oauth2_scheme)):
+async def read_user(user_id: str, token: str = Depends(oauth2_scheme), session: AsyncSession = Depends(get_session)):
     """
     Retrieve a user by their user ID.
 
@@ -60,14 +77,14 @@ async def read_user(user_id: str, token: str = Depends(oauth2_scheme)):
     if not await validate_token(token):
         raise HTTPException(status_code=401, detail="Invalid token")
     
-    db_user = await crud.get_user(user_id)
+    db_user = await crud.get_user(session, user_id)
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
     return db_user
 
 
 @router.get("/users/", response_model=Page[UserDB])
-async def read_users(token: str = Depends(oauth2_scheme)):
+async def read_users(token: str = Depends(oauth2_scheme), session: AsyncSession = Depends(get_session)):
     """
     Retrieve a list of users from the database.
 
@@ -83,12 +100,12 @@ async def read_users(token: str = Depends(oauth2_scheme)):
     if not await validate_token(token):
         raise HTTPException(status_code=401, detail="Invalid token")
         
-    db_users = await crud.get_users()
+    db_users = await crud.get_users(session)
     return db_users
 
 
 @router.put("/users/{user_id}", response_model=UserDB)
-async def update_user(user_id: str, user: UserDB, token: str = Depends(oauth2_scheme)):
+async def update_user(user_id: str, user: UserDB, token: str = Depends(oauth2_scheme), session: AsyncSession = Depends(get_session)):
     """Updates a user in the database
 
     Args:
@@ -107,14 +124,14 @@ async def update_user(user_id: str, user: UserDB, token: str = Depends(oauth2_sc
     if not await validate_token(token):
         raise HTTPException(status_code=401, detail="Invalid token")
     
-    db_user = await crud.update_user(user_id, user)
+    db_user = await crud.update_user(session, user_id, user)
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
     return db_user
 
 
 @router.delete("/users/{user_id}", response_model=UserDB)
-async def delete_user(user_id: str, token: str = Depends(oauth2_scheme)):
+async def delete_user(user_id: str, token: str = Depends(oauth2_scheme), session: AsyncSession = Depends(get_session)):
     """Deletes a user from the database
 
     Args:
@@ -132,14 +149,14 @@ async def delete_user(user_id: str, token: str = Depends(oauth2_scheme)):
     if not await validate_token(token):
         raise HTTPException(status_code=401, detail="Invalid token")
     
-    db_user = await crud.delete_user(user_id)
+    db_user = await crud.delete_user(session, user_id)
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
     return db_user
 
 
 @router.get("/users/{user_id}/recipes/", response_model=list[RecipeDB])
-async def read_user_recipes(user_id: str, token: str = Depends(oauth2_scheme)):
+async def read_user_recipes(user_id: str, token: str = Depends(oauth2_scheme), session: AsyncSession = Depends(get_session)):
     """Retrieves a list of recipes for a user
 
     Args:
@@ -157,14 +174,14 @@ async def read_user_recipes(user_id: str, token: str = Depends(oauth2_scheme)):
     if not await validate_token(token):
         raise HTTPException(status_code=401, detail="Invalid token")
     
-    recipes = await crud.get_user_recipes(user_id)
+    recipes = await crud.get_user_recipes(session, user_id)
     if recipes is None:
         raise HTTPException(status_code=404, detail="User not found")
     return recipes
 
 
 @router.get("/users/{user_id}/ratings/", response_model=list[RatingSchema])
-async def read_user_ratings(user_id: str, token: str = Depends(oauth2_scheme)):
+async def read_user_ratings(user_id: str, token: str = Depends(oauth2_scheme), session: AsyncSession = Depends(get_session)):
     """Retrieves a list of ratings for a user
 
     Args:
@@ -182,7 +199,7 @@ async def read_user_ratings(user_id: str, token: str = Depends(oauth2_scheme)):
     if not await validate_token(token):
         raise HTTPException(status_code=401, detail="Invalid token")
     
-    ratings = await crud.get_user_ratings(user_id)
+    ratings = await crud.get_user_ratings(session, user_id)
     if ratings is None:
         raise HTTPException(status_code=404, detail="User not found")
     return ratings
\ No newline at end of file
@@ -0,0 +1,57 @@
+"""
+Latency of ingredient suggestions from the in-memory trie.
+
+Run with ``python -m benchmarks.ingredient_suggest [--names 50000] [--limit 10]``.
+"""
+
+import argparse
+import random
+import string
+import time
+import uuid
+
+from crud.suggest import NameTrie
+
+
+WORDS = ["Rote", "Weiße", "Frische", "Getrocknete", "Zwiebel", "Paprika", "Tomate", "Mehl", "Butter", "Käse", "Pfeffer", "Salz"]
+
+
+def make_names(count: int, rng: random.Random):
+    names = set()
+    while len(names) < count:
+        suffix = "".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 8)))
+        names.add(" ".join(rng.sample(WORDS, rng.randint(1, 2))) + " " + suffix)
+    return sorted(names)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.ingredient_suggest", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--names", type=int, default=50000, help="ingredients in the trie")
+    parser.add_argument("--limit", type=int, default=10, help="suggestions per query")
+    parser.add_argument("--queries", type=int, default=5000, help="queries to time")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(0)
+    names = make_names(args.names, rng)
+    trie = NameTrie()
+    started = time.perf_counter()
+    trie.rebuild((uuid.uuid4(), name) for name in names)
+    print(f"built trie over {len(names)} names in {time.perf_counter() - started:.2f}s")
+
+    # every keystroke of random names, from one character on
+    queries = []
+    while len(queries) < args.queries:
+        name = rng.choice(names)
+        queries.extend(name[:length] for length in range(1, min(len(name), 10) + 1))
+    timings = []
+    for query in queries[:args.queries]:
+        started = time.perf_counter()
+        trie.search(query, args.limit)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    for label, quantile in [("p50", 0.5), ("p99", 0.99), ("max", 1.0)]:
+        print(f"{label}: {timings[min(int(len(timings) * quantile), len(timings) - 1)] * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+CPU time spent rendering one page of recipes, default JSONResponse against
+the orjson based FastJSONResponse, plus the gzip ratio of the body.
+
+Run with ``python -m benchmarks.json_responses [--size 50] [--rounds 2000]``.
+"""
+
+import argparse
+import gzip
+import timeit
+import uuid
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi_pagination import Page
+
+from api.model import PublicRecipeSchema
+from api.responses import FastJSONResponse
+
+
+def make_page(size: int):
+    items = [
+        {
+            "recipeId": uuid.uuid4(),
+            "title": f"Rezept {i}",
+            "description": "Ein einfaches Rezept mit einer etwas längeren Beschreibung, wie sie in der Liste angezeigt wird. " * 3,
+            "cookingTime": 30,
+            "preparationTime": 15,
+            "imagePath": f"https://example.com/images/{i}.jpg",
+            "userId": str(uuid.uuid4()),
+            "stars": 4.5,
+            "ratingAmount": 12,
+            "userName": "Max Mustermann",
+        }
+        for i in range(size)
+    ]
+    return Page[PublicRecipeSchema](items=items, total=size * 20, page=1, size=size, pages=20)
+
+
+def measure(label: str, fn, rounds: int):
+    seconds = min(timeit.repeat(fn, number=rounds, repeat=3)) / rounds
+    print(f"{label:<48} {seconds * 1e6:8.1f} µs/page")
+    return seconds
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.json_responses", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=50, help="recipes per page")
+    parser.add_argument("--rounds", type=int, default=2000, help="renders per measurement")
+    args = parser.parse_args(argv)
+
+    page = make_page(args.size)
+    # what FastAPI hands to the response class for a route with response_model
+    content = page.model_dump(mode="json")
+
+    print(f"page of {args.size} recipes")
+    default = measure("JSONResponse, validated content", lambda: JSONResponse(content), args.rounds)
+    fast = measure("FastJSONResponse, validated content", lambda: FastJSONResponse(content), args.rounds)
+    encoded = measure("JSONResponse, jsonable_encoder(model)", lambda: JSONResponse(jsonable_encoder(page)), args.rounds)
+    direct = measure("FastJSONResponse, model", lambda: FastJSONResponse(page), args.rounds)
+    print(f"saved per page: {(default - fast) * 1e6:.1f} µs with a response model, {(encoded - direct) * 1e6:.1f} µs without")
+
+    body = FastJSONResponse(content).body
+    compressed = gzip.compress(body, compresslevel=6)
+    print(f"body {len(body)} bytes, gzip {len(compressed)} bytes ({len(compressed) / len(body):.0%})")
+
+
+if __name__ == "__main__":
+    main()
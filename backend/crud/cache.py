@@ -0,0 +1,190 @@
+from collections import OrderedDict
+from fastapi.encoders import jsonable_encoder
+import functools
+import inspect
+import json
+import os
+import time
+
+
+# "memory" caches per worker, "redis" shares one cache between all workers, "none" disables caching
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_URL = os.getenv("CACHE_URL", "redis://localhost:6379/0")
+CACHE_TTL = int(os.getenv("CACHE_TTL", "60"))
+CACHE_SIZE = int(os.getenv("CACHE_SIZE", "10000"))
+
+
+class NullCache:
+    """
+    Cache that stores nothing, used with CACHE_BACKEND=none.
+    """
+
+    async def get(self, key: str):
+        return None
+
+    async def set(self, key: str, value, tags: tuple = ()):
+        pass
+
+    async def delete(self, *keys: str):
+        pass
+
+    async def invalidate_tags(self, *tags: str):
+        pass
+
+    async def generation(self, name: str):
+        return 0
+
+    async def next_generation(self, name: str):
+        pass
+
+
+class MemoryCache:
+    """
+    In-process LRU cache with a time to live.
+
+    Entries can be tagged, invalidating a tag removes all entries stored with
+    it. Generations are counters that never expire, for keys that change on
+    every write. Each uvicorn worker has its own cache, so after a write other
+    workers may serve the old value until the TTL runs out.
+    """
+
+    def __init__(self, ttl: int = CACHE_TTL, max_size: int = CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.tags = {}
+        self.generations = {}
+
+    def remove(self, key: str):
+        value, expires_at, tags = self.entries.pop(key)
+        for tag in tags:
+            self.tags.get(tag, set()).discard(key)
+
+    async def get(self, key: str):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at, tags = entry
+        if expires_at <= time.time():
+            self.remove(key)
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value, tags: tuple = ()):
+        if key in self.entries:
+            self.remove(key)
+        self.entries[key] = (value, time.time() + self.ttl, tags)
+        for tag in tags:
+            self.tags.setdefault(tag, set()).add(key)
+        while len(self.entries) > self.max_size:
+            self.remove(next(iter(self.entries)))
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            if key in self.entries:
+                self.remove(key)
+
+    async def invalidate_tags(self, *tags: str):
+        for tag in tags:
+            await self.delete(*list(self.tags.pop(tag, ())))
+
+    async def generation(self, name: str):
+        return self.generations.get(name, 0)
+
+    async def next_generation(self, name: str):
+        self.generations[name] = self.generations.get(name, 0) + 1
+
+
+class RedisCache:
+    """
+    Cache shared by all workers, stored in Redis as JSON.
+
+    A tag is a Redis set holding the keys stored with it. Requires the
+    optional redis package.
+    """
+
+    def __init__(self, url: str = CACHE_URL, ttl: int = CACHE_TTL, prefix: str = "kochrezepte:"):
+        import redis.asyncio
+
+        self.client = redis.asyncio.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    async def get(self, key: str):
+        value = await self.client.get(self.prefix + key)
+        return json.loads(value) if value is not None else None
+
+    async def set(self, key: str, value, tags: tuple = ()):
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.set(self.prefix + key, json.dumps(value), ex=self.ttl)
+            for tag in tags:
+                # the tag outlives its newest entry by one TTL at most
+                pipe.sadd(self.prefix + "tag:" + tag, key)
+                pipe.expire(self.prefix + "tag:" + tag, self.ttl)
+            await pipe.execute()
+
+    async def delete(self, *keys: str):
+        if keys:
+            await self.client.delete(*[self.prefix + key for key in keys])
+
+    async def invalidate_tags(self, *tags: str):
+        for tag in tags:
+            tag_key = self.prefix + "tag:" + tag
+            async with self.client.pipeline(transaction=True) as pipe:
+                pipe.smembers(tag_key)
+                pipe.delete(tag_key)
+                keys, _ = await pipe.execute()
+            await self.delete(*[key.decode() for key in keys])
+
+    async def generation(self, name: str):
+        value = await self.client.get(self.prefix + "generation:" + name)
+        return int(value) if value is not None else 0
+
+    async def next_generation(self, name: str):
+        await self.client.incr(self.prefix + "generation:" + name)
+
+
+def create_cache():
+    if CACHE_BACKEND == "redis":
+        return RedisCache()
+    if CACHE_BACKEND == "none":
+        return NullCache()
+    return MemoryCache()
+
+
+cache = create_cache()
+
+
+def cached(key, tags=lambda *args: ()):
+    """
+    Read-through caching for a crud function.
+
+    The result is stored JSON encoded, so every backend returns the same
+    value. None results, e.g. for unknown IDs, are not cached.
+
+    Args:
+        key (callable): Builds the cache key from the arguments after the session, may be async.
+        tags (callable, optional): Builds the tags of the entry from the same arguments.
+
+    Returns:
+        callable: The decorator.
+    """
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(session, *args):
+            cache_key = key(*args)
+            if inspect.isawaitable(cache_key):
+                cache_key = await cache_key
+            value = await cache.get(cache_key)
+            if value is not None:
+                return value
+            value = await fn(session, *args)
+            if value is None:
+                return None
+            value = jsonable_encoder(value)
+            await cache.set(cache_key, value, tags(*args))
+            return value
+        return wrapper
+    return decorator
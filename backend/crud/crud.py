@@ -1,11 +1,126 @@
-from db.session import session
+from sqlalchemy import select, update, delete, func, literal, literal_column, tuple_, cast, any_, Numeric, String, JSON
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload, joinedload
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert, ARRAY
 from db.model import User, Recipe, Ingredient, PreparationStep, RecipeIngredient, Category, RecipeCategory, Rating, Unit
+import asyncio
 import uuid
-from api.model import UserDB, RecipeDB, IngredientDB, PreparationStepDB, CategoryDB, RatingSchema, IngredientSchema, PreparationStepSchema, CategorySchema, RecipeSchema, PublicRecipeSchema
-from fastapi_pagination import paginate
+import base64
+import binascii
+import decimal
+import json
+from api.model import UserDB, RecipeDB, IngredientDB, PreparationStepDB, CategoryDB, RatingSchema, IngredientSchema, PreparationStepSchema, CategorySchema, RecipeSchema, PublicRecipeSchema, RecipeFullCreateSchema
+from fastapi_pagination.api import resolve_params
+from fastapi_pagination.ext.sqlalchemy import paginate
+from starlette.concurrency import run_in_threadpool
+from crud.cache import cache, cached
+from crud.suggest import ingredient_trie
 
-async def create_user(user: UserDB):
-    ex_user = session.query(User).filter(User.userId == user.userId).first()
+
+async def paginate_query(session: AsyncSession, query, transformer=None):
+    """
+    Paginate a select in the database.
+
+    LIMIT/OFFSET and the COUNT for the total run in SQL, so only one page of
+    rows is ever loaded. The page parameters come from the current request.
+
+    Args:
+        session (AsyncSession): The database session.
+        query (Select): The ordered select to paginate.
+        transformer (callable, optional): Converts the fetched rows before the page is built.
+
+    Returns:
+        Page: The requested page.
+    """
+
+    params = resolve_params()
+    return await session.run_sync(lambda sync_session: paginate(sync_session, query, params, transformer=transformer))
+
+
+# shorter input has too few trigrams for a useful similarity
+TRIGRAM_MIN_LENGTH = 3
+
+# one reload at a time when many suggestion requests find the trie outdated,
+# writes to the trie wait for a running reload so they are not lost with the old root
+trie_lock = asyncio.Lock()
+
+
+def name_prefix_filter(column, prefix: str):
+    # matches the lower(name) text_pattern_ops indexes, % and _ in the prefix are escaped
+    return func.lower(column).startswith(prefix.lower(), autoescape=True)
+
+
+# recipe entries are keyed by version: every write to a recipe increments it,
+# so an entry is only ever served with the ETag of the version it was read at,
+# and entries of older versions are never read again and just expire
+def recipe_key(recipe_id: uuid.UUID, version: int):
+    return f"recipe:{recipe_id}:{version}"
+
+
+def recipe_ingredients_key(recipe_id: uuid.UUID, version: int):
+    return f"recipe:{recipe_id}:{version}:ingredients"
+
+
+async def public_recipes_key(sort: str = "title"):
+    # a page read before a write is stored under the old generation and never
+    # read again, deleting it instead could race with that late cache.set
+    generation = await cache.generation("public")
+    params = resolve_params()
+    return f"recipes:public:{generation}:{sort}:{params.page}:{params.size}"
+
+
+async def invalidate_listings():
+    # the listings show title, author and stars of every recipe
+    await cache.next_generation("public")
+
+
+def recipe_touched():
+    # values of an UPDATE on recipes marking them as changed
+    return {"version": Recipe.version + 1, "updatedAt": func.now()}
+
+
+async def touch_recipes(session: AsyncSession, *criteria):
+    await session.execute(
+        update(Recipe)
+        .where(*criteria)
+        .values(**recipe_touched())
+        .execution_options(synchronize_session=False)
+    )
+
+
+def foreign_key_violation(e: IntegrityError):
+    # psycopg2 and the asyncpg adapter both expose the SQLSTATE as pgcode
+    return getattr(e.orig, "pgcode", None) == "23503"
+
+
+def rows_to_dicts(rows):
+    return [dict(row._mapping) for row in rows]
+
+
+def related_rows(rows, key):
+    """
+    Convert the rows of a parent outer joined to its children into dicts.
+
+    The parent matches no row if it does not exist, and a single row with
+    the child columns set to NULL if it has no children.
+
+    Args:
+        rows (Result): The rows of the outer join.
+        key (str): A child column that is never NULL for a real child.
+
+    Returns:
+        list[dict] | None: The child rows, None if the parent does not exist.
+    """
+
+    rows = rows.all()
+    if not rows:
+        return None
+    return [dict(row._mapping) for row in rows if row._mapping[key] is not None]
+
+
+async def create_user(session: AsyncSession, user: UserDB):
+    ex_user = await session.scalar(select(User).where(User.userId == user.userId))
     if ex_user is not None:
         return None
     db_user = User(
@@ -15,63 +130,77 @@ async def create_user(user: UserDB):
         lastName=user.lastName,
     )
     session.add(db_user)
-    session.commit()
+    await session.commit()
     return db_user
 
 
-async def get_user(user_id: str):
-    return session.query(User).filter(User.userId == user_id).first()
+async def get_user(session: AsyncSession, user_id: str):
+    return await session.scalar(select(User).where(User.userId == user_id))
 
-async def get_users():
-    return paginate(session.query(User).all())
+async def get_users(session: AsyncSession):
+    return await paginate_query(session, select(User).order_by(User.userId))
 
-async def update_user(user_id: str, user: User):
-    db_user = session.query(User).filter(User.userId == user_id).first()
+async def update_user(session: AsyncSession, user_id: str, user: User):
+    db_user = await session.scalar(select(User).where(User.userId == user_id))
     if db_user is None:
         return None
     db_user.email = user.email
     db_user.firstName = user.firstName
     db_user.lastName = user.lastName
-    session.commit()
+    # the author name is part of the user's recipes, new versions retire their cache entries
+    await touch_recipes(session, Recipe.userId == user_id)
+    await session.commit()
+    await invalidate_listings()
     return db_user
 
 
-async def delete_user(user_id: str):
-    db_user = session.query(User).filter(User.userId == user_id).first()
+async def delete_user(session: AsyncSession, user_id: str):
+    db_user = await session.scalar(select(User).where(User.userId == user_id))
     if db_user is None:
         return None
-    session.delete(db_user)
-    session.commit()
+    # the user's ratings are deleted with them, take them out of the recipe aggregates
+    await session.execute(
+        update(Recipe)
+        .where(Recipe.recipeId == Rating.recipeId, Rating.userId == user_id)
+        .values(ratingSum=Recipe.ratingSum - Rating.stars, ratingCount=Recipe.ratingCount - 1, **recipe_touched())
+        .execution_options(synchronize_session=False)
+    )
+    await session.delete(db_user)
+    await session.commit()
+    await cache.invalidate_tags("recipes")
+    await invalidate_listings()
     return db_user
 
 
-async def get_user_recipes(user_id: str):
-    db_user = session.query(User).filter(User.userId == user_id).first()
+async def get_user_recipes(session: AsyncSession, user_id: str):
+    db_user = await session.scalar(select(User).options(selectinload(User.recipes)).where(User.userId == user_id))
     if db_user is None:
         return None
     return db_user.recipes
 
 
-async def get_user_ratings(user_id: str):
-    db_user = session.query(User).filter(User.userId == user_id).first()
+async def get_user_ratings(session: AsyncSession, user_id: str):
+    db_user = await session.scalar(select(User).options(selectinload(User.ratings)).where(User.userId == user_id))
     if db_user is None:
         return None
     return db_user.ratings
 
 
-async def delete_rating(recipe_id: uuid.UUID, user_id: str):
-    db_rating = session.query(Rating).filter(Rating.recipeId == recipe_id, Rating.userId == user_id).first()
+async def delete_rating(session: AsyncSession, recipe_id: uuid.UUID, user_id: str):
+    db_rating = await session.scalar(select(Rating).where(Rating.recipeId == recipe_id, Rating.userId == user_id).with_for_update())
     if db_rating is None:
         return None
-    session.delete(db_rating)
-    session.commit()
+    await update_rating_aggregate(session, recipe_id, -db_rating.stars, -1)
+    await session.delete(db_rating)
+    await session.commit()
+    await invalidate_listings()
     return db_rating
 
 
 #-------------------------Recipes-------------------------	
 
 
-async def create_recipe(recipe: RecipeSchema):
+async def create_recipe(session: AsyncSession, recipe: RecipeSchema):
     db_recipe = Recipe(
         title=recipe.title,
         description=recipe.description,
@@ -81,32 +210,111 @@ async def create_recipe(recipe: RecipeSchema):
         userId=recipe.userId
     )
     session.add(db_recipe)
-    session.commit()
+    await session.commit()
+    await invalidate_listings()
     return db_recipe
 
 
-async def get_recipe(recipe_id: uuid.UUID):
-    recipe = session.query(Recipe).filter(Recipe.recipeId == recipe_id).first()
-    recipe_dict = {
-            "recipeId": recipe.recipeId,
-            "title": recipe.title,
-            "description": recipe.description,
-            "cookingTime": recipe.cookingTime,
-            "preparationTime": recipe.preparationTime,
-            "imagePath": recipe.imagePath,
-            "userId": recipe.userId,
-            "stars": sum([rating.stars for rating in recipe.ratings]) / len(recipe.ratings) if len(recipe.ratings) != 0 else 0,
-            "ratingAmount": len(recipe.ratings),
-            "userName": recipe.user.firstName + " " + recipe.user.lastName
-        }
-    return recipe_dict
-
-async def get_recipes():
-    return paginate(session.query(Recipe).all())
-
-
-async def update_recipe(recipe_id: uuid.UUID, recipe: Recipe):
-    db_recipe = session.query(Recipe).filter(Recipe.recipeId == recipe_id).first()
+async def create_recipe_full(session: AsyncSession, recipe: RecipeFullCreateSchema):
+    """
+    Create a recipe with its preparation steps, ingredients and categories.
+
+    Everything is inserted in one transaction, the rows of each table as one
+    batched INSERT. If an ingredient or category does not exist or is given
+    twice, nothing is created.
+
+    Returns:
+        dict | None: The created recipe matching RecipeFullSchema, None if the transaction was rolled back.
+    """
+
+    steps = sorted(recipe.steps, key=lambda step: step.stepNumber)
+    db_recipe = Recipe(
+        title=recipe.title,
+        description=recipe.description,
+        cookingTime=recipe.cookingTime,
+        preparationTime=recipe.preparationTime,
+        imagePath=recipe.imagePath,
+        userId=recipe.userId,
+        stepsText=" ".join(step.description for step in steps),
+        steps=[PreparationStep(stepNumber=step.stepNumber, description=step.description) for step in steps],
+        ingredients=[RecipeIngredient(ingredientId=ing.ingredientId, amount=ing.amount, unit=ing.unit) for ing in recipe.ingredients],
+        categories=[RecipeCategory(categoryId=category_id) for category_id in recipe.categoryIds],
+    )
+    session.add(db_recipe)
+    try:
+        await session.commit()
+    except IntegrityError:
+        await session.rollback()
+        return None
+    await invalidate_listings()
+    return await get_recipe_full(session, db_recipe.recipeId)
+
+
+@cached(recipe_key, lambda recipe_id, version: ("recipes",))
+async def get_recipe(session: AsyncSession, recipe_id: uuid.UUID, version: int):
+    row = (await session.execute(public_recipe_query().where(Recipe.recipeId == recipe_id))).first()
+    if row is None:
+        return None
+    return dict(row._mapping)
+
+
+async def get_recipe_version(session: AsyncSession, recipe_id: uuid.UUID):
+    return (await session.execute(select(Recipe.version, Recipe.updatedAt).where(Recipe.recipeId == recipe_id))).first()
+
+
+async def get_recipe_full(session: AsyncSession, recipe_id: uuid.UUID):
+    """
+    Load a recipe together with its steps, ingredients and categories.
+
+    The recipe, its author and the rating aggregate come from one joined
+    select, each collection is eager loaded with one additional IN query, so
+    the cost does not grow with the number of steps or ingredients.
+
+    Returns:
+        dict | None: The recipe matching RecipeFullSchema, None if it does not exist.
+    """
+
+    query = (
+        select(Recipe, recipe_stars().label("stars"), (User.firstName + " " + User.lastName).label("userName"))
+        .join(User, Recipe.userId == User.userId)
+        .options(
+            selectinload(Recipe.steps),
+            selectinload(Recipe.ingredients).joinedload(RecipeIngredient.ingredient),
+            selectinload(Recipe.categories).joinedload(RecipeCategory.category),
+        )
+        .where(Recipe.recipeId == recipe_id)
+    )
+    row = (await session.execute(query)).first()
+    if row is None:
+        return None
+    recipe = row.Recipe
+    return {
+        "recipeId": recipe.recipeId,
+        "title": recipe.title,
+        "description": recipe.description,
+        "cookingTime": recipe.cookingTime,
+        "preparationTime": recipe.preparationTime,
+        "imagePath": recipe.imagePath,
+        "userId": recipe.userId,
+        "stars": row.stars,
+        "ratingAmount": recipe.ratingCount,
+        "userName": row.userName,
+        "steps": recipe.steps,
+        "ingredients": [{
+            "ingredientId": ing.ingredientId,
+            "recipeId": ing.recipeId,
+            "name": ing.ingredient.name,
+            "amount": ing.amount,
+            "unit": ing.unit} for ing in recipe.ingredients],
+        "categories": [rc.category for rc in recipe.categories],
+    }
+
+async def get_recipes(session: AsyncSession):
+    return await paginate_query(session, select(Recipe).order_by(Recipe.recipeId))
+
+
+async def update_recipe(session: AsyncSession, recipe_id: uuid.UUID, recipe: Recipe):
+    db_recipe = await session.scalar(select(Recipe).where(Recipe.recipeId == recipe_id))
     if db_recipe is None:
         return None
     db_recipe.title = recipe.title
@@ -115,65 +323,72 @@ async def update_recipe(recipe_id: uuid.UUID, recipe: Recipe):
     db_recipe.preparationTime = recipe.preparationTime
     db_recipe.imagePath = recipe.imagePath
     db_recipe.userId = recipe.userId
-    session.commit()
+    await touch_recipes(session, Recipe.recipeId == recipe_id)
+    await session.commit()
+    await invalidate_listings()
     return db_recipe
 
 
-async def delete_recipe(recipe_id: uuid.UUID):
-    db_recipe = session.query(Recipe).filter(Recipe.recipeId == recipe_id).first()
+async def delete_recipe(session: AsyncSession, recipe_id: uuid.UUID):
+    db_recipe = await session.scalar(select(Recipe).where(Recipe.recipeId == recipe_id))
     if db_recipe is None:
         return None
-    session.delete(db_recipe)
-    session.commit()
+    await session.delete(db_recipe)
+    await session.commit()
+    await invalidate_listings()
     return db_recipe
 
 
-async def get_recipe_user(recipeId: uuid.UUID):
-    recipe = session.query(Recipe).filter(Recipe.recipeId == recipeId).first()
+async def get_recipe_user(session: AsyncSession, recipeId: uuid.UUID):
+    recipe = await session.scalar(select(Recipe).options(selectinload(Recipe.user)).where(Recipe.recipeId == recipeId))
     if not recipe:
         return None
     return recipe.user
 
 
-async def get_recipe_preparation_steps(recipeId: uuid.UUID):
-    recipe = session.query(Recipe).filter(Recipe.recipeId == recipeId).first()
-    if not recipe:
-        return None
-    return recipe.steps
+async def get_recipe_preparation_steps(session: AsyncSession, recipeId: uuid.UUID):
+    query = (
+        select(Recipe.recipeId, PreparationStep.stepId, PreparationStep.stepNumber, PreparationStep.description)
+        .outerjoin(PreparationStep, PreparationStep.recipeId == Recipe.recipeId)
+        .where(Recipe.recipeId == recipeId)
+        .order_by(PreparationStep.stepNumber)
+    )
+    return related_rows(await session.execute(query), "stepId")
 
 
-async def get_recipe_ingredients(recipeId: uuid.UUID):
-    recipe = session.query(Recipe).filter(Recipe.recipeId == recipeId).first()
-    if not recipe:
-        return None
-    recipe_ing = []
-    for ing in recipe.ingredients:
-        recipe_ing.append({
-            "ingredientId": ing.ingredient.ingredientId,
-            "recipeId": recipe.recipeId,
-            "name": ing.ingredient.name,
-            "amount": ing.amount,
-            "unit": ing.unit})
-    return recipe_ing
+@cached(recipe_ingredients_key, lambda recipe_id, version: ("recipes",))
+async def get_recipe_ingredients(session: AsyncSession, recipeId: uuid.UUID, version: int):
+    query = (
+        select(Recipe.recipeId, Ingredient.ingredientId, Ingredient.name, RecipeIngredient.amount, RecipeIngredient.unit)
+        .outerjoin(RecipeIngredient, RecipeIngredient.recipeId == Recipe.recipeId)
+        .outerjoin(Ingredient, Ingredient.ingredientId == RecipeIngredient.ingredientId)
+        .where(Recipe.recipeId == recipeId)
+        .order_by(Ingredient.name)
+    )
+    return related_rows(await session.execute(query), "ingredientId")
 
 
-async def get_recipe_categories(recipeId: uuid.UUID):
-    recipe = session.query(Recipe).filter(Recipe.recipeId == recipeId).first()
-    if not recipe:
-        return None
-    return recipe.categories
+async def get_recipe_categories(session: AsyncSession, recipeId: uuid.UUID):
+    query = (
+        select(Recipe.recipeId, Category.categoryId, Category.name)
+        .outerjoin(RecipeCategory, RecipeCategory.recipeId == Recipe.recipeId)
+        .outerjoin(Category, Category.categoryId == RecipeCategory.categoryId)
+        .where(Recipe.recipeId == recipeId)
+        .order_by(Category.name)
+    )
+    return related_rows(await session.execute(query), "categoryId")
 
 
-async def get_recipe_ratings(recipeId: uuid.UUID):
-    recipe = session.query(Recipe).filter(Recipe.recipeId == recipeId).first()
+async def get_recipe_ratings(session: AsyncSession, recipeId: uuid.UUID):
+    recipe = await session.scalar(select(Recipe).options(selectinload(Recipe.ratings)).where(Recipe.recipeId == recipeId))
     if not recipe:
         return None
     return recipe.ratings
 
 
-async def add_recipe_to_category(recipeId: uuid.UUID, categoryId: uuid.UUID):
-    recipe = session.query(Recipe).filter(Recipe.recipeId == recipeId).first()
-    category = session.query(Category).filter(Category.categoryId == categoryId).first()
+async def add_recipe_to_category(session: AsyncSession, recipeId: uuid.UUID, categoryId: uuid.UUID):
+    recipe = await session.scalar(select(Recipe).where(Recipe.recipeId == recipeId))
+    category = await session.scalar(select(Category).where(Category.categoryId == categoryId))
     if not recipe or not category:
         return None
     recipe_category = RecipeCategory(
@@ -181,22 +396,24 @@ async def add_recipe_to_category(recipeId: uuid.UUID, categoryId: uuid.UUID):
         categoryId=categoryId
     )
     session.add(recipe_category)
-    session.commit()
+    await touch_recipes(session, Recipe.recipeId == recipeId)
+    await session.commit()
     return recipe_category
 
 
-async def remove_recipe_from_category(recipeId: uuid.UUID, categoryId: uuid.UUID):
-    recipe_category = session.query(RecipeCategory).filter(RecipeCategory.recipeId == recipeId, RecipeCategory.categoryId == categoryId).first()
+async def remove_recipe_from_category(session: AsyncSession, recipeId: uuid.UUID, categoryId: uuid.UUID):
+    recipe_category = await session.scalar(select(RecipeCategory).where(RecipeCategory.recipeId == recipeId, RecipeCategory.categoryId == categoryId))
     if not recipe_category:
         return None
-    session.delete(recipe_category)
-    session.commit()
+    await session.delete(recipe_category)
+    await touch_recipes(session, Recipe.recipeId == recipeId)
+    await session.commit()
     return recipe_category
 
 
-async def add_ingredient_to_recipe(recipeId: uuid.UUID, ingredientId: uuid.UUID, amount: int, unit: str):
-    recipe = session.query(Recipe).filter(Recipe.recipeId == recipeId).first()
-    ingredient = session.query(Ingredient).filter(Ingredient.ingredientId == ingredientId).first()
+async def add_ingredient_to_recipe(session: AsyncSession, recipeId: uuid.UUID, ingredientId: uuid.UUID, amount: int, unit: str):
+    recipe = await session.scalar(select(Recipe).where(Recipe.recipeId == recipeId))
+    ingredient = await session.scalar(select(Ingredient).where(Ingredient.ingredientId == ingredientId))
     if not recipe or not ingredient:
         return None
     recipe_ingredient = RecipeIngredient(
@@ -206,212 +423,714 @@ async def add_ingredient_to_recipe(recipeId: uuid.UUID, ingredientId: uuid.UUID,
         unit=unit
     )
     session.add(recipe_ingredient)
-    session.commit()
+    await touch_recipes(session, Recipe.recipeId == recipeId)
+    await session.commit()
     return recipe_ingredient
 
 
-async def remove_ingredient_from_recipe(recipeId: uuid.UUID, ingredientId: uuid.UUID):
-    recipe_ingredient = session.query(RecipeIngredient).filter(RecipeIngredient.recipeId == recipeId, RecipeIngredient.ingredientId == ingredientId).first()
+async def remove_ingredient_from_recipe(session: AsyncSession, recipeId: uuid.UUID, ingredientId: uuid.UUID):
+    recipe_ingredient = await session.scalar(select(RecipeIngredient).where(RecipeIngredient.recipeId == recipeId, RecipeIngredient.ingredientId == ingredientId))
     if not recipe_ingredient:
         return None
-    session.delete(recipe_ingredient)
-    session.commit()
+    await session.delete(recipe_ingredient)
+    await touch_recipes(session, Recipe.recipeId == recipeId)
+    await session.commit()
     return recipe_ingredient
 
-async def get_public_recipes():
-    recipes = session.query(Recipe).all()
-    res_list = []
-    for recipe in recipes:
-        recipe_dict = {
-            "recipeId": recipe.recipeId,
-            "title": recipe.title,
-            "description": recipe.description,
-            "cookingTime": recipe.cookingTime,
-            "preparationTime": recipe.preparationTime,
-            "imagePath": recipe.imagePath,
-            "userId": recipe.userId,
-            "stars": sum([rating.stars for rating in recipe.ratings]) / len(recipe.ratings) if len(recipe.ratings) != 0 else 0,
-            "ratingAmount": len(recipe.ratings),
-            "userName": recipe.user.firstName + " " + recipe.user.lastName
-        }
-        res_list.append(recipe_dict)
-    return paginate(res_list)
-
-
-async def get_public_recipes_user(userId: str):
-    recipes = session.query(Recipe).filter(Recipe.userId == userId).all()
-    res_list = []
-    for recipe in recipes:
-        recipe_dict = {
-            "recipeId": recipe.recipeId,
-            "title": recipe.title,
-            "description": recipe.description,
-            "cookingTime": recipe.cookingTime,
-            "preparationTime": recipe.preparationTime,
-            "imagePath": recipe.imagePath,
-            "userId": recipe.userId,
-            "stars": sum([rating.stars for rating in recipe.ratings]) / len(recipe.ratings) if len(recipe.ratings) != 0 else 0,
-            "ratingAmount": len(recipe.ratings),
-            "userName": recipe.user.firstName + " " + recipe.user.lastName
-        }
-        res_list.append(recipe_dict)
-    return paginate(res_list)
-    
+
+def recipe_stars():
+    # the zeros are inlined, as bound parameters the expression would not match
+    # ix_recipes_stars_recipeId in the generic plans of prepared statements
+    zero = literal_column("0")
+    return func.coalesce(cast(Recipe.ratingSum, Numeric) / func.nullif(Recipe.ratingCount, zero), zero, type_=Numeric)
+
+
+def public_recipe_query():
+    """
+    Build the select for recipes with author name and rating aggregate.
+
+    The average is computed from the rating sum and count stored on the
+    recipe, so listing recipes costs a single query without touching the
+    ratings table.
+
+    Returns:
+        Select: Rows matching PublicRecipeSchema.
+    """
+
+    return (
+        select(
+            Recipe.recipeId,
+            Recipe.title,
+            Recipe.description,
+            Recipe.cookingTime,
+            Recipe.preparationTime,
+            Recipe.imagePath,
+            Recipe.userId,
+            recipe_stars().label("stars"),
+            Recipe.ratingCount.label("ratingAmount"),
+            (User.firstName + " " + User.lastName).label("userName"),
+        )
+        .join(User, Recipe.userId == User.userId)
+    )
+
+
+@cached(public_recipes_key)
+async def get_public_recipes(session: AsyncSession, sort: str = "title"):
+    if sort not in RECIPE_SORTS:
+        raise ValueError("Invalid sort")
+    query = public_recipe_query().order_by(*recipe_order(*RECIPE_SORTS[sort]))
+    return await paginate_query(session, query, rows_to_dicts)
+
+
+async def get_public_recipes_user(session: AsyncSession, userId: str):
+    query = public_recipe_query().where(Recipe.userId == userId).order_by(Recipe.title, Recipe.recipeId)
+    return await paginate_query(session, query, rows_to_dicts)
+
+
+# sort key -> (sort expression, descending)
+RECIPE_SORTS = {
+    "title": (lambda: Recipe.title, False),
+    "stars": (recipe_stars, True),
+}
+
+
+def recipe_order(sort_by, descending: bool):
+    key = sort_by()
+    if descending:
+        return key.desc(), Recipe.recipeId.desc()
+    return key, Recipe.recipeId
+
+
+def encode_cursor(sort: str, value, recipe_id: uuid.UUID):
+    data = json.dumps([sort, str(value), str(recipe_id)])
+    return base64.urlsafe_b64encode(data.encode()).decode()
+
+
+def decode_cursor(cursor: str, sorts: dict):
+    """
+    Decode a cursor created by encode_cursor.
+
+    Args:
+        cursor (str): The opaque cursor from the previous page.
+        sorts (dict): The sort keys allowed for the listing.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+
+    Returns:
+        tuple: The sort key, the sort value and the recipe ID of the last row of the previous page.
+    """
+
+    try:
+        sort, value, recipe_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if sort not in sorts:
+            raise ValueError("Invalid cursor")
+        if sort == "stars":
+            value = decimal.Decimal(value)
+        return sort, value, uuid.UUID(recipe_id)
+    except (binascii.Error, TypeError, decimal.InvalidOperation, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+async def get_cursor_page(session: AsyncSession, query, cursor: str, size: int, sort: str, sorts: dict = RECIPE_SORTS):
+    """
+    Fetch one page of recipes with keyset pagination.
+
+    Rows are ordered by (sort key, recipeId) and the page starts right after
+    the position stored in the cursor. Both sort keys have an index on
+    (key, recipeId), ix_recipes_title_recipeId and ix_recipes_stars_recipeId,
+    so deep pages are an index seek, and inserts between two requests neither
+    skip nor duplicate rows.
+
+    Args:
+        session (AsyncSession): The database session.
+        query (Select): The recipe select without ordering.
+        cursor (str): The cursor of the previous page, empty for the first page.
+        size (int): The page size.
+        sort (str): The sort key of the first page; later pages use the one stored in the cursor.
+        sorts (dict): The sort keys allowed for the listing.
+
+    Raises:
+        ValueError: If the cursor or the sort key is invalid.
+
+    Returns:
+        tuple: The rows of the page and the cursor of the next page, None on the last page.
+    """
+
+    if cursor:
+        sort, value, last_id = decode_cursor(cursor, sorts)
+    if sort not in sorts:
+        raise ValueError("Invalid sort")
+    sort_by, descending = sorts[sort]
+    key = sort_by()
+    if cursor:
+        position = tuple_(key, Recipe.recipeId)
+        last = tuple_(literal(value, key.type), literal(last_id, Recipe.recipeId.type))
+        query = query.where(position < last if descending else position > last)
+    query = query.order_by(*recipe_order(sort_by, descending))
+    rows = (await session.execute(query.add_columns(key.label("sortKey"), Recipe.recipeId.label("sortId")).limit(size + 1))).all()
+    if len(rows) <= size:
+        return rows, None
+    rows = rows[:size]
+    return rows, encode_cursor(sort, rows[-1].sortKey, rows[-1].sortId)
+
+
+async def get_public_recipes_cursor(session: AsyncSession, cursor: str, size: int, sort: str = "title"):
+    rows, next_cursor = await get_cursor_page(session, public_recipe_query(), cursor, size, sort)
+    items = [{key: value for key, value in row._mapping.items() if key not in ("sortKey", "sortId")} for row in rows]
+    return {"items": items, "size": size, "nextCursor": next_cursor}
+
+
+async def get_recipes_cursor(session: AsyncSession, cursor: str, size: int):
+    sorts = {"title": RECIPE_SORTS["title"]}
+    rows, next_cursor = await get_cursor_page(session, select(Recipe), cursor, size, "title", sorts)
+    return {"items": [row.Recipe for row in rows], "size": size, "nextCursor": next_cursor}
+
+
+async def search_public_recipes(session: AsyncSession, q: str):
+    search = func.websearch_to_tsquery(literal_column("'german'"), q)
+    query = (
+        public_recipe_query()
+        .where(Recipe.searchVector.op("@@")(search))
+        .order_by(func.ts_rank(Recipe.searchVector, search).desc(), Recipe.recipeId)
+    )
+    return await paginate_query(session, query, rows_to_dicts)
+
+
+async def get_public_recipes_by_ingredients(session: AsyncSession, have: list[uuid.UUID], max_missing: int = None):
+    """
+    Find the recipes that can be cooked with the given ingredients.
+
+    The recipe_ingredients index on ingredientId narrows the search to the
+    recipes using at least one of the ingredients, then one GROUP BY counts
+    how many of each recipe's ingredients are covered. Recipes missing the
+    fewest ingredients come first, ties are broken by the number of matches.
+
+    Args:
+        session (AsyncSession): The database session.
+        have (list[uuid.UUID]): The IDs of the available ingredients.
+        max_missing (int, optional): Leave out recipes missing more ingredients than this.
+
+    Returns:
+        Page: Public recipe rows with matchedIngredients and missingIngredients.
+    """
+
+    candidates = select(RecipeIngredient.recipeId).where(RecipeIngredient.ingredientId.in_(have))
+    matched = func.count().filter(RecipeIngredient.ingredientId.in_(have))
+    missing = func.count() - matched
+    coverage = (
+        select(RecipeIngredient.recipeId, matched.label("matchedIngredients"), missing.label("missingIngredients"))
+        .where(RecipeIngredient.recipeId.in_(candidates))
+        .group_by(RecipeIngredient.recipeId)
+    )
+    if max_missing is not None:
+        coverage = coverage.having(missing <= max_missing)
+    coverage = coverage.subquery()
+    query = (
+        public_recipe_query()
+        .add_columns(coverage.c.matchedIngredients, coverage.c.missingIngredients)
+        .join(coverage, coverage.c.recipeId == Recipe.recipeId)
+        .order_by(coverage.c.missingIngredients, coverage.c.matchedIngredients.desc(), Recipe.recipeId)
+    )
+    return await paginate_query(session, query, rows_to_dicts)
+
+
+def json_list(query, *columns, order_by):
+    # the rows of a correlated subquery as one JSON array, [] if there are none
+    item = func.json_build_object(*[arg for column in columns for arg in (column.key, column)])
+    return (
+        query.with_only_columns(func.coalesce(func.json_agg(aggregate_order_by(item, *order_by)), literal_column("'[]'::json"), type_=JSON))
+        .scalar_subquery()
+    )
+
+
+def export_recipe_query():
+    """
+    Build the select for fully assembled recipes, one row per recipe.
+
+    Steps, ingredients and categories are aggregated into JSON arrays by
+    correlated subqueries, so every row is complete on its own and the
+    result can be streamed.
+
+    Returns:
+        Select: Rows matching RecipeFullSchema.
+    """
+
+    steps = select(PreparationStep).where(PreparationStep.recipeId == Recipe.recipeId)
+    ingredients = (
+        select(RecipeIngredient)
+        .join(Ingredient, Ingredient.ingredientId == RecipeIngredient.ingredientId)
+        .where(RecipeIngredient.recipeId == Recipe.recipeId)
+    )
+    categories = (
+        select(RecipeCategory)
+        .join(Category, Category.categoryId == RecipeCategory.categoryId)
+        .where(RecipeCategory.recipeId == Recipe.recipeId)
+    )
+    return (
+        public_recipe_query()
+        .add_columns(
+            json_list(steps, PreparationStep.stepId, PreparationStep.recipeId, PreparationStep.stepNumber, PreparationStep.description, order_by=[PreparationStep.stepNumber]).label("steps"),
+            json_list(ingredients, RecipeIngredient.recipeId, Ingredient.ingredientId, Ingredient.name, RecipeIngredient.amount, RecipeIngredient.unit, order_by=[Ingredient.name]).label("ingredients"),
+            json_list(categories, Category.categoryId, Category.name, order_by=[Category.name]).label("categories"),
+        )
+        .order_by(Recipe.recipeId)
+    )
+
+
+async def export_recipes(session: AsyncSession, batch_size: int = 500):
+    """
+    Stream all recipes with their steps, ingredients and categories.
+
+    The rows are read through a server-side cursor, so memory use does not
+    depend on the number of recipes.
+
+    Args:
+        session (AsyncSession): The database session.
+        batch_size (int): The number of rows fetched from the cursor at a time.
+
+    Yields:
+        list[dict]: The next batch of recipes matching RecipeFullSchema.
+    """
+
+    result = await session.stream(export_recipe_query().execution_options(yield_per=batch_size))
+    try:
+        async for rows in result.partitions():
+            yield rows_to_dicts(rows)
+    finally:
+        await result.close()
+
 
 #-------------------------Preparation Steps-------------------------
 
 
-async def create_preparation_step(step: PreparationStepSchema):
+async def update_recipe_steps_text(session: AsyncSession, recipe_id: uuid.UUID):
+    # copy the step descriptions onto the recipe, its search vector is generated from them
+    steps_text = (
+        select(func.coalesce(func.string_agg(PreparationStep.description, aggregate_order_by(literal(" "), PreparationStep.stepNumber)), ""))
+        .where(PreparationStep.recipeId == recipe_id)
+        .scalar_subquery()
+    )
+    await session.execute(
+        update(Recipe)
+        .where(Recipe.recipeId == recipe_id)
+        .values(stepsText=steps_text, **recipe_touched())
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def create_preparation_step(session: AsyncSession, step: PreparationStepSchema):
     db_step = PreparationStep(
         recipeId=step.recipeId,
         stepNumber=step.stepNumber,
         description=step.description
     )
     session.add(db_step)
-    session.commit()
+    try:
+        await session.flush()
+        await update_recipe_steps_text(session, step.recipeId)
+        await session.commit()
+    except IntegrityError as e:
+        await session.rollback()
+        if foreign_key_violation(e):
+            raise LookupError("Recipe not found") from e
+        # the recipe already has a step with this number
+        return None
     return db_step
 
 
-async def get_preparation_step(step_id: uuid.UUID):
-    return session.query(PreparationStep).filter(PreparationStep.stepId == step_id).first()
+async def get_preparation_step(session: AsyncSession, step_id: uuid.UUID):
+    return await session.scalar(select(PreparationStep).where(PreparationStep.stepId == step_id))
 
 
-async def get_preparation_steps():
-    return session.query(PreparationStep).all()
+async def get_preparation_steps(session: AsyncSession):
+    query = select(PreparationStep).order_by(PreparationStep.recipeId, PreparationStep.stepNumber, PreparationStep.stepId)
+    return await paginate_query(session, query)
 
 
-async def update_preparation_step(step_id: uuid.UUID, step: PreparationStep):
-    db_step = session.query(PreparationStep).filter(PreparationStep.stepId == step_id).first()
+async def update_preparation_step(session: AsyncSession, step_id: uuid.UUID, step: PreparationStep):
+    db_step = await session.scalar(select(PreparationStep).where(PreparationStep.stepId == step_id))
     if db_step is None:
         return None
+    old_recipe_id = db_step.recipeId
     db_step.recipeId = step.recipeId
     db_step.stepNumber = step.stepNumber
     db_step.description = step.description
-    session.commit()
+    try:
+        await session.flush()
+        await update_recipe_steps_text(session, step.recipeId)
+        if old_recipe_id != step.recipeId:
+            await update_recipe_steps_text(session, old_recipe_id)
+        await session.commit()
+    except IntegrityError as e:
+        await session.rollback()
+        if foreign_key_violation(e):
+            raise LookupError("Recipe not found") from e
+        raise ValueError("Step number already used") from e
     return db_step
 
 
-async def delete_preparation_step(step_id: uuid.UUID):
-    db_step = session.query(PreparationStep).filter(PreparationStep.stepId == step_id).first()
+async def replace_recipe_steps(session: AsyncSession, recipe_id: uuid.UUID, steps: list):
+    """
+    Replace all preparation steps of a recipe with an ordered list.
+
+    Steps with a stepId are updated, steps without one are inserted and
+    steps missing from the list are deleted. Step numbers follow the list
+    order. Everything runs in one transaction with one statement per kind of
+    change, the unique step numbers are only checked at commit, so steps can
+    swap their numbers.
+
+    Args:
+        session (AsyncSession): The database session.
+        recipe_id (uuid.UUID): The recipe whose steps are replaced.
+        steps (list[RecipeStepReplaceSchema]): The steps in their new order.
+
+    Returns:
+        list[dict] | None: The steps of the recipe after the change, None if the recipe does not exist.
+
+    Raises:
+        ValueError: If a stepId does not belong to the recipe or is given twice.
+    """
+
+    # the row lock serializes concurrent replaces of the same recipe
+    if await session.scalar(select(Recipe.recipeId).where(Recipe.recipeId == recipe_id).with_for_update()) is None:
+        await session.rollback()
+        return None
+    existing = {
+        step_id: (step_number, description)
+        for step_id, step_number, description in await session.execute(
+            select(PreparationStep.stepId, PreparationStep.stepNumber, PreparationStep.description).where(PreparationStep.recipeId == recipe_id)
+        )
+    }
+    given = [step.stepId for step in steps if step.stepId is not None]
+    if len(set(given)) != len(given) or not existing.keys() >= set(given):
+        await session.rollback()
+        raise ValueError("Unknown preparation steps")
+
+    inserts, updates = [], []
+    for number, step in enumerate(steps, start=1):
+        if step.stepId is None:
+            inserts.append({"stepId": uuid.uuid4(), "recipeId": recipe_id, "stepNumber": number, "description": step.description})
+        elif existing[step.stepId] != (number, step.description):
+            updates.append({"stepId": step.stepId, "stepNumber": number, "description": step.description})
+    removed = existing.keys() - set(given)
+    if removed:
+        await session.execute(delete(PreparationStep).where(PreparationStep.stepId.in_(removed)))
+    if updates:
+        await session.execute(update(PreparationStep), updates)
+    if inserts:
+        await session.execute(insert(PreparationStep), inserts)
+    if removed or updates or inserts:
+        await update_recipe_steps_text(session, recipe_id)
+    await session.commit()
+    return await get_recipe_preparation_steps(session, recipe_id)
+
+
+async def delete_preparation_step(session: AsyncSession, step_id: uuid.UUID):
+    db_step = await session.scalar(select(PreparationStep).where(PreparationStep.stepId == step_id))
     if db_step is None:
         return None
-    session.delete(db_step)
-    session.commit()
+    await session.delete(db_step)
+    await session.flush()
+    await update_recipe_steps_text(session, db_step.recipeId)
+    await session.commit()
     return db_step
 
 
+async def upsert_names(session: AsyncSession, model, names: list[str]):
+    """
+    Insert named rows that do not exist yet, in one statement.
+
+    INSERT ... ON CONFLICT (name) DO NOTHING RETURNING yields the new rows,
+    one more select fetches the ones that already existed.
+
+    Args:
+        session (AsyncSession): The database session.
+        model: Ingredient or Category.
+        names (list[str]): The names to insert, duplicates are ignored.
+
+    Returns:
+        dict: The created and the already existing rows, each in the order of names.
+    """
+
+    names = list(dict.fromkeys(names))
+    if not names:
+        return {"created": [], "existing": []}
+    created = (await session.scalars(
+        insert(model).on_conflict_do_nothing(index_elements=["name"]).returning(model),
+        [{"name": name} for name in names],
+    )).all()
+    created_names = {row.name for row in created}
+    existing_names = [name for name in names if name not in created_names]
+    existing = []
+    if existing_names:
+        existing = (await session.scalars(select(model).where(model.name == any_(literal(existing_names, ARRAY(String)))))).all()
+    await session.commit()
+    order = {name: index for index, name in enumerate(names)}
+    return {
+        "created": sorted(created, key=lambda row: order[row.name]),
+        "existing": sorted(existing, key=lambda row: order[row.name]),
+    }
+
+
 #-------------------------Ingredients----------------------------
 
 
-async def create_ingredient(ingredient: IngredientSchema):
-    ex_ingredient = session.query(Ingredient).filter(Ingredient.name == ingredient.name).first()
-    if ex_ingredient is not None:
-        return None
+async def create_ingredient(session: AsyncSession, ingredient: IngredientSchema):
     db_ingredient = Ingredient(
         name=ingredient.name
     )
     session.add(db_ingredient)
-    session.commit()
+    try:
+        await session.commit()
+    except IntegrityError:
+        # name is unique, the ingredient already exists
+        await session.rollback()
+        return None
+    await update_ingredient_trie(added=[(db_ingredient.ingredientId, db_ingredient.name)])
     return db_ingredient
 
 
-async def get_ingredient(ingredient_id: uuid.UUID):
-    return session.query(Ingredient).filter(Ingredient.ingredientId == ingredient_id).first()
+async def create_ingredients(session: AsyncSession, ingredients: list[IngredientSchema]):
+    result = await upsert_names(session, Ingredient, [ingredient.name for ingredient in ingredients])
+    await update_ingredient_trie(added=[(db_ingredient.ingredientId, db_ingredient.name) for db_ingredient in result["created"]])
+    return result
+
+
+async def get_ingredient(session: AsyncSession, ingredient_id: uuid.UUID):
+    return await session.scalar(select(Ingredient).where(Ingredient.ingredientId == ingredient_id))
+
+async def get_ingredients(session: AsyncSession, name_prefix: str = None):
+    query = select(Ingredient).order_by(Ingredient.name)
+    if name_prefix:
+        query = query.where(name_prefix_filter(Ingredient.name, name_prefix))
+    return await paginate_query(session, query)
+
+
+async def update_ingredient_trie(removed=(), added=()):
+    async with trie_lock:
+        for ingredient_id, name in removed:
+            ingredient_trie.remove(ingredient_id, name)
+        for ingredient_id, name in added:
+            ingredient_trie.add(ingredient_id, name)
+
+
+async def suggest_ingredients(session: AsyncSession, q: str, limit: int = 10):
+    """
+    Autocomplete ingredient names.
+
+    Prefix matches come from the in-memory trie, loaded on first use and
+    reloaded every SUGGEST_RELOAD_INTERVAL seconds. Only if nothing starts
+    with q, the database is asked for similar names through the pg_trgm
+    index, so typos still find something.
+
+    Args:
+        session (AsyncSession): The database session.
+        q (str): The typed text.
+        limit (int): The maximum number of suggestions.
+
+    Returns:
+        list[dict]: The suggested ingredients.
+    """
+
+    if ingredient_trie.needs_reload():
+        async with trie_lock:
+            if ingredient_trie.needs_reload():
+                rows = (await session.execute(select(Ingredient.ingredientId, Ingredient.name))).all()
+                # building takes about a second at 50k names, keep the event loop free meanwhile
+                await run_in_threadpool(ingredient_trie.rebuild, rows)
+    matches = ingredient_trie.search(q, limit)
+    if not matches and len(q) >= TRIGRAM_MIN_LENGTH:
+        name = func.lower(Ingredient.name)
+        query = (
+            select(Ingredient.ingredientId, Ingredient.name)
+            .where(name.op("%")(q.lower()))
+            .order_by(func.similarity(name, q.lower()).desc(), Ingredient.name)
+            .limit(limit)
+        )
+        matches = (await session.execute(query)).all()
+    return [{"ingredientId": ingredient_id, "name": name} for ingredient_id, name in matches]
 
-async def get_ingredients():
-    return session.query(Ingredient).all()
 
-async def update_ingredient(ingredient_id: uuid.UUID, ingredient: IngredientSchema):
-    db_ingredient = session.query(Ingredient).filter(Ingredient.ingredientId == ingredient_id).first()
+async def ingredient_recipe_ids(session: AsyncSession, ingredient_id: uuid.UUID):
+    return (await session.scalars(select(RecipeIngredient.recipeId).where(RecipeIngredient.ingredientId == ingredient_id))).all()
+
+
+async def update_ingredient(session: AsyncSession, ingredient_id: uuid.UUID, ingredient: IngredientSchema):
+    db_ingredient = await session.scalar(select(Ingredient).where(Ingredient.ingredientId == ingredient_id))
     if db_ingredient is None:
         return None
+    old_name = db_ingredient.name
+    recipe_ids = await ingredient_recipe_ids(session, ingredient_id)
     db_ingredient.name = ingredient.name
-    session.commit()
+    try:
+        # the rename is flushed by the autoflush of the update
+        await touch_recipes(session, Recipe.recipeId.in_(recipe_ids))
+        await session.commit()
+    except IntegrityError as e:
+        # name is unique, another ingredient already has it
+        await session.rollback()
+        raise ValueError("Name already used") from e
+    await update_ingredient_trie(removed=[(ingredient_id, old_name)], added=[(ingredient_id, db_ingredient.name)])
     return db_ingredient
 
 
-async def delete_ingredient(ingredient_id: uuid.UUID):
-    db_ingredient = session.query(Ingredient).filter(Ingredient.ingredientId == ingredient_id).first()
+async def delete_ingredient(session: AsyncSession, ingredient_id: uuid.UUID):
+    db_ingredient = await session.scalar(select(Ingredient).where(Ingredient.ingredientId == ingredient_id))
     if db_ingredient is None:
         return None
-    session.delete(db_ingredient)
-    session.commit()
+    recipe_ids = await ingredient_recipe_ids(session, ingredient_id)
+    await touch_recipes(session, Recipe.recipeId.in_(recipe_ids))
+    await session.delete(db_ingredient)
+    await session.commit()
+    await update_ingredient_trie(removed=[(ingredient_id, db_ingredient.name)])
     return db_ingredient
 
 #-------------------------Categories----------------------------
 
 
-async def create_category(category: CategorySchema):
-    ex_category = session.query(Category).filter(Category.name == category.name).first()
-    if ex_category is not None:
-        return None
+async def create_category(session: AsyncSession, category: CategorySchema):
     db_category = Category(
         name=category.name
     )
     session.add(db_category)
-    session.commit()
+    try:
+        await session.commit()
+    except IntegrityError:
+        # name is unique, the category already exists
+        await session.rollback()
+        return None
     return db_category
 
 
-async def get_category(category_id: uuid.UUID):
-    return session.query(Category).filter(Category.categoryId == category_id).first()
+async def create_categories(session: AsyncSession, categories: list[CategorySchema]):
+    return await upsert_names(session, Category, [category.name for category in categories])
+
 
+async def get_category(session: AsyncSession, category_id: uuid.UUID):
+    return await session.scalar(select(Category).where(Category.categoryId == category_id))
 
-async def get_categories():
-    return session.query(Category).all()
 
+async def get_categories(session: AsyncSession, name_prefix: str = None):
+    query = select(Category).order_by(Category.name)
+    if name_prefix:
+        query = query.where(name_prefix_filter(Category.name, name_prefix))
+    return await paginate_query(session, query)
 
-async def update_category(category_id: uuid.UUID, category: Category):
-        db_category = session.query(Category).filter(Category.categoryId == category_id).first()
+
+async def update_category(session: AsyncSession, category_id: uuid.UUID, category: Category):
+        db_category = await session.scalar(select(Category).where(Category.categoryId == category_id))
         if db_category is None:
             return None
         db_category.name = category.name
-        session.commit()
+        try:
+            # the rename is flushed by the autoflush of the update
+            await touch_recipes(session, Recipe.recipeId.in_(select(RecipeCategory.recipeId).where(RecipeCategory.categoryId == category_id)))
+            await session.commit()
+        except IntegrityError as e:
+            # name is unique, another category already has it
+            await session.rollback()
+            raise ValueError("Name already used") from e
         return db_category
 
 
-async def delete_category(category_id: uuid.UUID):
-    db_category = session.query(Category).filter(Category.categoryId == category_id).first()
+async def delete_category(session: AsyncSession, category_id: uuid.UUID):
+    db_category = await session.scalar(select(Category).where(Category.categoryId == category_id))
     if db_category is None:
         return None
-    session.delete(db_category)
-    session.commit()
+    await touch_recipes(session, Recipe.recipeId.in_(select(RecipeCategory.recipeId).where(RecipeCategory.categoryId == category_id)))
+    await session.delete(db_category)
+    await session.commit()
     return db_category
 
 
-async def get_category_recipes(categoryId: uuid.UUID):
-    category = session.query(Category).filter(Category.categoryId == categoryId).first()
-    if not category:
-        return None
-    return category.recipes
+async def get_category_recipes(session: AsyncSession, categoryId: uuid.UUID):
+    query = (
+        select(
+            Category.categoryId,
+            Recipe.recipeId,
+            Recipe.title,
+            Recipe.description,
+            Recipe.cookingTime,
+            Recipe.preparationTime,
+            Recipe.imagePath,
+            Recipe.userId,
+        )
+        .outerjoin(RecipeCategory, RecipeCategory.categoryId == Category.categoryId)
+        .outerjoin(Recipe, Recipe.recipeId == RecipeCategory.recipeId)
+        .where(Category.categoryId == categoryId)
+        .order_by(Recipe.title, Recipe.recipeId)
+    )
+    return related_rows(await session.execute(query), "recipeId")
 
 
 #-------------------------Ratings----------------------------
 
 
-async def create_rating(rating: RatingSchema):
+async def update_rating_aggregate(session: AsyncSession, recipe_id: uuid.UUID, stars: int, count: int):
+    await session.execute(
+        update(Recipe)
+        .where(Recipe.recipeId == recipe_id)
+        .values(ratingSum=Recipe.ratingSum + stars, ratingCount=Recipe.ratingCount + count, **recipe_touched())
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def repair_rating_aggregates(session: AsyncSession):
+    """
+    Recompute the stored rating sum and count of every recipe from the ratings table.
+
+    Returns:
+        int: The number of recipes whose aggregate was wrong and got corrected.
+    """
+
+    totals = (
+        select(Rating.recipeId, func.sum(Rating.stars).label("ratingSum"), func.count().label("ratingCount"))
+        .group_by(Rating.recipeId)
+        .subquery()
+    )
+    rating_sum = func.coalesce(select(totals.c.ratingSum).where(totals.c.recipeId == Recipe.recipeId).scalar_subquery(), 0)
+    rating_count = func.coalesce(select(totals.c.ratingCount).where(totals.c.recipeId == Recipe.recipeId).scalar_subquery(), 0)
+    result = await session.execute(
+        update(Recipe)
+        .where((Recipe.ratingSum != rating_sum) | (Recipe.ratingCount != rating_count))
+        .values(ratingSum=rating_sum, ratingCount=rating_count, **recipe_touched())
+        .execution_options(synchronize_session=False)
+    )
+    await session.commit()
+    await cache.invalidate_tags("recipes")
+    await invalidate_listings()
+    return result.rowcount
+
+
+async def create_rating(session: AsyncSession, rating: RatingSchema):
     db_rating = Rating(
         stars=rating.stars,
         userId=rating.userId,
         recipeId=rating.recipeId
     )
     session.add(db_rating)
-    session.commit()
+    await session.flush()
+    await update_rating_aggregate(session, rating.recipeId, rating.stars, 1)
+    await session.commit()
+    await invalidate_listings()
     return db_rating
 
 
-async def get_rating(recipe_id: uuid.UUID, user_id: str):
-    return session.query(Rating).filter(Rating.recipeId == recipe_id, Rating.userId == user_id).first()
+async def get_rating(session: AsyncSession, recipe_id: uuid.UUID, user_id: str):
+    return await session.scalar(select(Rating).where(Rating.recipeId == recipe_id, Rating.userId == user_id))
 
 
-async def get_ratings():
-    return session.query(Rating).all()
+async def get_ratings(session: AsyncSession):
+    return await paginate_query(session, select(Rating).order_by(Rating.recipeId, Rating.userId))
 
 
-async def update_rating(recipe_id: uuid.UUID, user_id: str, rating: Rating):
-    db_rating = session.query(Rating).filter(Rating.recipeId == recipe_id, Rating.userId == user_id).first()
+async def update_rating(session: AsyncSession, recipe_id: uuid.UUID, user_id: str, rating: Rating):
+    db_rating = await session.scalar(select(Rating).where(Rating.recipeId == recipe_id, Rating.userId == user_id).with_for_update())
     if db_rating is None:
         return None
+    await update_rating_aggregate(session, recipe_id, rating.stars - db_rating.stars, 0)
     db_rating.stars = rating.stars
-    session.commit()
-    return db_rating
\ No newline at end of file
+    await session.commit()
+    await invalidate_listings()
+    return db_rating
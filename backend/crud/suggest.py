@@ -0,0 +1,135 @@
+import os
+import re
+import time
+
+
+# every worker keeps its own trie, a full reload picks up writes made by other workers or db.load
+SUGGEST_RELOAD_INTERVAL = int(os.getenv("SUGGEST_RELOAD_INTERVAL", "300"))
+
+WORD_START = re.compile(r"(?<=[\s\-/(])\w")
+# deeper prefixes are matched by filtering the entries of the node at this depth
+MAX_DEPTH = 8
+
+
+class TrieNode:
+    __slots__ = ("children", "entries", "ordered")
+
+    def __init__(self):
+        self.children = {}
+        # ID -> (key, name) of the keys ending here, or cut off here at MAX_DEPTH
+        self.entries = None
+        # entries sorted by name, built by the first search after a change
+        self.ordered = None
+
+    def sorted_entries(self):
+        if self.ordered is None:
+            self.ordered = sorted(self.entries.items(), key=lambda entry: entry[1][1]) if self.entries else []
+        return self.ordered
+
+
+class NameTrie:
+    """
+    In-memory prefix trie over names, for autocompletion.
+
+    Every name is indexed in lower case from its start and from the start of
+    each further word, so "zwie" finds "Rote Zwiebel". A search walks down to
+    the node of the prefix and collects entries depth first in alphabetical
+    order until the limit is reached, the cost depends on the prefix length
+    and the limit, not on the number of names. The trie is at most MAX_DEPTH
+    deep, to keep memory and build time low.
+    """
+
+    def __init__(self, reload_interval: int = SUGGEST_RELOAD_INTERVAL):
+        self.reload_interval = reload_interval
+        self.root = TrieNode()
+        self.loaded_at = None
+
+    @staticmethod
+    def keys(name: str):
+        name = name.lower()
+        return [name] + [name[match.start():] for match in WORD_START.finditer(name)]
+
+    def needs_reload(self):
+        return self.loaded_at is None or time.monotonic() - self.loaded_at >= self.reload_interval
+
+    def rebuild(self, rows):
+        """
+        Replace the content of the trie.
+
+        add and remove during a rebuild change the old root and are lost with
+        it, callers have to hold off writes until the rebuild is done.
+
+        Args:
+            rows (Iterable[tuple]): The (ID, name) pairs to index.
+        """
+
+        trie = NameTrie()
+        for entry_id, name in rows:
+            trie.add(entry_id, name)
+        self.root = trie.root
+        self.loaded_at = time.monotonic()
+
+    def add(self, entry_id, name: str):
+        for key in self.keys(name):
+            node = self.root
+            for char in key[:MAX_DEPTH]:
+                child = node.children.get(char)
+                if child is None:
+                    child = node.children[char] = TrieNode()
+                node = child
+            if node.entries is None:
+                node.entries = {}
+            node.entries[entry_id] = (key, name)
+            node.ordered = None
+
+    def remove(self, entry_id, name: str):
+        for key in self.keys(name):
+            path = [self.root]
+            for char in key[:MAX_DEPTH]:
+                node = path[-1].children.get(char)
+                if node is None:
+                    break
+                path.append(node)
+            else:
+                node = path[-1]
+                if node.entries and node.entries.pop(entry_id, None) is not None:
+                    node.ordered = None
+                # prune the nodes that lead nowhere anymore
+                for parent, char, node in zip(reversed(path[:-1]), reversed(key[:MAX_DEPTH]), reversed(path[1:])):
+                    if node.children or node.entries:
+                        break
+                    del parent.children[char]
+
+    def search(self, prefix: str, limit: int):
+        """
+        Find the names starting with a prefix, or with a word starting with it.
+
+        Args:
+            prefix (str): The typed text, case is ignored.
+            limit (int): The maximum number of results.
+
+        Returns:
+            list[tuple]: Up to limit (ID, name) pairs, in alphabetical order of the matched key.
+        """
+
+        prefix = prefix.lower()
+        node = self.root
+        for char in prefix[:MAX_DEPTH]:
+            node = node.children.get(char)
+            if node is None:
+                return []
+        results = {}
+        stack = [node]
+        while stack and len(results) < limit:
+            node = stack.pop()
+            for entry_id, (key, name) in node.sorted_entries():
+                if len(prefix) > MAX_DEPTH and not key.startswith(prefix):
+                    continue
+                results.setdefault(entry_id, name)
+                if len(results) == limit:
+                    break
+            stack.extend(node.children[char] for char in sorted(node.children, reverse=True))
+        return list(results.items())
+
+
+ingredient_trie = NameTrie()
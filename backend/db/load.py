@@ -0,0 +1,235 @@
+"""
+Bulk import of recipes from NDJSON or CSV.
+
+Run with ``python -m db.load recipes.ndjson`` (see ``--help``). The input is
+read as a stream and loaded in batches, each batch in its own transaction
+using COPY. Ingredient and category names are resolved to IDs through an
+in-memory map, unknown names are created. Loaded batches are recorded in the
+import_batches table, so running the same import again after an interruption
+skips the batches that are already in the database.
+
+NDJSON lines use the format of ``GET /export/recipes.ndjson``, ingredients
+and categories are matched by name. CSV files have the columns recipeId
+(optional), title, description, cookingTime, preparationTime, imagePath,
+userId, steps, ingredients and categories. Steps, ingredients and categories
+are separated by ``|``, an ingredient is written as ``amount unit name``,
+e.g. ``200 g Mehl|2 Stk Ei``.
+"""
+
+import argparse
+import asyncio
+import csv
+import io
+import itertools
+import json
+import os
+import sys
+import time
+import uuid
+from sqlalchemy import select, any_, literal, String
+from sqlalchemy.dialects.postgresql import insert, ARRAY
+from starlette.concurrency import run_in_threadpool
+
+from db.model import Ingredient, Category, ImportBatch, Unit
+from db.session import get_engine, DB_ASYNC
+
+
+COLUMNS = {
+    "recipes": ["recipeId", "title", "description", "cookingTime", "preparationTime", "imagePath", "userId", "stepsText"],
+    "preparation_steps": ["stepId", "recipeId", "stepNumber", "description"],
+    "recipe_ingredients": ["recipeId", "ingredientId", "amount", "unit"],
+    "recipes_categories": ["recipeId", "categoryId"],
+}
+
+
+def read_ndjson(lines):
+    for line in lines:
+        if not line.strip():
+            continue
+        item = json.loads(line)
+        yield {
+            **item,
+            "steps": [(step["stepNumber"], step["description"]) for step in item.get("steps", [])],
+            "ingredients": [(ing["name"], ing["amount"], ing["unit"]) for ing in item.get("ingredients", [])],
+            "categories": [category if isinstance(category, str) else category["name"] for category in item.get("categories", [])],
+        }
+
+
+def read_csv(lines):
+    for item in csv.DictReader(lines):
+        ingredients = []
+        for ingredient in filter(None, item.get("ingredients", "").split("|")):
+            amount, unit, name = ingredient.split(maxsplit=2)
+            ingredients.append((name, int(amount), unit))
+        yield {
+            **item,
+            "steps": list(enumerate(filter(None, item.get("steps", "").split("|")), start=1)),
+            "ingredients": ingredients,
+            "categories": list(filter(None, item.get("categories", "").split("|"))),
+        }
+
+
+def resolve_names(conn, model, names: set, ids: dict):
+    """
+    Add the IDs of names not yet in the map, creating the missing rows.
+
+    Args:
+        conn (Connection): The connection of the current batch.
+        model: Ingredient or Category.
+        names (set[str]): The names used by the batch.
+        ids (dict): The name to ID map, updated in place.
+    """
+
+    missing = sorted(names - ids.keys())
+    if not missing:
+        return
+    conn.execute(insert(model).on_conflict_do_nothing(index_elements=["name"]), [{"name": name} for name in missing])
+    key = model.__mapper__.primary_key[0]
+    for name, row_id in conn.execute(select(model.name, key).where(model.name == any_(literal(missing, ARRAY(String))))):
+        ids[name] = row_id
+
+
+def batch_rows(items, ingredient_ids: dict, category_ids: dict, user_id: str = None):
+    """
+    Convert parsed recipes into the rows of each table.
+
+    Returns:
+        dict: The rows per table, in the column order of COLUMNS.
+    """
+
+    rows = {table: [] for table in COLUMNS}
+    for item in items:
+        recipe_id = uuid.UUID(item["recipeId"]) if item.get("recipeId") else uuid.uuid4()
+        steps = sorted((int(number), description) for number, description in item["steps"])
+        rows["recipes"].append((
+            recipe_id,
+            item["title"],
+            item["description"],
+            int(item["cookingTime"]),
+            int(item["preparationTime"]),
+            item["imagePath"],
+            item.get("userId") or user_id,
+            " ".join(description for number, description in steps),
+        ))
+        rows["preparation_steps"].extend((uuid.uuid4(), recipe_id, number, description) for number, description in steps)
+        ingredients = {}
+        for name, amount, unit in item["ingredients"]:
+            ingredients.setdefault(ingredient_ids[name], (int(amount), Unit(unit).value))
+        rows["recipe_ingredients"].extend((recipe_id, ingredient_id, amount, unit) for ingredient_id, (amount, unit) in ingredients.items())
+        rows["recipes_categories"].extend((recipe_id, category_ids[name]) for name in dict.fromkeys(item["categories"]))
+    return rows
+
+
+def copy_value(value):
+    # COPY text format: \N is NULL, an empty field is an empty string
+    if value is None:
+        return "\\N"
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def copy_rows(conn, table: str, rows: list):
+    """
+    Load rows into a table with COPY, or with a batched INSERT for other drivers.
+    """
+
+    if not rows:
+        return
+    columns = COLUMNS[table]
+    dbapi_connection = conn.connection.dbapi_connection
+    if conn.dialect.driver == "asyncpg":
+        dbapi_connection.run_async(lambda driver: driver.copy_records_to_table(table, records=rows, columns=columns))
+    elif conn.dialect.driver == "psycopg2":
+        # not csv: it reads an unquoted empty field as NULL, and the csv module
+        # cannot quote empty strings while leaving None unquoted
+        buffer = io.StringIO("".join("\t".join(map(copy_value, row)) + "\n" for row in rows))
+        quoted = ", ".join(f'"{column}"' for column in columns)
+        with dbapi_connection.cursor() as cursor:
+            cursor.copy_expert(f"COPY {table} ({quoted}) FROM STDIN WITH (FORMAT text)", buffer)
+    else:
+        conn.execute(ImportBatch.metadata.tables[table].insert(), [dict(zip(columns, row)) for row in rows])
+
+
+def load_batches(conn, items, source: str, batch_size: int, user_id: str = None):
+    """
+    Load the recipes batch by batch, skipping batches recorded for this source.
+
+    Args:
+        conn (Connection): A connection without an open transaction.
+        items (Iterable[dict]): The parsed recipes.
+        source (str): The name the batches are recorded under.
+        batch_size (int): The number of recipes per batch and transaction.
+        user_id (str, optional): The author of recipes without a userId.
+
+    Returns:
+        tuple[int, int]: The number of batches and rows loaded by this call.
+    """
+
+    done = set(conn.execute(select(ImportBatch.batch).where(ImportBatch.source == source)).scalars())
+    ingredient_ids = dict(conn.execute(select(Ingredient.name, Ingredient.ingredientId)).all())
+    category_ids = dict(conn.execute(select(Category.name, Category.categoryId)).all())
+    conn.commit()
+
+    loaded_batches = loaded_rows = 0
+    started = time.monotonic()
+    items = iter(items)
+    for batch in itertools.count(1):
+        chunk = list(itertools.islice(items, batch_size))
+        if not chunk:
+            break
+        if batch in done:
+            print(f"batch {batch}: already loaded, skipped")
+            continue
+        # one explicit transaction per batch: COPY goes through the driver
+        # connection, outside of SQLAlchemy's lazily started transaction
+        with conn.begin():
+            resolve_names(conn, Ingredient, {name for item in chunk for name, amount, unit in item["ingredients"]}, ingredient_ids)
+            resolve_names(conn, Category, {name for item in chunk for name in item["categories"]}, category_ids)
+            rows = batch_rows(chunk, ingredient_ids, category_ids, user_id)
+            count = sum(len(table_rows) for table_rows in rows.values())
+            # recorded first, so the driver has started the transaction before the
+            # first COPY, and a concurrent import of the same source waits on the
+            # row instead of copying the batch twice
+            conn.execute(insert(ImportBatch).values(source=source, batch=batch, rows=count))
+            for table, table_rows in rows.items():
+                copy_rows(conn, table, table_rows)
+
+        loaded_batches += 1
+        loaded_rows += count
+        elapsed = time.monotonic() - started
+        print(f"batch {batch}: {len(chunk)} recipes, {count} rows, {loaded_rows / max(elapsed, 1e-9):.0f} rows/s")
+    return loaded_batches, loaded_rows
+
+
+async def load(items, source: str, batch_size: int = 1000, user_id: str = None):
+    if DB_ASYNC:
+        async with get_engine().connect() as conn:
+            return await conn.run_sync(load_batches, items, source, batch_size, user_id)
+
+    def run():
+        with get_engine().connect() as conn:
+            return load_batches(conn, items, source, batch_size, user_id)
+
+    return await run_in_threadpool(run)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m db.load", description="Bulk import recipes from NDJSON or CSV.")
+    parser.add_argument("file", help="input file, - for stdin")
+    parser.add_argument("--format", choices=["ndjson", "csv"], help="input format, guessed from the file extension by default")
+    parser.add_argument("--batch-size", type=int, default=1000, help="recipes per batch and transaction")
+    parser.add_argument("--source", help="name the loaded batches are recorded under, defaults to the file name")
+    parser.add_argument("--user-id", help="author of recipes without a userId")
+    args = parser.parse_args(argv)
+
+    input_format = args.format or ("csv" if args.file.endswith(".csv") else "ndjson")
+    source = args.source or os.path.basename(args.file)
+    with (sys.stdin if args.file == "-" else open(args.file, newline="", encoding="utf-8")) as f:
+        items = read_csv(f) if input_format == "csv" else read_ndjson(f)
+        started = time.monotonic()
+        batches, rows = asyncio.run(load(items, source, args.batch_size, args.user_id))
+    elapsed = time.monotonic() - started
+    print(f"loaded {batches} batches, {rows} rows in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Versioned schema migrations.
+
+Run with ``python -m db.migrate``. Applied versions are recorded in the
+schema_migrations table, so each migration runs exactly once per database.
+Statements are written for PostgreSQL and are idempotent, so databases whose
+tables were already created from the models can be migrated as well. The
+migrations never read the models: a database built from them has to end up
+with the same schema as Base.metadata.
+"""
+
+import asyncio
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+
+from db.model import SEARCH_VECTOR, RECIPE_STARS
+from db.session import get_engine, DB_ASYNC
+
+
+MIGRATIONS = [
+    # the schema as the models created it before migrations existed, frozen;
+    # every later change to the models needs a migration of its own
+    (1, "initial schema", [
+        '''CREATE TABLE IF NOT EXISTS users (
+               "userId" VARCHAR NOT NULL PRIMARY KEY,
+               email VARCHAR NOT NULL UNIQUE,
+               "firstName" VARCHAR NOT NULL,
+               "lastName" VARCHAR NOT NULL
+           )''',
+        '''CREATE TABLE IF NOT EXISTS recipes (
+               "recipeId" UUID NOT NULL PRIMARY KEY,
+               title VARCHAR NOT NULL,
+               description VARCHAR NOT NULL,
+               "cookingTime" INTEGER NOT NULL,
+               "preparationTime" INTEGER NOT NULL,
+               "imagePath" VARCHAR NOT NULL,
+               "userId" VARCHAR NOT NULL REFERENCES users ("userId") ON DELETE CASCADE
+           )''',
+        '''CREATE TABLE IF NOT EXISTS ingredients (
+               "ingredientId" UUID NOT NULL PRIMARY KEY,
+               name VARCHAR NOT NULL
+           )''',
+        '''CREATE TABLE IF NOT EXISTS categories (
+               "categoryId" UUID NOT NULL PRIMARY KEY,
+               name VARCHAR NOT NULL
+           )''',
+        '''CREATE TABLE IF NOT EXISTS recipe_ingredients (
+               "recipeId" UUID NOT NULL REFERENCES recipes ("recipeId") ON DELETE CASCADE,
+               "ingredientId" UUID NOT NULL REFERENCES ingredients ("ingredientId") ON DELETE CASCADE,
+               amount INTEGER NOT NULL,
+               unit VARCHAR NOT NULL,
+               PRIMARY KEY ("recipeId", "ingredientId")
+           )''',
+        '''CREATE TABLE IF NOT EXISTS preparation_steps (
+               "stepId" UUID NOT NULL PRIMARY KEY,
+               "stepNumber" INTEGER NOT NULL,
+               description VARCHAR NOT NULL,
+               "recipeId" UUID NOT NULL REFERENCES recipes ("recipeId") ON DELETE CASCADE
+           )''',
+        '''CREATE TABLE IF NOT EXISTS recipes_categories (
+               "recipeId" UUID NOT NULL REFERENCES recipes ("recipeId") ON DELETE CASCADE,
+               "categoryId" UUID NOT NULL REFERENCES categories ("categoryId") ON DELETE CASCADE,
+               PRIMARY KEY ("recipeId", "categoryId")
+           )''',
+        '''CREATE TABLE IF NOT EXISTS ratings (
+               "recipeId" UUID NOT NULL REFERENCES recipes ("recipeId") ON DELETE CASCADE,
+               "userId" VARCHAR NOT NULL REFERENCES users ("userId") ON DELETE CASCADE,
+               stars INTEGER NOT NULL,
+               PRIMARY KEY ("recipeId", "userId")
+           )''',
+    ]),
+    (2, "rating aggregates on recipes", [
+        'ALTER TABLE recipes ADD COLUMN IF NOT EXISTS "ratingSum" INTEGER NOT NULL DEFAULT 0',
+        'ALTER TABLE recipes ADD COLUMN IF NOT EXISTS "ratingCount" INTEGER NOT NULL DEFAULT 0',
+        '''UPDATE recipes SET "ratingSum" = totals.rating_sum, "ratingCount" = totals.rating_count
+           FROM (SELECT "recipeId", sum(stars) AS rating_sum, count(*) AS rating_count FROM ratings GROUP BY "recipeId") AS totals
+           WHERE recipes."recipeId" = totals."recipeId"''',
+    ]),
+    (3, "foreign key and lookup indexes", [
+        'CREATE INDEX IF NOT EXISTS "ix_recipes_userId" ON recipes ("userId")',
+        'CREATE INDEX IF NOT EXISTS "ix_recipes_title_recipeId" ON recipes (title, "recipeId")',
+        'CREATE INDEX IF NOT EXISTS "ix_preparation_steps_recipeId" ON preparation_steps ("recipeId")',
+        'CREATE INDEX IF NOT EXISTS "ix_ratings_userId" ON ratings ("userId")',
+        'CREATE INDEX IF NOT EXISTS "ix_recipes_categories_categoryId" ON recipes_categories ("categoryId")',
+        'CREATE INDEX IF NOT EXISTS "ix_recipe_ingredients_ingredientId" ON recipe_ingredients ("ingredientId")',
+        # fails if duplicate names exist, they have to be merged by hand first
+        'CREATE UNIQUE INDEX IF NOT EXISTS ingredients_name_key ON ingredients (name)',
+        'CREATE UNIQUE INDEX IF NOT EXISTS categories_name_key ON categories (name)',
+    ]),
+    (4, "full-text search", [
+        'ALTER TABLE recipes ADD COLUMN IF NOT EXISTS "stepsText" VARCHAR NOT NULL DEFAULT \'\'',
+        '''UPDATE recipes SET "stepsText" = steps.text
+           FROM (SELECT "recipeId", string_agg(description, ' ' ORDER BY "stepNumber") AS text FROM preparation_steps GROUP BY "recipeId") AS steps
+           WHERE recipes."recipeId" = steps."recipeId"''',
+        f'ALTER TABLE recipes ADD COLUMN IF NOT EXISTS "searchVector" TSVECTOR GENERATED ALWAYS AS ({SEARCH_VECTOR}) STORED',
+        'CREATE INDEX IF NOT EXISTS "ix_recipes_searchVector" ON recipes USING gin ("searchVector")',
+    ]),
+    (5, "import progress", [
+        'CREATE TABLE IF NOT EXISTS import_batches (source VARCHAR NOT NULL, batch INTEGER NOT NULL, rows INTEGER NOT NULL, PRIMARY KEY (source, batch))',
+    ]),
+    (6, "recipe versions", [
+        'ALTER TABLE recipes ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1',
+        'ALTER TABLE recipes ADD COLUMN IF NOT EXISTS "updatedAt" TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()',
+    ]),
+    (7, "name prefix indexes", [
+        'CREATE INDEX IF NOT EXISTS "ix_ingredients_name_prefix" ON ingredients (lower(name) text_pattern_ops)',
+        'CREATE INDEX IF NOT EXISTS "ix_categories_name_prefix" ON categories (lower(name) text_pattern_ops)',
+    ]),
+    (8, "ingredient similarity search", [
+        'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+        'CREATE INDEX IF NOT EXISTS "ix_ingredients_name_trgm" ON ingredients USING gin (lower(name) gin_trgm_ops)',
+    ]),
+    (9, "unique step numbers", [
+        # renumber the steps of recipes that have duplicate step numbers, keeping their order
+        '''UPDATE preparation_steps SET "stepNumber" = numbered.position
+           FROM (SELECT "stepId", row_number() OVER (PARTITION BY "recipeId" ORDER BY "stepNumber", "stepId") AS position
+                 FROM preparation_steps
+                 WHERE "recipeId" IN (SELECT "recipeId" FROM preparation_steps GROUP BY "recipeId", "stepNumber" HAVING count(*) > 1)) AS numbered
+           WHERE preparation_steps."stepId" = numbered."stepId"''',
+        '''DO $$ BEGIN
+               IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'uq_preparation_steps_recipeId_stepNumber') THEN
+                   ALTER TABLE preparation_steps ADD CONSTRAINT "uq_preparation_steps_recipeId_stepNumber"
+                       UNIQUE ("recipeId", "stepNumber") DEFERRABLE INITIALLY DEFERRED;
+               END IF;
+           END $$''',
+    ]),
+    (10, "stars sort index", [
+        f'CREATE INDEX IF NOT EXISTS "ix_recipes_stars_recipeId" ON recipes ({RECIPE_STARS}, "recipeId")',
+    ]),
+]
+
+
+def apply_migrations(conn):
+    """
+    Apply all migrations that are not recorded yet.
+
+    Args:
+        conn (Connection): A connection inside a transaction.
+
+    Returns:
+        list[int]: The versions applied by this call.
+    """
+
+    conn.execute(text("CREATE TABLE IF NOT EXISTS schema_migrations (version INTEGER PRIMARY KEY, name VARCHAR NOT NULL)"))
+    applied = set(conn.execute(text("SELECT version FROM schema_migrations")).scalars())
+    new_versions = []
+    for version, name, steps in MIGRATIONS:
+        if version in applied:
+            continue
+        for step in steps:
+            if callable(step):
+                step(conn)
+            else:
+                conn.execute(text(step))
+        conn.execute(text("INSERT INTO schema_migrations (version, name) VALUES (:version, :name)"), {"version": version, "name": name})
+        new_versions.append(version)
+    return new_versions
+
+
+async def migrate():
+    if DB_ASYNC:
+        async with get_engine().begin() as conn:
+            return await conn.run_sync(apply_migrations)
+
+    def run():
+        with get_engine().begin() as conn:
+            return apply_migrations(conn)
+
+    return await run_in_threadpool(run)
+
+
+if __name__ == "__main__":
+    versions = asyncio.run(migrate())
+    print(f"applied migrations: {versions}" if versions else "database is up to date")
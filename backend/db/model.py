@@ -1,7 +1,8 @@
-from sqlalchemy import Integer, String, ForeignKey, UUID
+from sqlalchemy import Integer, String, DateTime, ForeignKey, UUID, Index, UniqueConstraint, Computed, func, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import declarative_base, Mapped, mapped_column, relationship
-from db.session import engine
 from typing import List
+from datetime import datetime
 from enum import Enum as pyenum
 import uuid
 
@@ -17,6 +18,12 @@ class Unit(str, pyenum):
     ML = "ml"
     ZWEIG = "Zweig"
 
+# German stemming, recipes are written in German
+SEARCH_VECTOR = """to_tsvector('german', coalesce(title, '') || ' ' || coalesce(description, '') || ' ' || coalesce("stepsText", ''))"""
+# average rating, must stay identical to crud.recipe_stars so the index matches the "stars" sort
+RECIPE_STARS = 'coalesce(CAST("ratingSum" AS NUMERIC) / nullif("ratingCount", 0), 0)'
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -31,6 +38,13 @@ class User(Base):
 
 class Recipe(Base):
     __tablename__ = "recipes"
+    __table_args__ = (
+        # keyset pagination ordered by title
+        Index("ix_recipes_title_recipeId", "title", "recipeId"),
+        # keyset pagination ordered by stars, scanned backwards for the descending order
+        Index("ix_recipes_stars_recipeId", text(RECIPE_STARS), "recipeId"),
+        Index("ix_recipes_searchVector", "searchVector", postgresql_using="gin"),
+    )
 
     recipeId: Mapped[UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     title: Mapped[str] = mapped_column(String)
@@ -38,17 +52,33 @@ class Recipe(Base):
     cookingTime: Mapped[int] = mapped_column(Integer)
     preparationTime: Mapped[int] = mapped_column(Integer)
     imagePath: Mapped[str] = mapped_column(String)
-    userId: Mapped[str] = mapped_column(String, ForeignKey("users.userId", ondelete="CASCADE"))
+    userId: Mapped[str] = mapped_column(String, ForeignKey("users.userId", ondelete="CASCADE"), index=True)
+    # maintained by crud on every rating write, see crud.repair_rating_aggregates
+    ratingSum: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    ratingCount: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    # descriptions of all preparation steps, maintained by crud for the full-text search
+    stepsText: Mapped[str] = mapped_column(String, default="", server_default="", deferred=True)
+    searchVector: Mapped[str] = mapped_column(TSVECTOR, Computed(SEARCH_VECTOR, persisted=True), nullable=True, deferred=True)
+    # bumped by crud on every write to the recipe or its children, used for ETag and Last-Modified
+    version: Mapped[int] = mapped_column(Integer, default=1, server_default="1")
+    updatedAt: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=func.now(), server_default=func.now())
 
     user: Mapped["User"] = relationship("User", back_populates="recipes")
     ingredients: Mapped[List["RecipeIngredient"]] = relationship("RecipeIngredient", back_populates="recipe", cascade="all, delete")
-    steps: Mapped[List["PreparationStep"]] = relationship("PreparationStep", back_populates="recipe", cascade="all, delete")
+    steps: Mapped[List["PreparationStep"]] = relationship("PreparationStep", back_populates="recipe", cascade="all, delete", order_by="PreparationStep.stepNumber")
     categories: Mapped[List["RecipeCategory"]] = relationship("RecipeCategory", back_populates="recipe", cascade="all, delete")
     ratings: Mapped[List["Rating"]] = relationship("Rating", back_populates="recipe", cascade="all, delete")
 
 
 class Ingredient(Base):
     __tablename__ = "ingredients"
+    __table_args__ = (
+        # case-insensitive ?name_prefix= filter, LIKE 'abc%' only uses text_pattern_ops indexes
+        # created as a plain unique index by migration 3
+        Index("ingredients_name_key", "name", unique=True),
+        Index("ix_ingredients_name_prefix", text("lower(name) text_pattern_ops")),
+        # the pg_trgm index for typo-tolerant suggestions is only created by migration 8, after the extension
+    )
 
     ingredientId: Mapped[UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name: Mapped[str] = mapped_column(String)
@@ -60,7 +90,7 @@ class RecipeIngredient(Base):
     __tablename__ = "recipe_ingredients"
 
     recipeId: Mapped[UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("recipes.recipeId", ondelete="CASCADE"), primary_key=True)
-    ingredientId: Mapped[UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("ingredients.ingredientId", ondelete="CASCADE"), primary_key=True)
+    ingredientId: Mapped[UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("ingredients.ingredientId", ondelete="CASCADE"), primary_key=True, index=True)
     amount: Mapped[int] = mapped_column(Integer)
     unit: Mapped[Unit] = mapped_column(String)
 
@@ -70,17 +100,25 @@ class RecipeIngredient(Base):
 
 class PreparationStep(Base):
     __tablename__ = "preparation_steps"
+    __table_args__ = (
+        # checked at commit, so steps can be renumbered in place within one transaction
+        UniqueConstraint("recipeId", "stepNumber", name="uq_preparation_steps_recipeId_stepNumber", deferrable=True, initially="DEFERRED"),
+    )
 
     stepId: Mapped[UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     stepNumber: Mapped[int] = mapped_column(Integer)
     description: Mapped[str] = mapped_column(String)
-    recipeId: Mapped[UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("recipes.recipeId", ondelete="CASCADE"))
+    recipeId: Mapped[UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("recipes.recipeId", ondelete="CASCADE"), index=True)
 
     recipe: Mapped["Recipe"] = relationship("Recipe", back_populates="steps")
 
 
 class Category(Base):
     __tablename__ = "categories"
+    __table_args__ = (
+        Index("categories_name_key", "name", unique=True),
+        Index("ix_categories_name_prefix", text("lower(name) text_pattern_ops")),
+    )
 
     categoryId: Mapped[UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name: Mapped[str] = mapped_column(String)
@@ -92,7 +130,7 @@ class RecipeCategory(Base):
     __tablename__ = "recipes_categories"
 
     recipeId: Mapped[UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("recipes.recipeId", ondelete="CASCADE"), primary_key=True)
-    categoryId: Mapped[UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("categories.categoryId", ondelete="CASCADE"), primary_key=True)
+    categoryId: Mapped[UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("categories.categoryId", ondelete="CASCADE"), primary_key=True, index=True)
 
     recipe: Mapped["Recipe"] = relationship("Recipe", back_populates="categories")
     category: Mapped["Category"] = relationship("Category", back_populates="recipes")
@@ -102,11 +140,17 @@ class Rating(Base):
     __tablename__ = "ratings"
 
     recipeId: Mapped[UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("recipes.recipeId", ondelete="CASCADE"), primary_key=True)
-    userId: Mapped[str] = mapped_column(String, ForeignKey("users.userId", ondelete="CASCADE"), primary_key=True)
+    userId: Mapped[str] = mapped_column(String, ForeignKey("users.userId", ondelete="CASCADE"), primary_key=True, index=True)
     stars: Mapped[int] = mapped_column(Integer)
 
     recipe: Mapped["Recipe"] = relationship("Recipe", back_populates="ratings")
     user: Mapped["User"] = relationship("User", back_populates="ratings")
 
 
-Base.metadata.create_all(engine)
+class ImportBatch(Base):
+    __tablename__ = "import_batches"
+
+    # batches loaded by db.load, recorded in the same transaction so an interrupted import can be resumed
+    source: Mapped[str] = mapped_column(String, primary_key=True)
+    batch: Mapped[int] = mapped_column(Integer, primary_key=True)
+    rows: Mapped[int] = mapped_column(Integer)
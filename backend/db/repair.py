@@ -0,0 +1,24 @@
+"""
+Recompute the rating aggregates stored on recipes from the ratings table.
+
+Run with ``python -m db.repair`` if the stored values are suspected to be
+out of sync, e.g. after ratings were edited directly in the database.
+"""
+
+import asyncio
+
+from crud import crud
+from db.session import new_session
+
+
+async def repair():
+    session = new_session()
+    try:
+        return await crud.repair_rating_aggregates(session)
+    finally:
+        await session.close()
+
+
+if __name__ == "__main__":
+    fixed = asyncio.run(repair())
+    print(f"corrected rating aggregates of {fixed} recipes")
@@ -1,17 +1,194 @@
 import os
 
 from sqlalchemy import (
-    MetaData,
-    create_engine
+    create_engine,
+    make_url
 )
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from starlette.concurrency import run_in_threadpool
 
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-# SQLAlchemy
-engine = create_engine(DATABASE_URL)
-metadata = MetaData()
+# asyncpg is used by default, DB_ASYNC=false falls back to the blocking psycopg2 driver
+DB_ASYNC = os.getenv("DB_ASYNC", "true").lower() in ("1", "true", "yes")
 
-Session = sessionmaker(bind=engine)
-session = Session()
+# connection pool, tunable per deployment (one pool per uvicorn worker)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+pool_options = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_recycle": DB_POOL_RECYCLE,
+    "pool_pre_ping": DB_POOL_PRE_PING,
+}
+
+
+def async_url(url: str):
+    """
+    Rewrite a postgres URL so it uses the asyncpg driver.
+
+    Args:
+        url (str): The configured database URL, e.g. postgresql://user:pw@db/name.
+
+    Returns:
+        URL: The same URL with the postgresql+asyncpg driver.
+    """
+
+    db_url = make_url(url)
+    if db_url.get_backend_name() == "postgresql":
+        db_url = db_url.set(drivername="postgresql+asyncpg")
+    return db_url
+
+
+class SyncStreamResult:
+    """
+    Awaitable wrapper around a streamed Result, see SyncSession.stream.
+    """
+
+    def __init__(self, result):
+        self.result = result
+
+    async def partitions(self, size: int = None):
+        partitions = self.result.partitions(size)
+        while True:
+            partition = await run_in_threadpool(next, partitions, None)
+            if partition is None:
+                break
+            yield partition
+
+    async def close(self):
+        await run_in_threadpool(self.result.close)
+
+
+class SyncSession:
+    """
+    Awaitable wrapper around a blocking Session.
+
+    Exposes the subset of the AsyncSession interface used by crud, so the
+    crud layer is written once and still works with DB_ASYNC=false. Blocking
+    calls run in the threadpool to keep the event loop free.
+    """
+
+    def __init__(self, session):
+        self.sync_session = session
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    def add_all(self, instances):
+        self.sync_session.add_all(instances)
+
+    async def execute(self, statement, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.execute, statement, *args, **kwargs)
+
+    async def scalar(self, statement, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalar, statement, *args, **kwargs)
+
+    async def stream(self, statement, *args, **kwargs):
+        result = await run_in_threadpool(self.sync_session.execute, statement, *args, **kwargs)
+        return SyncStreamResult(result)
+
+    async def scalars(self, statement, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalars, statement, *args, **kwargs)
+
+    async def get(self, entity, ident, **kwargs):
+        return await run_in_threadpool(self.sync_session.get, entity, ident, **kwargs)
+
+    async def delete(self, instance):
+        await run_in_threadpool(self.sync_session.delete, instance)
+
+    async def flush(self):
+        await run_in_threadpool(self.sync_session.flush)
+
+    async def refresh(self, instance, *args, **kwargs):
+        await run_in_threadpool(self.sync_session.refresh, instance, *args, **kwargs)
+
+    async def commit(self):
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self):
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def close(self):
+        await run_in_threadpool(self.sync_session.close)
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await run_in_threadpool(fn, self.sync_session, *args, **kwargs)
+
+
+# SQLAlchemy, created on first use so importing the app needs no database
+engine = None
+Session = None
+
+
+def get_engine():
+    """
+    Return the engine of the configured driver, creating it on first use.
+
+    Returns:
+        AsyncEngine | Engine: The application-wide engine.
+    """
+
+    global engine, Session
+    if engine is None:
+        if DB_ASYNC:
+            engine = create_async_engine(async_url(DATABASE_URL), **pool_options)
+            Session = async_sessionmaker(bind=engine, expire_on_commit=False)
+        else:
+            engine = create_engine(DATABASE_URL, **pool_options)
+            Session = sessionmaker(bind=engine, expire_on_commit=False)
+    return engine
+
+
+async def dispose_engine():
+    global engine, Session
+    if engine is None:
+        return
+    if DB_ASYNC:
+        await engine.dispose()
+    else:
+        await run_in_threadpool(engine.dispose)
+    engine = None
+    Session = None
+
+
+def new_session():
+    """
+    Open a new session for the configured driver.
+
+    Returns:
+        AsyncSession | SyncSession: A session whose methods can be awaited.
+    """
+
+    get_engine()
+    if DB_ASYNC:
+        return Session()
+    return SyncSession(Session())
+
+
+async def get_session():
+    """
+    FastAPI dependency providing one session per request.
+
+    The session is rolled back if the request fails and is always closed
+    afterwards, which returns its connection to the pool.
+
+    Yields:
+        AsyncSession | SyncSession: The request-scoped database session.
+    """
+
+    session = new_session()
+    try:
+        yield session
+    except Exception:
+        await session.rollback()
+        raise
+    finally:
+        await session.close()
@@ -2,9 +2,17 @@ import pytest
 from starlette.testclient import TestClient
 
 from api.main import app
+from db.session import get_session
+
+
+def override_get_session():
+    # crud is monkeypatched in the tests, so no database session is needed
+    yield None
 
 
 @pytest.fixture(scope="module")
 def test_app():
+    app.dependency_overrides[get_session] = override_get_session
     client = TestClient(app)
     yield client  # testing happens here
+    app.dependency_overrides.clear()
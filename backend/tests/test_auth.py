@@ -0,0 +1,267 @@
+import asyncio
+import httpx
+import json
+import pytest
+import rsa
+import time
+from fastapi import HTTPException
+from jose import jwk, jwt
+
+import api.users as users
+from api.auth import TokenCache, JWKSKeySet
+
+
+class MockResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class MockAsyncClient:
+    def __init__(self, status_code, calls):
+        self.status_code = status_code
+        self.calls = calls
+
+    async def get(self, url, headers):
+        self.calls.append(url)
+        return MockResponse(self.status_code)
+
+
+def make_token(exp):
+    return jwt.encode({"sub": "123", "aud": "audience", "exp": exp}, "secret", algorithm="HS256")
+
+
+def test01_cache_hit_and_miss():
+    cache = TokenCache(ttl=60, negative_ttl=5, max_size=10)
+    token = make_token(int(time.time()) + 3600)
+
+    assert cache.get(token) is None
+    cache.set(token, True)
+
+    assert cache.get(token) is True
+    assert cache.stats() == {"size": 1, "hits": 1, "misses": 1, "evictions": 0}
+
+
+def test02_cache_expires_at_exp_claim():
+    cache = TokenCache(ttl=3600, negative_ttl=5, max_size=10)
+    token = make_token(int(time.time()) + 1)
+    cache.set(token, True)
+
+    valid, expires_at = cache.entries[cache.key(token)]
+    assert expires_at <= time.time() + 1
+
+
+def test03_cache_skips_expired_token():
+    cache = TokenCache(ttl=60, negative_ttl=5, max_size=10)
+    token = make_token(1600000000)
+    cache.set(token, True)
+
+    assert cache.get(token) is None
+    assert cache.stats()["size"] == 0
+
+
+def test04_cache_evicts_least_recently_used():
+    cache = TokenCache(ttl=60, negative_ttl=5, max_size=2)
+    cache.set("token1", True)
+    cache.set("token2", True)
+    cache.get("token1")
+    cache.set("token3", True)
+
+    assert cache.get("token2") is None
+    assert cache.get("token1") is True
+    assert cache.stats()["evictions"] == 1
+
+
+def test05_cache_expired_entry_is_evicted():
+    cache = TokenCache(ttl=60, negative_ttl=5, max_size=10)
+    cache.set("token", False)
+    cache.entries[cache.key("token")] = (False, time.time() - 1)
+
+    assert cache.get("token") is None
+    assert cache.stats()["evictions"] == 1
+
+
+def test06_validate_token_calls_upstream_once(monkeypatch):
+    calls = []
+    monkeypatch.setattr(users, "token_cache", TokenCache(ttl=60, negative_ttl=5, max_size=10))
+    monkeypatch.setattr(users.auth, "http_client", MockAsyncClient(200, calls))
+    token = make_token(int(time.time()) + 3600)
+
+    assert asyncio.run(users.validate_token(token)) is True
+    assert asyncio.run(users.validate_token(token)) is True
+    assert len(calls) == 1
+
+
+def test07_validate_token_caches_invalid_token(monkeypatch):
+    calls = []
+    monkeypatch.setattr(users, "token_cache", TokenCache(ttl=60, negative_ttl=5, max_size=10))
+    monkeypatch.setattr(users.auth, "http_client", MockAsyncClient(401, calls))
+
+    assert asyncio.run(users.validate_token("invalid")) is False
+    assert asyncio.run(users.validate_token("invalid")) is False
+    assert len(calls) == 1
+
+
+def make_key_set(tmp_path, kid="key1"):
+    pub, priv = rsa.newkeys(1024)
+    private_key = priv.save_pkcs1().decode()
+    public_jwk = jwk.construct(private_key, "RS256").public_key().to_dict()
+    public_jwk["kid"] = kid
+    path = tmp_path / "jwks.json"
+    path.write_text(json.dumps({"keys": [public_jwk]}))
+    return private_key, JWKSKeySet(path=str(path), refresh_interval=60)
+
+
+def make_signed_token(private_key, kid="key1", aud="api://kochrezepte", iss="https://login.example.com", exp=None):
+    claims = {"sub": "123", "aud": aud, "iss": iss, "exp": exp or int(time.time()) + 3600}
+    return jwt.encode(claims, private_key, algorithm="RS256", headers={"kid": kid})
+
+
+def test08_jwks_verify_valid_token(tmp_path):
+    private_key, key_set = make_key_set(tmp_path)
+    token = make_signed_token(private_key)
+
+    assert asyncio.run(key_set.verify(token, "api://kochrezepte", "https://login.example.com")) is True
+
+
+def test09_jwks_verify_rejects_wrong_audience_issuer_and_expiry(tmp_path):
+    private_key, key_set = make_key_set(tmp_path)
+
+    assert asyncio.run(key_set.verify(make_signed_token(private_key, aud="other"), "api://kochrezepte", "https://login.example.com")) is False
+    assert asyncio.run(key_set.verify(make_signed_token(private_key, iss="other"), "api://kochrezepte", "https://login.example.com")) is False
+    assert asyncio.run(key_set.verify(make_signed_token(private_key, exp=1600000000), "api://kochrezepte", "https://login.example.com")) is False
+    assert asyncio.run(key_set.verify("invalid", "api://kochrezepte", "https://login.example.com")) is False
+
+
+def test10_jwks_verify_rejects_foreign_signature(tmp_path):
+    private_key, key_set = make_key_set(tmp_path)
+    (tmp_path / "foreign").mkdir()
+    foreign_key, _ = make_key_set(tmp_path / "foreign")
+    token = make_signed_token(foreign_key)
+
+    assert asyncio.run(key_set.verify(token, "api://kochrezepte", "https://login.example.com")) is False
+
+
+def test11_jwks_reloads_on_unknown_kid(tmp_path):
+    private_key, key_set = make_key_set(tmp_path)
+    asyncio.run(key_set.load())
+    new_key, _ = make_key_set(tmp_path, kid="key2")
+    key_set.loaded_at -= 60
+    token = make_signed_token(new_key, kid="key2")
+
+    assert asyncio.run(key_set.verify(token, "api://kochrezepte", "https://login.example.com")) is True
+
+
+def test12_jwks_unknown_kid_reload_is_rate_limited(tmp_path):
+    private_key, key_set = make_key_set(tmp_path)
+    asyncio.run(key_set.load())
+    new_key, _ = make_key_set(tmp_path, kid="key2")
+    token = make_signed_token(new_key, kid="key2")
+
+    assert asyncio.run(key_set.verify(token, "api://kochrezepte", "https://login.example.com")) is False
+
+
+def test13_validate_token_jwks_mode(monkeypatch, tmp_path):
+    private_key, key_set = make_key_set(tmp_path)
+    monkeypatch.setattr(users.auth, "AUTH_MODE", "jwks")
+    monkeypatch.setattr(users.auth, "jwks", key_set)
+    monkeypatch.setattr(users.auth, "JWT_AUDIENCE", "api://kochrezepte")
+    monkeypatch.setattr(users.auth, "JWT_ISSUER", "https://login.example.com")
+    monkeypatch.setattr(users.auth, "http_client", None)
+
+    assert asyncio.run(users.validate_token(make_signed_token(private_key))) is True
+
+
+def test14_shared_http_client_is_reused(monkeypatch):
+    monkeypatch.setattr(users.auth, "http_client", None)
+    client = users.auth.get_http_client()
+
+    assert users.auth.get_http_client() is client
+
+    asyncio.run(users.auth.close_http_client())
+    assert users.auth.http_client is None
+
+
+def test15_validate_token_does_not_cache_upstream_errors(monkeypatch):
+    calls = []
+    monkeypatch.setattr(users, "token_cache", TokenCache(ttl=60, negative_ttl=5, max_size=10))
+    monkeypatch.setattr(users.auth, "http_client", MockAsyncClient(429, calls))
+    token = make_token(int(time.time()) + 3600)
+
+    for _ in range(2):
+        with pytest.raises(HTTPException) as e:
+            asyncio.run(users.validate_token(token))
+        assert e.value.status_code == 503
+    assert len(calls) == 2
+    assert users.token_cache.stats()["size"] == 0
+
+
+def test16_validate_token_caches_forbidden(monkeypatch):
+    calls = []
+    monkeypatch.setattr(users, "token_cache", TokenCache(ttl=60, negative_ttl=5, max_size=10))
+    monkeypatch.setattr(users.auth, "http_client", MockAsyncClient(403, calls))
+
+    assert asyncio.run(users.validate_token("forbidden")) is False
+    assert asyncio.run(users.validate_token("forbidden")) is False
+    assert len(calls) == 1
+
+
+def test17_jwks_concurrent_unknown_kid_loads_once(tmp_path):
+    private_key, key_set = make_key_set(tmp_path)
+    token = make_signed_token(private_key)
+    fetches = []
+    fetch = key_set.fetch
+
+    async def slow_fetch():
+        fetches.append(1)
+        await asyncio.sleep(0.01)
+        return await fetch()
+
+    key_set.fetch = slow_fetch
+
+    async def verify_all():
+        return await asyncio.gather(*[key_set.verify(token, "api://kochrezepte", "https://login.example.com") for _ in range(10)])
+
+    assert asyncio.run(verify_all()) == [True] * 10
+    assert len(fetches) == 1
+
+
+class TimeoutAsyncClient:
+    async def get(self, url, headers=None):
+        raise httpx.ConnectTimeout("timed out")
+
+
+def test18_validate_token_upstream_timeout_is_503(monkeypatch):
+    monkeypatch.setattr(users, "token_cache", TokenCache(ttl=60, negative_ttl=5, max_size=10))
+    monkeypatch.setattr(users.auth, "http_client", TimeoutAsyncClient())
+
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(users.validate_token("token"))
+    assert e.value.status_code == 503
+    assert users.token_cache.stats()["size"] == 0
+
+
+def test19_validate_token_jwks_endpoint_down_is_503(monkeypatch):
+    monkeypatch.setattr(users.auth, "AUTH_MODE", "jwks")
+    monkeypatch.setattr(users.auth, "jwks", JWKSKeySet(url="https://login.example.com/keys"))
+    monkeypatch.setattr(users.auth, "http_client", TimeoutAsyncClient())
+
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(users.validate_token(make_token(int(time.time()) + 3600)))
+    assert e.value.status_code == 503
+
+
+def test20_validate_token_broken_jwks_file_is_503(monkeypatch, tmp_path):
+    monkeypatch.setattr(users.auth, "AUTH_MODE", "jwks")
+    missing = tmp_path / "missing.json"
+    broken = [("no_json.json", "not json"), ("no_keys.json", json.dumps({"no": "keys"})), ("no_kid.json", json.dumps({"keys": [{"kty": "RSA"}]}))]
+    paths = [missing]
+    for name, content in broken:
+        paths.append(tmp_path / name)
+        paths[-1].write_text(content)
+
+    for path in paths:
+        monkeypatch.setattr(users.auth, "jwks", JWKSKeySet(path=str(path)))
+        with pytest.raises(HTTPException) as e:
+            asyncio.run(users.validate_token(make_token(int(time.time()) + 3600)))
+        assert e.value.status_code == 503
+        assert users.auth.jwks.loaded_at is None
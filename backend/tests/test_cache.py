@@ -0,0 +1,98 @@
+import asyncio
+import uuid
+
+import crud.cache as cache_module
+from crud.cache import MemoryCache, cached
+
+
+def test01_memory_cache_get_and_set():
+    cache = MemoryCache(ttl=60, max_size=10)
+
+    assert asyncio.run(cache.get("key")) is None
+    asyncio.run(cache.set("key", {"title": "Suppe"}))
+
+    assert asyncio.run(cache.get("key")) == {"title": "Suppe"}
+
+
+def test02_memory_cache_expires():
+    cache = MemoryCache(ttl=-1, max_size=10)
+    asyncio.run(cache.set("key", "value"))
+
+    assert asyncio.run(cache.get("key")) is None
+    assert len(cache.entries) == 0
+
+
+def test03_memory_cache_evicts_least_recently_used():
+    cache = MemoryCache(ttl=60, max_size=2)
+    asyncio.run(cache.set("key1", 1, ("tag",)))
+    asyncio.run(cache.set("key2", 2))
+    asyncio.run(cache.get("key1"))
+    asyncio.run(cache.set("key3", 3))
+
+    assert asyncio.run(cache.get("key2")) is None
+    assert asyncio.run(cache.get("key1")) == 1
+    assert cache.tags["tag"] == {"key1"}
+
+
+def test04_memory_cache_invalidate_tags():
+    cache = MemoryCache(ttl=60, max_size=10)
+    asyncio.run(cache.set("page1", 1, ("public", "recipes")))
+    asyncio.run(cache.set("page2", 2, ("public", "recipes")))
+    asyncio.run(cache.set("recipe", 3, ("recipes",)))
+
+    asyncio.run(cache.invalidate_tags("public"))
+
+    assert asyncio.run(cache.get("page1")) is None
+    assert asyncio.run(cache.get("page2")) is None
+    assert asyncio.run(cache.get("recipe")) == 3
+
+
+def test05_cached_reads_through(monkeypatch):
+    monkeypatch.setattr(cache_module, "cache", MemoryCache(ttl=60, max_size=10))
+    recipe_id = uuid.uuid4()
+    calls = []
+
+    @cached(lambda recipe_id: f"recipe:{recipe_id}")
+    async def get_recipe(session, recipe_id):
+        calls.append(recipe_id)
+        return {"recipeId": recipe_id}
+
+    assert asyncio.run(get_recipe(None, recipe_id)) == {"recipeId": str(recipe_id)}
+    assert asyncio.run(get_recipe(None, recipe_id)) == {"recipeId": str(recipe_id)}
+    assert len(calls) == 1
+
+
+def test06_cached_skips_none(monkeypatch):
+    monkeypatch.setattr(cache_module, "cache", MemoryCache(ttl=60, max_size=10))
+    calls = []
+
+    @cached(lambda recipe_id: f"recipe:{recipe_id}")
+    async def get_recipe(session, recipe_id):
+        calls.append(recipe_id)
+        return None
+
+    assert asyncio.run(get_recipe(None, "missing")) is None
+    assert asyncio.run(get_recipe(None, "missing")) is None
+    assert len(calls) == 2
+
+
+def test07_cached_late_set_after_new_generation_is_not_served(monkeypatch):
+    cache = MemoryCache(ttl=60, max_size=10)
+    monkeypatch.setattr(cache_module, "cache", cache)
+    pages = ["old", "new"]
+
+    async def page_key():
+        return f"page:{await cache.generation('public')}"
+
+    @cached(page_key)
+    async def get_page(session):
+        page = pages.pop(0)
+        if page == "old":
+            # a write commits and starts a new generation while this read runs
+            await cache.next_generation("public")
+        return page
+
+    assert asyncio.run(get_page(None)) == "old"
+    assert asyncio.run(get_page(None)) == "new"
+    assert asyncio.run(get_page(None)) == "new"
+    assert asyncio.run(cache.generation("public")) == 1
@@ -3,6 +3,7 @@ from jose import jwt
 
 import api.categories as categories
 import uuid
+from fastapi_pagination import Page
 
 def test01_create_category(monkeypatch, test_app):
     cat = {"name": "Test Category"}
@@ -13,7 +14,7 @@ def test01_create_category(monkeypatch, test_app):
     
     monkeypatch.setattr(categories, "validate_token", mock_validate_token)
 
-    async def mock_create_category(category):
+    async def mock_create_category(session, category):
         return res_cat
     
     monkeypatch.setattr(categories.crud, "create_category", mock_create_category)
@@ -32,7 +33,7 @@ def test02_create_category_already_exists(monkeypatch, test_app):
     
     monkeypatch.setattr(categories, "validate_token", mock_validate_token)
 
-    async def mock_create_category(category):
+    async def mock_create_category(session, category):
         return None
     
     monkeypatch.setattr(categories.crud, "create_category", mock_create_category)
@@ -61,7 +62,7 @@ def test04_read_category(monkeypatch, test_app):
     
     monkeypatch.setattr(categories, "validate_token", mock_validate_token)
 
-    async def mock_get_category(category_id):
+    async def mock_get_category(session, category_id):
         return cat
     
     monkeypatch.setattr(categories.crud, "get_category", mock_get_category)
@@ -80,7 +81,7 @@ def test05_read_category_not_found(monkeypatch, test_app):
     
     monkeypatch.setattr(categories, "validate_token", mock_validate_token)
 
-    async def mock_get_category(category_id):
+    async def mock_get_category(session, category_id):
         return None
     
     monkeypatch.setattr(categories.crud, "get_category", mock_get_category)
@@ -99,15 +100,15 @@ def test06_read_categories(monkeypatch, test_app):
     
     monkeypatch.setattr(categories, "validate_token", mock_validate_token)
 
-    async def mock_get_categories():
-        return cats
+    async def mock_get_categories(session, name_prefix):
+        return Page(items=cats, page=1, pages=1, size=50, total=1)
     
     monkeypatch.setattr(categories.crud, "get_categories", mock_get_categories)
 
     response = test_app.get("/categories/", headers={"Content-Type": "application/json", "Authorization": "Bearer invalid"})
 
     assert response.status_code == 200
-    assert response.json() == cats
+    assert response.json() == Page(items=cats, page=1, pages=1, size=50, total=1).dict()
 
 
 def test07_read_categories_invalid_token(test_app):
@@ -127,7 +128,7 @@ def test08_update_category(monkeypatch, test_app):
     
     monkeypatch.setattr(categories, "validate_token", mock_validate_token)
 
-    async def mock_update_category(category_id, category):
+    async def mock_update_category(session, category_id, category):
         return res_cat
 
     monkeypatch.setattr(categories.crud, "update_category", mock_update_category)
@@ -147,7 +148,7 @@ def test09_update_category_not_found(monkeypatch, test_app):
     
     monkeypatch.setattr(categories, "validate_token", mock_validate_token)
 
-    async def mock_update_category(category_id, category):
+    async def mock_update_category(session, category_id, category):
         return None
 
     monkeypatch.setattr(categories.crud, "update_category", mock_update_category)
@@ -177,7 +178,7 @@ def test11_delete_category(monkeypatch, test_app):
     
     monkeypatch.setattr(categories, "validate_token", mock_validate_token)
 
-    async def mock_delete_category(category_id):
+    async def mock_delete_category(session, category_id):
         return cat
     
     monkeypatch.setattr(categories.crud, "delete_category", mock_delete_category)
@@ -196,7 +197,7 @@ def test12_delete_category_not_found(monkeypatch, test_app):
     
     monkeypatch.setattr(categories, "validate_token", mock_validate_token)
 
-    async def mock_delete_category(category_id):
+    async def mock_delete_category(session, category_id):
         return None
     
     monkeypatch.setattr(categories.crud, "delete_category", mock_delete_category)
@@ -211,7 +212,7 @@ def test13_delete_category_invalid_token(monkeypatch, test_app):
     cat_id = str(uuid.uuid4())
     cat = {"categoryId": cat_id, "name": "Test Category"}
 
-    async def mock_delete_category(category_id):
+    async def mock_delete_category(session, category_id):
         return cat
     
     monkeypatch.setattr(categories.crud, "delete_category", mock_delete_category)
@@ -227,7 +228,7 @@ def test14_get_recipes_for_category(monkeypatch, test_app):
     cat_id = str(uuid.uuid4())
     recipes = [{"recipeId": str(uuid.uuid4()), "title": "Test Recipe", "description": "test", "cookingTime": 10, "preparationTime": 10, "imagePath": "test.jpg", "userId": "test"}]
 
-    async def mock_get_category_recipes(category_id):
+    async def mock_get_category_recipes(session, category_id):
         return recipes
 
     monkeypatch.setattr(categories.crud, "get_category_recipes", mock_get_category_recipes)
@@ -235,4 +236,72 @@ def test14_get_recipes_for_category(monkeypatch, test_app):
     response = test_app.get(f"/categories/{cat_id}/recipes/", headers={"Content-Type": "application/json"})
 
     assert response.status_code == 200
-    assert response.json() == recipes
\ No newline at end of file
+    assert response.json() == recipes
+
+
+def test15_create_categories_bulk(monkeypatch, test_app):
+    cats = [{"name": "Kuchen"}, {"name": "Suppen"}]
+    result = {"created": [{"categoryId": str(uuid.uuid4()), "name": "Kuchen"}], "existing": [{"categoryId": str(uuid.uuid4()), "name": "Suppen"}]}
+
+    async def mock_validate_token(token):
+        return 200
+
+    monkeypatch.setattr(categories, "validate_token", mock_validate_token)
+
+    async def mock_create_categories(session, categories):
+        assert [category.name for category in categories] == ["Kuchen", "Suppen"]
+        return result
+
+    monkeypatch.setattr(categories.crud, "create_categories", mock_create_categories)
+
+    response = test_app.post("/categories/bulk", data=json.dumps(cats), headers={"Content-Type": "application/json", "Authorization": "Bearer token"})
+
+    assert response.status_code == 200
+    assert response.json() == result
+
+
+def test16_read_categories_not_modified(monkeypatch, test_app):
+    cats = [{"categoryId": str(uuid.uuid4()), "name": "Test Category"}]
+
+    async def mock_validate_token(token):
+        return 200
+    
+    monkeypatch.setattr(categories, "validate_token", mock_validate_token)
+
+    async def mock_get_categories(session, name_prefix):
+        return Page(items=list(cats), page=1, pages=1, size=50, total=len(cats))
+    
+    monkeypatch.setattr(categories.crud, "get_categories", mock_get_categories)
+
+    response = test_app.get("/categories/", headers={"Authorization": "Bearer token"})
+    etag = response.headers["ETag"]
+
+    response = test_app.get("/categories/", headers={"Authorization": "Bearer token", "If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.content == b""
+
+    cats.append({"categoryId": str(uuid.uuid4()), "name": "Other Category"})
+    response = test_app.get("/categories/", headers={"Authorization": "Bearer token", "If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test17_update_category_name_taken(monkeypatch, test_app):
+    cat = {"name": "Suppen"}
+
+    async def mock_validate_token(token):
+        return 200
+    
+    monkeypatch.setattr(categories, "validate_token", mock_validate_token)
+
+    async def mock_update_category(session, category_id, category):
+        raise ValueError("Name already used")
+
+    monkeypatch.setattr(categories.crud, "update_category", mock_update_category)
+
+    response = test_app.put(f"/categories/{uuid.uuid4()}", data=json.dumps(cat), headers={"Content-Type": "application/json", "Authorization": "Bearer token"})
+
+    assert response.status_code == 409
+    assert response.json() == {"detail": "Category already exists"}
@@ -0,0 +1,56 @@
+import json
+import uuid
+
+import api.export as export
+
+
+class MockSession:
+    def __init__(self):
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+def make_recipe(title):
+    recipe_id = str(uuid.uuid4())
+    return {"recipeId": recipe_id, "title": title, "description": "Test Description", "cookingTime": 30, "preparationTime": 15, "imagePath": "test.jpg", "userId": "testuser", "stars": 3.5, "ratingAmount": 2, "userName": "chef",
+            "steps": [{"stepId": str(uuid.uuid4()), "recipeId": recipe_id, "stepNumber": 1, "description": "Test Step"}],
+            "ingredients": [{"recipeId": recipe_id, "ingredientId": str(uuid.uuid4()), "amount": 100, "unit": "g", "name": "Mehl"}],
+            "categories": [{"categoryId": str(uuid.uuid4()), "name": "Kuchen"}]}
+
+
+def test01_export_recipes(monkeypatch, test_app):
+    batches = [[make_recipe("Recipe 1"), make_recipe("Recipe 2")], [make_recipe("Recipe 3")]]
+    session = MockSession()
+
+    async def mock_validate_token(token):
+        return True
+
+    async def mock_export_recipes(session, batch_size):
+        for batch in batches:
+            yield batch
+
+    monkeypatch.setattr(export, "validate_token", mock_validate_token)
+    monkeypatch.setattr(export, "new_session", lambda: session)
+    monkeypatch.setattr(export.crud, "export_recipes", mock_export_recipes)
+
+    response = test_app.get("/export/recipes.ndjson", headers={"Authorization": "Bearer token"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line) for line in response.text.splitlines()] == batches[0] + batches[1]
+    assert session.closed
+
+
+def test02_export_recipes_invalid_token(monkeypatch, test_app):
+
+    async def mock_validate_token(token):
+        return False
+
+    monkeypatch.setattr(export, "validate_token", mock_validate_token)
+
+    response = test_app.get("/export/recipes.ndjson", headers={"Authorization": "Bearer token"})
+
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Invalid token"}
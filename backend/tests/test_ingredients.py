@@ -3,6 +3,7 @@ from jose import jwt
 
 import api.ingredients as ingredients
 import uuid
+from fastapi_pagination import Page
 
 def test01_create_ingredient(monkeypatch, test_app):
     ing = {"name": "Test Ingredient"}
@@ -13,7 +14,7 @@ def test01_create_ingredient(monkeypatch, test_app):
     
     monkeypatch.setattr(ingredients, "validate_token", mock_validate_token)
 
-    async def mock_create_ingredient(ingredient):
+    async def mock_create_ingredient(session, ingredient):
         return res_ing
     
     monkeypatch.setattr(ingredients.crud, "create_ingredient", mock_create_ingredient)
@@ -32,7 +33,7 @@ def test02_create_ingredient_already_exists(monkeypatch, test_app):
     
     monkeypatch.setattr(ingredients, "validate_token", mock_validate_token)
 
-    async def mock_create_ingredient(ingredient):
+    async def mock_create_ingredient(session, ingredient):
         return None
     
     monkeypatch.setattr(ingredients.crud, "create_ingredient", mock_create_ingredient)
@@ -48,7 +49,7 @@ def test04_read_ingredient(monkeypatch, test_app):
     ing_id = str(uuid.uuid4())
     ing = {"ingredientId": ing_id, "name": "Test Ingredient"}
 
-    async def mock_get_ingredient(ingredient_id):
+    async def mock_get_ingredient(session, ingredient_id):
         return ing
     
     monkeypatch.setattr(ingredients.crud, "get_ingredient", mock_get_ingredient)
@@ -62,7 +63,7 @@ def test04_read_ingredient(monkeypatch, test_app):
 def test05_read_ingredient_not_found(monkeypatch, test_app):
     ing_id = str(uuid.uuid4())
 
-    async def mock_get_ingredient(ingredient_id):
+    async def mock_get_ingredient(session, ingredient_id):
         return None
     
     monkeypatch.setattr(ingredients.crud, "get_ingredient", mock_get_ingredient)
@@ -76,15 +77,15 @@ def test05_read_ingredient_not_found(monkeypatch, test_app):
 def test06_read_ingredients(monkeypatch, test_app):
     ings = [{"ingredientId": str(uuid.uuid4()), "name": "Test Ingredient"}]
 
-    async def mock_get_ingredients():
-        return ings
+    async def mock_get_ingredients(session, name_prefix):
+        return Page(items=ings, page=1, pages=1, size=50, total=1)
     
     monkeypatch.setattr(ingredients.crud, "get_ingredients", mock_get_ingredients)
 
     response = test_app.get("/ingredients/")
 
     assert response.status_code == 200
-    assert response.json() == ings
+    assert response.json() == Page(items=ings, page=1, pages=1, size=50, total=1).dict()
 
 
 def test07_update_ingredient(monkeypatch, test_app):
@@ -92,7 +93,7 @@ def test07_update_ingredient(monkeypatch, test_app):
     ing = {"name": "Test Ingredient"}
     res_ing = {"ingredientId": ing_id, "name": "Test Ingredient"}
 
-    async def mock_update_ingredient(ingredient_id, ingredient):
+    async def mock_update_ingredient(session, ingredient_id, ingredient):
         return res_ing
     
     monkeypatch.setattr(ingredients.crud, "update_ingredient", mock_update_ingredient)
@@ -107,7 +108,7 @@ def test08_update_ingredient_not_found(monkeypatch, test_app):
     ing_id = str(uuid.uuid4())
     ing = {"name": "Test Ingredient"}
 
-    async def mock_update_ingredient(ingredient_id, ingredient):
+    async def mock_update_ingredient(session, ingredient_id, ingredient):
         return None
     
     monkeypatch.setattr(ingredients.crud, "update_ingredient", mock_update_ingredient)
@@ -122,7 +123,7 @@ def test09_delete_ingredient(monkeypatch, test_app):
     ing_id = str(uuid.uuid4())
     ing = {"ingredientId": ing_id, "name": "Test Ingredient"}
 
-    async def mock_delete_ingredient(ingredient_id):
+    async def mock_delete_ingredient(session, ingredient_id):
         return ing
     
     monkeypatch.setattr(ingredients.crud, "delete_ingredient", mock_delete_ingredient)
@@ -136,7 +137,7 @@ def test09_delete_ingredient(monkeypatch, test_app):
 def test10_delete_ingredient_not_found(monkeypatch, test_app):
     ing_id = str(uuid.uuid4())
 
-    async def mock_delete_ingredient(ingredient_id):
+    async def mock_delete_ingredient(session, ingredient_id):
         return None
     
     monkeypatch.setattr(ingredients.crud, "delete_ingredient", mock_delete_ingredient)
@@ -144,4 +145,74 @@ def test10_delete_ingredient_not_found(monkeypatch, test_app):
     response = test_app.delete(f"/ingredients/{ing_id}", headers={"Authorization": "Bearer token"})
 
     assert response.status_code == 404
-    assert response.json() == {"detail": "Ingredient not found"}
\ No newline at end of file
+    assert response.json() == {"detail": "Ingredient not found"}
+
+
+def test11_create_ingredients_bulk(monkeypatch, test_app):
+    ings = [{"name": "Mehl"}, {"name": "Salz"}]
+    result = {"created": [{"ingredientId": str(uuid.uuid4()), "name": "Mehl"}], "existing": [{"ingredientId": str(uuid.uuid4()), "name": "Salz"}]}
+
+    async def mock_create_ingredients(session, ingredients):
+        assert [ingredient.name for ingredient in ingredients] == ["Mehl", "Salz"]
+        return result
+
+    monkeypatch.setattr(ingredients.crud, "create_ingredients", mock_create_ingredients)
+
+    response = test_app.post("/ingredients/bulk", data=json.dumps(ings), headers={"Content-Type": "application/json"})
+
+    assert response.status_code == 200
+    assert response.json() == result
+
+
+def test12_read_ingredients_name_prefix(monkeypatch, test_app):
+    ings = [{"ingredientId": str(uuid.uuid4()), "name": "Mehl"}]
+    calls = []
+
+    async def mock_get_ingredients(session, name_prefix):
+        calls.append(name_prefix)
+        return Page(items=ings, page=1, pages=1, size=10, total=1)
+    
+    monkeypatch.setattr(ingredients.crud, "get_ingredients", mock_get_ingredients)
+
+    response = test_app.get("/ingredients/?name_prefix=me&size=10")
+
+    assert response.status_code == 200
+    assert response.json()["items"] == ings
+    assert calls == ["me"]
+
+
+def test13_suggest_ingredients(monkeypatch, test_app):
+    ings = [{"ingredientId": str(uuid.uuid4()), "name": "Pfeffer"}]
+    calls = []
+
+    async def mock_suggest_ingredients(session, q, limit):
+        calls.append((q, limit))
+        return ings
+    
+    monkeypatch.setattr(ingredients.crud, "suggest_ingredients", mock_suggest_ingredients)
+
+    response = test_app.get("/ingredients/suggest?q=pfe&limit=5")
+
+    assert response.status_code == 200
+    assert response.json() == ings
+    assert calls == [("pfe", 5)]
+
+
+def test14_suggest_ingredients_requires_query(test_app):
+    response = test_app.get("/ingredients/suggest?q=")
+
+    assert response.status_code == 422
+
+
+def test15_update_ingredient_name_taken(monkeypatch, test_app):
+    ing = {"name": "Salz"}
+
+    async def mock_update_ingredient(session, ingredient_id, ingredient):
+        raise ValueError("Name already used")
+    
+    monkeypatch.setattr(ingredients.crud, "update_ingredient", mock_update_ingredient)
+
+    response = test_app.put(f"/ingredients/{uuid.uuid4()}", data=json.dumps(ing), headers={"Content-Type": "application/json", "Authorization": "Bearer token"})
+
+    assert response.status_code == 409
+    assert response.json() == {"detail": "Ingredient already exists"}
@@ -0,0 +1,155 @@
+import contextlib
+import io
+import json
+import pytest
+import re
+import uuid
+
+import db.load as load
+from db.load import read_ndjson, read_csv, batch_rows
+
+
+def test01_read_ndjson():
+    line = json.dumps({"title": "Pfannkuchen", "steps": [{"stepNumber": 1, "description": "Teig rühren"}],
+                       "ingredients": [{"ingredientId": str(uuid.uuid4()), "name": "Mehl", "amount": 200, "unit": "g"}],
+                       "categories": [{"categoryId": str(uuid.uuid4()), "name": "Süß"}, "Frühstück"]})
+
+    items = list(read_ndjson(io.StringIO(line + "\n\n")))
+
+    assert len(items) == 1
+    assert items[0]["title"] == "Pfannkuchen"
+    assert items[0]["steps"] == [(1, "Teig rühren")]
+    assert items[0]["ingredients"] == [("Mehl", 200, "g")]
+    assert items[0]["categories"] == ["Süß", "Frühstück"]
+
+
+def test02_read_csv():
+    data = "title,description,cookingTime,preparationTime,imagePath,userId,steps,ingredients,categories\n" \
+           "Pfannkuchen,Dünn,10,5,image.jpg,testuser,Teig rühren|Backen,200 g Mehl|2 Stk Ei groß,Süß|Frühstück\n"
+
+    items = list(read_csv(io.StringIO(data)))
+
+    assert items[0]["steps"] == [(1, "Teig rühren"), (2, "Backen")]
+    assert items[0]["ingredients"] == [("Mehl", 200, "g"), ("Ei groß", 2, "Stk")]
+    assert items[0]["categories"] == ["Süß", "Frühstück"]
+
+
+def test03_batch_rows():
+    ingredient_ids = {"Mehl": uuid.uuid4()}
+    category_ids = {"Süß": uuid.uuid4()}
+    item = {"title": "Pfannkuchen", "description": "Dünn", "cookingTime": "10", "preparationTime": "5", "imagePath": "image.jpg", "userId": "",
+            "steps": [(2, "Backen"), (1, "Teig rühren")], "ingredients": [("Mehl", 200, "g"), ("Mehl", 100, "g")], "categories": ["Süß", "Süß"]}
+
+    rows = batch_rows([item], ingredient_ids, category_ids, "testuser")
+
+    recipe = rows["recipes"][0]
+    assert recipe[1:] == ("Pfannkuchen", "Dünn", 10, 5, "image.jpg", "testuser", "Teig rühren Backen")
+    assert [(step[2], step[3]) for step in rows["preparation_steps"]] == [(1, "Teig rühren"), (2, "Backen")]
+    assert rows["recipe_ingredients"] == [(recipe[0], ingredient_ids["Mehl"], 200, "g")]
+    assert rows["recipes_categories"] == [(recipe[0], category_ids["Süß"])]
+
+
+class MockResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def scalars(self):
+        return iter(self.rows)
+
+    def all(self):
+        return self.rows
+
+
+class MockConnection:
+    """Keeps the rows written inside a transaction apart until it commits."""
+
+    def __init__(self):
+        self.committed = {"import_batches": [], "recipes": []}
+        self.pending = None
+
+    def execute(self, statement, params=None):
+        if statement.is_select:
+            if statement.get_final_froms()[0].name == "import_batches":
+                return MockResult([row["batch"] for row in self.committed["import_batches"]])
+            return MockResult([])
+        assert self.pending is not None, "write outside of a transaction"
+        self.pending["import_batches"].append(statement.compile().params)
+
+    @contextlib.contextmanager
+    def begin(self):
+        self.pending = {table: [] for table in self.committed}
+        try:
+            yield
+            for table, rows in self.pending.items():
+                self.committed[table].extend(rows)
+        finally:
+            self.pending = None
+
+    def commit(self):
+        pass
+
+
+def test04_load_batches_rolls_back_failed_copy(monkeypatch):
+    items = [{"title": f"Rezept {i}", "description": "", "cookingTime": 1, "preparationTime": 1, "imagePath": "", "userId": "testuser",
+              "steps": [(1, "Kochen")], "ingredients": [], "categories": []} for i in range(3)]
+    conn = MockConnection()
+    failures = ["Rezept 1"]
+
+    def copy_rows(conn, table, rows):
+        assert conn.pending is not None, "COPY outside of a transaction"
+        if table == "recipes":
+            conn.pending["recipes"].extend(rows)
+        elif table == "preparation_steps" and conn.pending["recipes"][0][1] in failures:
+            # the recipes of the batch are already copied
+            failures.clear()
+            raise RuntimeError("COPY failed")
+
+    monkeypatch.setattr(load, "copy_rows", copy_rows)
+    with pytest.raises(RuntimeError):
+        load.load_batches(conn, iter(items), "test", 1)
+
+    assert [row["batch"] for row in conn.committed["import_batches"]] == [1]
+    assert [row[1] for row in conn.committed["recipes"]] == ["Rezept 0"]
+
+    assert load.load_batches(conn, iter(items), "test", 1) == (2, 4)
+    assert [row["batch"] for row in conn.committed["import_batches"]] == [1, 2, 3]
+    assert [row[1] for row in conn.committed["recipes"]] == ["Rezept 0", "Rezept 1", "Rezept 2"]
+
+
+class MockCursor:
+    def __init__(self, copies):
+        self.copies = copies
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def copy_expert(self, sql, buffer):
+        self.copies.append((sql, buffer.read()))
+
+
+def read_copy_text(data):
+    # how PostgreSQL reads COPY ... (FORMAT text)
+    escapes = {"t": "\t", "n": "\n", "r": "\r"}
+    return [
+        tuple(None if field == "\\N" else re.sub(r"\\(.)", lambda match: escapes.get(match.group(1), match.group(1)), field) for field in line.split("\t"))
+        for line in data.splitlines()
+    ]
+
+
+def test05_copy_rows_psycopg2_keeps_empty_strings():
+    copies = []
+    dbapi_connection = type("DBAPIConnection", (), {"cursor": lambda self: MockCursor(copies)})()
+    conn = type("Connection", (), {})()
+    conn.dialect = type("Dialect", (), {"driver": "psycopg2"})()
+    conn.connection = type("Fairy", (), {"dbapi_connection": dbapi_connection})()
+    recipe_id = uuid.uuid4()
+    rows = [(recipe_id, "Pfannkuchen", "", 10, 5, "", None, "Teig\trühren\nund C:\\tmp")]
+
+    load.copy_rows(conn, "recipes", rows)
+
+    sql, data = copies[0]
+    assert "FORMAT text" in sql
+    assert read_copy_text(data) == [(str(recipe_id), "Pfannkuchen", "", "10", "5", "", None, "Teig\trühren\nund C:\\tmp")]
@@ -3,6 +3,7 @@ from jose import jwt
 
 import api.preparation_steps as preparation_steps
 import uuid
+from fastapi_pagination import Page
 
 
 def test01_create_preparation_step(monkeypatch, test_app):
@@ -17,7 +18,7 @@ def test01_create_preparation_step(monkeypatch, test_app):
         "stepNumber": preparation_step["stepNumber"],
         "description": preparation_step["description"]}
 
-    async def mock_create_preparation_step(preparation_step):
+    async def mock_create_preparation_step(session, preparation_step):
         return res_prep_step
 
     monkeypatch.setattr(preparation_steps.crud, "create_preparation_step", mock_create_preparation_step)
@@ -37,7 +38,7 @@ def test02_read_preparation_step(monkeypatch, test_app):
         "description": "test"
     }
 
-    async def mock_get_preparation_step(preparation_step_id):
+    async def mock_get_preparation_step(session, preparation_step_id):
         return preparation_step
 
     monkeypatch.setattr(preparation_steps.crud, "get_preparation_step", mock_get_preparation_step)
@@ -51,7 +52,7 @@ def test02_read_preparation_step(monkeypatch, test_app):
 def test03_read_preparation_step_not_found(monkeypatch, test_app):
     preparation_step_id = str(uuid.uuid4())
 
-    async def mock_get_preparation_step(preparation_step_id):
+    async def mock_get_preparation_step(session, preparation_step_id):
         return None
     
     monkeypatch.setattr(preparation_steps.crud, "get_preparation_step", mock_get_preparation_step)
@@ -78,15 +79,15 @@ def test04_read_preparation_steps(monkeypatch, test_app):
         }
     ]
 
-    async def mock_get_preparation_steps():
-        return preparation_steps_list
+    async def mock_get_preparation_steps(session):
+        return Page(items=preparation_steps_list, page=1, pages=1, size=50, total=2)
 
     monkeypatch.setattr(preparation_steps.crud, "get_preparation_steps", mock_get_preparation_steps)
 
     response = test_app.get("/preparation_steps/")
 
     assert response.status_code == 200
-    assert response.json() == preparation_steps_list
+    assert response.json() == Page(items=preparation_steps_list, page=1, pages=1, size=50, total=2).dict()
 
 
 def test05_update_preparation_step(monkeypatch, test_app):
@@ -103,7 +104,7 @@ def test05_update_preparation_step(monkeypatch, test_app):
         "description": "test"
     }
 
-    async def mock_update_preparation_step(preparation_step_id, preparation_step):
+    async def mock_update_preparation_step(session, preparation_step_id, preparation_step):
         return res_preparation_step
 
     monkeypatch.setattr(preparation_steps.crud, "update_preparation_step", mock_update_preparation_step)
@@ -122,7 +123,7 @@ def test06_update_preparation_step_not_found(monkeypatch, test_app):
         "description": "test"
     }
 
-    async def mock_update_preparation_step(preparation_step_id, preparation_step):
+    async def mock_update_preparation_step(session, preparation_step_id, preparation_step):
         return None
 
     monkeypatch.setattr(preparation_steps.crud, "update_preparation_step", mock_update_preparation_step)
@@ -142,7 +143,7 @@ def test07_delete_preparation_step(monkeypatch, test_app):
         "description": "test"
     }
 
-    async def mock_delete_preparation_step(preparation_step_id):
+    async def mock_delete_preparation_step(session, preparation_step_id):
         return preparation_step
 
     monkeypatch.setattr(preparation_steps.crud, "delete_preparation_step", mock_delete_preparation_step)
@@ -156,7 +157,7 @@ def test07_delete_preparation_step(monkeypatch, test_app):
 def test08_delete_preparation_step_not_found(monkeypatch, test_app):
     preparation_step_id = str(uuid.uuid4())
 
-    async def mock_delete_preparation_step(preparation_step_id):
+    async def mock_delete_preparation_step(session, preparation_step_id):
         return None
 
     monkeypatch.setattr(preparation_steps.crud, "delete_preparation_step", mock_delete_preparation_step)
@@ -164,4 +165,75 @@ def test08_delete_preparation_step_not_found(monkeypatch, test_app):
     response = test_app.delete(f"/preparation_steps/{preparation_step_id}")
 
     assert response.status_code == 404
-    assert response.json() == {"detail": "Preparation step not found"}
\ No newline at end of file
+    assert response.json() == {"detail": "Preparation step not found"}
+
+def test09_create_preparation_step_number_used(monkeypatch, test_app):
+    preparation_step = {
+        "recipeId": str(uuid.uuid4()),
+        "stepNumber": 1,
+        "description": "test"
+    }
+
+    async def mock_create_preparation_step(session, preparation_step):
+        return None
+
+    monkeypatch.setattr(preparation_steps.crud, "create_preparation_step", mock_create_preparation_step)
+
+    response = test_app.post("/preparation_steps/", data=json.dumps(preparation_step))
+
+    assert response.status_code == 409
+    assert response.json() == {"detail": "Step number already used"}
+
+
+def test10_update_preparation_step_number_used(monkeypatch, test_app):
+    preparation_step = {
+        "recipeId": str(uuid.uuid4()),
+        "stepNumber": 1,
+        "description": "test"
+    }
+
+    async def mock_update_preparation_step(session, preparation_step_id, preparation_step):
+        raise ValueError("Step number already used")
+
+    monkeypatch.setattr(preparation_steps.crud, "update_preparation_step", mock_update_preparation_step)
+
+    response = test_app.put(f"/preparation_steps/{uuid.uuid4()}", data=json.dumps(preparation_step))
+
+    assert response.status_code == 409
+    assert response.json() == {"detail": "Step number already used"}
+
+
+def test11_create_preparation_step_recipe_not_found(monkeypatch, test_app):
+    preparation_step = {
+        "recipeId": str(uuid.uuid4()),
+        "stepNumber": 1,
+        "description": "test"
+    }
+
+    async def mock_create_preparation_step(session, preparation_step):
+        raise LookupError("Recipe not found")
+
+    monkeypatch.setattr(preparation_steps.crud, "create_preparation_step", mock_create_preparation_step)
+
+    response = test_app.post("/preparation_steps/", data=json.dumps(preparation_step))
+
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Recipe not found"}
+
+
+def test12_update_preparation_step_recipe_not_found(monkeypatch, test_app):
+    preparation_step = {
+        "recipeId": str(uuid.uuid4()),
+        "stepNumber": 1,
+        "description": "test"
+    }
+
+    async def mock_update_preparation_step(session, preparation_step_id, preparation_step):
+        raise LookupError("Recipe not found")
+
+    monkeypatch.setattr(preparation_steps.crud, "update_preparation_step", mock_update_preparation_step)
+
+    response = test_app.put(f"/preparation_steps/{uuid.uuid4()}", data=json.dumps(preparation_step))
+
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Recipe not found"}
@@ -0,0 +1,132 @@
+import asyncio
+import uuid
+from sqlalchemy.dialects import postgresql
+
+import db.repair as repair
+from api.model import RatingSchema
+from crud import crud
+from db.model import Rating
+
+
+class MockResult:
+    def __init__(self, rowcount):
+        self.rowcount = rowcount
+
+
+class MockSession:
+    """Records the statements of a crud call instead of running them."""
+
+    def __init__(self, row=None, rowcount=0):
+        self.row = row
+        self.rowcount = rowcount
+        self.statements = []
+        self.committed = False
+        self.closed = False
+
+    async def scalar(self, statement):
+        return self.row
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+        return MockResult(self.rowcount)
+
+    def add(self, instance):
+        pass
+
+    async def flush(self):
+        pass
+
+    async def delete(self, instance):
+        pass
+
+    async def commit(self):
+        self.committed = True
+
+    async def close(self):
+        self.closed = True
+
+    def compiled(self):
+        # the aggregates rely on PostgreSQL only syntax, e.g. UPDATE ... FROM
+        compiled = [statement.compile(dialect=postgresql.dialect()) for statement in self.statements]
+        return [(" ".join(str(c).split()), c.params) for c in compiled]
+
+
+def assert_aggregate_update(session, recipe_id, stars, count):
+    [(sql, params)] = session.compiled()
+    assert sql.startswith('UPDATE recipes SET "ratingSum"=(recipes."ratingSum" + %(ratingSum_1)s), "ratingCount"=(recipes."ratingCount" + %(ratingCount_1)s), version=(recipes.version + %(version_1)s)')
+    assert sql.endswith('WHERE recipes."recipeId" = %(recipeId_1)s::UUID')
+    assert params == {"ratingSum_1": stars, "ratingCount_1": count, "version_1": 1, "recipeId_1": recipe_id}
+    assert session.committed
+
+
+def test01_create_rating_adds_to_aggregate():
+    recipe_id = uuid.uuid4()
+    session = MockSession()
+
+    asyncio.run(crud.create_rating(session, RatingSchema(recipeId=recipe_id, userId="testuser", stars=4)))
+
+    assert_aggregate_update(session, recipe_id, 4, 1)
+
+
+def test02_update_rating_adds_difference_to_aggregate():
+    recipe_id = uuid.uuid4()
+    session = MockSession(Rating(recipeId=recipe_id, userId="testuser", stars=5))
+
+    db_rating = asyncio.run(crud.update_rating(session, recipe_id, "testuser", Rating(stars=2)))
+
+    assert_aggregate_update(session, recipe_id, -3, 0)
+    assert db_rating.stars == 2
+
+
+def test03_delete_rating_subtracts_from_aggregate():
+    recipe_id = uuid.uuid4()
+    session = MockSession(Rating(recipeId=recipe_id, userId="testuser", stars=3))
+
+    asyncio.run(crud.delete_rating(session, recipe_id, "testuser"))
+
+    assert_aggregate_update(session, recipe_id, -3, -1)
+
+
+def test04_missing_rating_leaves_aggregate_alone():
+    session = MockSession()
+
+    assert asyncio.run(crud.update_rating(session, uuid.uuid4(), "testuser", Rating(stars=2))) is None
+    assert asyncio.run(crud.delete_rating(session, uuid.uuid4(), "testuser")) is None
+    assert session.statements == []
+
+
+def test05_delete_user_subtracts_their_ratings():
+    session = MockSession(object())
+
+    asyncio.run(crud.delete_user(session, "testuser"))
+
+    [(sql, params)] = session.compiled()
+    assert sql == 'UPDATE recipes SET "ratingSum"=(recipes."ratingSum" - ratings.stars), "ratingCount"=(recipes."ratingCount" - %(ratingCount_1)s), ' \
+                  'version=(recipes.version + %(version_1)s), "updatedAt"=now() ' \
+                  'FROM ratings WHERE recipes."recipeId" = ratings."recipeId" AND ratings."userId" = %(userId_1)s'
+    assert params == {"ratingCount_1": 1, "version_1": 1, "userId_1": "testuser"}
+    assert session.committed
+
+
+def test06_repair_rating_aggregates_recomputes_from_ratings():
+    session = MockSession(rowcount=2)
+
+    assert asyncio.run(crud.repair_rating_aggregates(session)) == 2
+
+    [(sql, params)] = session.compiled()
+    totals = '(SELECT ratings."recipeId" AS "recipeId", sum(ratings.stars) AS "ratingSum", count(*) AS "ratingCount" FROM ratings GROUP BY ratings."recipeId") AS anon_1'
+    rating_sum = f'coalesce((SELECT anon_1."ratingSum" FROM {totals} WHERE anon_1."recipeId" = recipes."recipeId"), %(coalesce_1)s)'
+    rating_count = f'coalesce((SELECT anon_1."ratingCount" FROM {totals} WHERE anon_1."recipeId" = recipes."recipeId"), %(coalesce_2)s)'
+    assert sql == f'UPDATE recipes SET "ratingSum"={rating_sum}, "ratingCount"={rating_count}, version=(recipes.version + %(version_1)s), "updatedAt"=now() ' \
+                  f'WHERE recipes."ratingSum" != {rating_sum} OR recipes."ratingCount" != {rating_count}'
+    assert params == {"coalesce_1": 0, "coalesce_2": 0, "version_1": 1}
+    assert session.committed
+
+
+def test07_repair_script_closes_session(monkeypatch):
+    session = MockSession(rowcount=3)
+    monkeypatch.setattr(repair, "new_session", lambda: session)
+
+    assert asyncio.run(repair.repair()) == 3
+    assert session.committed
+    assert session.closed
@@ -3,6 +3,7 @@ from jose import jwt
 
 import api.ratings as ratings
 import uuid
+from fastapi_pagination import Page
 
 
 def test01_create_rating(monkeypatch, test_app):
@@ -17,7 +18,7 @@ def test01_create_rating(monkeypatch, test_app):
         "stars": rating["stars"]
     }
 
-    async def mock_create_rating(rating):
+    async def mock_create_rating(session, rating):
         return res_rating
 
     monkeypatch.setattr(ratings.crud, "create_rating", mock_create_rating)
@@ -37,7 +38,7 @@ def test02_read_rating(monkeypatch, test_app):
         "stars": 5
     }
 
-    async def mock_get_rating(recipeId, userId):
+    async def mock_get_rating(session, recipeId, userId):
         return rating
 
     monkeypatch.setattr(ratings.crud, "get_rating", mock_get_rating)
@@ -52,7 +53,7 @@ def test03_read_rating_not_found(monkeypatch, test_app):
     recipeId = str(uuid.uuid4())
     userId = str(uuid.uuid4())
 
-    async def mock_get_rating(recipeId, userId):
+    async def mock_get_rating(session, recipeId, userId):
         return None
     
     monkeypatch.setattr(ratings.crud, "get_rating", mock_get_rating)
@@ -77,15 +78,15 @@ def test04_read_ratings(monkeypatch, test_app):
         }
     ]
 
-    async def mock_get_ratings():
-        return ratings_list
+    async def mock_get_ratings(session):
+        return Page(items=ratings_list, page=1, pages=1, size=50, total=2)
 
     monkeypatch.setattr(ratings.crud, "get_ratings", mock_get_ratings)
 
     response = test_app.get("/ratings/")
 
     assert response.status_code == 200
-    assert response.json() == ratings_list
+    assert response.json() == Page(items=ratings_list, page=1, pages=1, size=50, total=2).dict()
 
 
 def test05_update_rating(monkeypatch, test_app):
@@ -95,7 +96,7 @@ def test05_update_rating(monkeypatch, test_app):
         "stars": 5
     }
 
-    async def mock_update_rating(rating_id, userId, rating):
+    async def mock_update_rating(session, rating_id, userId, rating):
         return rating
 
     monkeypatch.setattr(ratings.crud, "update_rating", mock_update_rating)
@@ -113,7 +114,7 @@ def test06_update_rating_not_found(monkeypatch, test_app):
         "stars": 5
     }
 
-    async def mock_update_rating(rating_id, userId, rating):
+    async def mock_update_rating(session, rating_id, userId, rating):
         return None
 
     monkeypatch.setattr(ratings.crud, "update_rating", mock_update_rating)
@@ -131,7 +132,7 @@ def test07_delete_user(monkeypatch, test_app):
         "stars": 5
     }
 
-    async def mock_delete_rating(rating_id, userId):
+    async def mock_delete_rating(session, rating_id, userId):
         return rating
 
     monkeypatch.setattr(ratings.crud, "delete_rating", mock_delete_rating)
@@ -149,7 +150,7 @@ def test08_delete_rating_not_found(monkeypatch, test_app):
         "stars": 5
     }
 
-    async def mock_delete_rating(rating_id, userId):
+    async def mock_delete_rating(session, rating_id, userId):
         return None
 
     monkeypatch.setattr(ratings.crud, "delete_rating", mock_delete_rating)
@@ -3,8 +3,12 @@ from jose import jwt
 
 import api.recipes as recipes
 import uuid
+from collections import namedtuple
+from datetime import datetime, timezone
 from fastapi_pagination import Page
 
+RecipeVersion = namedtuple("RecipeVersion", ["version", "updatedAt"])
+
 def test01_create_recipe(monkeypatch, test_app):
     recipe = {"title": "Test Recipe", "description": "Test Description", "cookingTime": 30, "preparationTime": 15, "imagePath": "test.jpg", "userId": "testuser"}
     res_recipe = {"recipeId": str(uuid.uuid4()), "title": "Test Recipe", "description": "Test Description", "cookingTime": 30, "preparationTime": 15, "imagePath": "test.jpg", "userId": "testuser"}
@@ -24,7 +28,7 @@ def test01_create_recipe(monkeypatch, test_app):
     
     monkeypatch.setattr(recipes, "validate_token", mock_validate_token)
 
-    async def mock_create_recipe(recipe):
+    async def mock_create_recipe(session, recipe):
         return res_recipe
     
     monkeypatch.setattr(recipes.crud, "create_recipe", mock_create_recipe)
@@ -38,11 +42,16 @@ def test01_create_recipe(monkeypatch, test_app):
 def test02_read_recipe(monkeypatch, test_app):
     recipe = {"recipeId": str(uuid.uuid4()), "title": "Test Recipe", "description": "Test Description", "cookingTime": 30, "preparationTime": 15, "imagePath": "test.jpg", "userId": "testuser", "stars": 3, "ratingAmount": 1, "userName": "chef"}
 
-    async def mock_get_recipe(recipe_id):
+    async def mock_get_recipe(session, recipe_id, version):
         return recipe
     
     monkeypatch.setattr(recipes.crud, "get_recipe", mock_get_recipe)
 
+    async def mock_get_recipe_version(session, recipe_id):
+        return RecipeVersion(1, datetime(2024, 1, 1, tzinfo=timezone.utc))
+    
+    monkeypatch.setattr(recipes.crud, "get_recipe_version", mock_get_recipe_version)
+
     response = test_app.get(f"/recipes/{recipe['recipeId']}", headers={"Content-Type": "application/json"})
 
     assert response.status_code == 200
@@ -52,10 +61,10 @@ def test02_read_recipe(monkeypatch, test_app):
 def test03_read_recipe_not_found(monkeypatch, test_app):
     recipe_id = str(uuid.uuid4())
 
-    async def mock_get_recipe(recipe_id):
+    async def mock_get_recipe_version(session, recipe_id):
         return None
     
-    monkeypatch.setattr(recipes.crud, "get_recipe", mock_get_recipe)
+    monkeypatch.setattr(recipes.crud, "get_recipe_version", mock_get_recipe_version)
 
     response = test_app.get(f"/recipes/{recipe_id}", headers={"Content-Type": "application/json"})
 
@@ -66,7 +75,7 @@ def test03_read_recipe_not_found(monkeypatch, test_app):
 def test04_read_recipes(monkeypatch, test_app):
     recipes_list = [{"recipeId": str(uuid.uuid4()), "title": "Test Recipe", "description": "Test Description", "cookingTime": 30, "preparationTime": 15, "imagePath": "test.jpg", "userId": "testuser"}]
 
-    async def mock_get_recipes():
+    async def mock_get_recipes(session):
         return Page(items=recipes_list, page=1, pages=None, size=2, total=1)
     
     monkeypatch.setattr(recipes.crud, "get_recipes", mock_get_recipes)
@@ -95,7 +104,7 @@ def test05_update_recipe(monkeypatch, test_app):
     
     monkeypatch.setattr(recipes, "validate_token", mock_validate_token) 
 
-    async def mock_update_recipe(recipe_id, recipe):
+    async def mock_update_recipe(session, recipe_id, recipe):
         return updated_recipe
     
     monkeypatch.setattr(recipes.crud, "update_recipe", mock_update_recipe)
@@ -124,7 +133,7 @@ def test06_update_recipe_not_found(monkeypatch, test_app):
     
     monkeypatch.setattr(recipes, "validate_token", mock_validate_token) 
 
-    async def mock_update_recipe(recipe_id, recipe):
+    async def mock_update_recipe(session, recipe_id, recipe):
         return None
     
     monkeypatch.setattr(recipes.crud, "update_recipe", mock_update_recipe)
@@ -163,7 +172,7 @@ def test08_delete_recipe(monkeypatch, test_app):
     
     monkeypatch.setattr(recipes, "validate_token", mock_validate_token) 
 
-    async def mock_delete_recipe(recipe_id):
+    async def mock_delete_recipe(session, recipe_id):
         return recipe
     
     monkeypatch.setattr(recipes.crud, "delete_recipe", mock_delete_recipe)
@@ -191,7 +200,7 @@ def test09_delete_recipe_not_found(monkeypatch, test_app):
     
     monkeypatch.setattr(recipes, "validate_token", mock_validate_token)
 
-    async def mock_delete_recipe(recipe_id):
+    async def mock_delete_recipe(session, recipe_id):
         return None
     
     monkeypatch.setattr(recipes.crud, "delete_recipe", mock_delete_recipe)
@@ -221,11 +230,16 @@ def test11_read_preparation_steps(monkeypatch, test_app):
     
     monkeypatch.setattr(recipes, "validate_token", mock_validate_token)
 
-    async def mock_get_recipe_preparation_steps(recipe_id):
+    async def mock_get_recipe_preparation_steps(session, recipe_id):
         return steps
     
     monkeypatch.setattr(recipes.crud, "get_recipe_preparation_steps", mock_get_recipe_preparation_steps)
 
+    async def mock_get_recipe_version(session, recipe_id):
+        return RecipeVersion(1, datetime(2024, 1, 1, tzinfo=timezone.utc))
+    
+    monkeypatch.setattr(recipes.crud, "get_recipe_version", mock_get_recipe_version)
+
     response = test_app.get(f"/recipes/{recipe_id}/preparation_steps/", headers={"Content-Type": "application/json", "Authorization": "Bearer token"})
 
     assert response.status_code == 200
@@ -237,11 +251,16 @@ def test12_read_ingredients(monkeypatch, test_app):
     recipe_id = str(uuid.uuid4())
     ingredients = [{"recipeId": recipe_id, "ingredientId": str(uuid.uuid4()), "amount": 1, "unit": "g", "name": "Test Ingredient"}]
     
-    async def mock_get_recipe_ingredients(recipe_id):
+    async def mock_get_recipe_ingredients(session, recipe_id, version):
         return ingredients
     
     monkeypatch.setattr(recipes.crud, "get_recipe_ingredients", mock_get_recipe_ingredients)
 
+    async def mock_get_recipe_version(session, recipe_id):
+        return RecipeVersion(1, datetime(2024, 1, 1, tzinfo=timezone.utc))
+    
+    monkeypatch.setattr(recipes.crud, "get_recipe_version", mock_get_recipe_version)
+
     response = test_app.get(f"/recipes/{recipe_id}/ingredients/", headers={"Content-Type": "application/json"})
 
     assert response.status_code == 200
@@ -257,7 +276,7 @@ def test13_read_categories(monkeypatch, test_app):
     
     monkeypatch.setattr(recipes, "validate_token", mock_validate_token)
 
-    async def mock_get_recipe_categories(recipe_id):
+    async def mock_get_recipe_categories(session, recipe_id):
         return categories
     
     monkeypatch.setattr(recipes.crud, "get_recipe_categories", mock_get_recipe_categories)
@@ -286,7 +305,7 @@ def test15_read_ratings(monkeypatch, test_app):
     
     monkeypatch.setattr(recipes, "validate_token", mock_validate_token)
 
-    async def mock_get_recipe_ratings(recipe_id):
+    async def mock_get_recipe_ratings(session, recipe_id):
         return ratings
     
     monkeypatch.setattr(recipes.crud, "get_recipe_ratings", mock_get_recipe_ratings)
@@ -314,7 +333,7 @@ def test17_read_user(monkeypatch, test_app):
     
     monkeypatch.setattr(recipes, "validate_token", mock_validate_token)
 
-    async def mock_get_user(recipeId):
+    async def mock_get_user(session, recipeId):
         return user
     
     monkeypatch.setattr(recipes.crud, "get_recipe_user", mock_get_user)
@@ -341,7 +360,7 @@ def test19_add_recipe_to_category(monkeypatch, test_app):
     
     monkeypatch.setattr(recipes, "validate_token", mock_validate_token)
 
-    async def mock_add_recipe_to_category(recipe_id, category_id):
+    async def mock_add_recipe_to_category(session, recipe_id, category_id):
         return 200
     
     monkeypatch.setattr(recipes.crud, "add_recipe_to_category", mock_add_recipe_to_category)
@@ -360,7 +379,7 @@ def test20_remove_recipe_from_category(monkeypatch, test_app):
     
     monkeypatch.setattr(recipes, "validate_token", mock_validate_token)
 
-    async def mock_remove_recipe_from_category(recipe_id, category_id):
+    async def mock_remove_recipe_from_category(session, recipe_id, category_id):
         return 200
     
     monkeypatch.setattr(recipes.crud, "remove_recipe_from_category", mock_remove_recipe_from_category)
@@ -388,7 +407,7 @@ def test22_add_ingredient_to_recipe(monkeypatch, test_app):
     ingredient_id = str(uuid.uuid4())
 
 
-    async def mock_add_recipe_ingredient(recipe_id, ingredient_id, amount, unit):
+    async def mock_add_recipe_ingredient(session, recipe_id, ingredient_id, amount, unit):
         return 200
     
     monkeypatch.setattr(recipes.crud, "add_ingredient_to_recipe", mock_add_recipe_ingredient)
@@ -407,7 +426,7 @@ def test23_remove_ingredient_from_recipe(monkeypatch, test_app):
     
     monkeypatch.setattr(recipes, "validate_token", mock_validate_token)
 
-    async def mock_remove_recipe_ingredient(recipe_id, ingredient_id):
+    async def mock_remove_recipe_ingredient(session, recipe_id, ingredient_id):
         return 200
     
     monkeypatch.setattr(recipes.crud, "remove_ingredient_from_recipe", mock_remove_recipe_ingredient)
@@ -427,7 +446,7 @@ def test24_remove_ingredient_from_recipe_invalid_token(test_app):
 def test25_get_public_recipes(monkeypatch, test_app):
     recipes_list = [{"recipeId": str(uuid.uuid4()), "title": "Test Recipe", "description": "Test Description", "cookingTime": 30, "preparationTime": 15, "imagePath": "test.jpg", "userId": "testuser", "stars": 3, "ratingAmount": 1, "userName": "chef"}]
     
-    async def mock_get_public_recipes():
+    async def mock_get_public_recipes(session, sort="title"):
         return Page(items=recipes_list, page=1, pages=None, size=10, total=1)
     
     monkeypatch.setattr(recipes.crud, "get_public_recipes", mock_get_public_recipes)
@@ -441,7 +460,7 @@ def test25_get_public_recipes(monkeypatch, test_app):
 def test25_get_public_recipes_user(monkeypatch, test_app):
     recipes_list = [{"recipeId": str(uuid.uuid4()), "title": "Test Recipe", "description": "Test Description", "cookingTime": 30, "preparationTime": 15, "imagePath": "test.jpg", "userId": "testuser", "stars": 3, "ratingAmount": 1, "userName": "chef"}]
     
-    async def mock_get_public_recipes_user(userid):
+    async def mock_get_public_recipes_user(session, userid):
         return Page(items=recipes_list, page=1, pages=None, size=10, total=1)
     
     monkeypatch.setattr(recipes.crud, "get_public_recipes_user", mock_get_public_recipes_user)
@@ -455,7 +474,7 @@ def test25_get_public_recipes_user(monkeypatch, test_app):
 def test_26_get_public_recipes(monkeypatch, test_app):
     recipes_list = [{"recipeId": str(uuid.uuid4()), "title": "Test Recipe", "description": "Test Description", "cookingTime": 30, "preparationTime": 15, "imagePath": "test.jpg", "userId": "testuser", "stars": 3, "ratingAmount": 1, "userName": "chef"}]
     
-    async def mock_get_public_recipes():
+    async def mock_get_public_recipes(session, sort="title"):
         return Page(items=recipes_list, page=1, pages=None, size=10, total=1)
     
     monkeypatch.setattr(recipes.crud, "get_public_recipes", mock_get_public_recipes)
@@ -463,4 +482,282 @@ def test_26_get_public_recipes(monkeypatch, test_app):
     response = test_app.get(f"/recipes/public/?page=1&size=2", headers={"Content-Type": "application/json"})
 
     assert response.status_code == 200
-    assert response.json() == Page(items=recipes_list, page=1, pages=None, size=10, total=1).dict()
\ No newline at end of file
+    assert response.json() == Page(items=recipes_list, page=1, pages=None, size=10, total=1).dict()
+
+def test27_get_public_recipes_cursor(monkeypatch, test_app):
+    recipes_list = [{"recipeId": str(uuid.uuid4()), "title": "Test Recipe", "description": "Test Description", "cookingTime": 30, "preparationTime": 15, "imagePath": "test.jpg", "userId": "testuser", "stars": 3, "ratingAmount": 1, "userName": "chef"}]
+    
+    async def mock_get_public_recipes_cursor(session, cursor, size, sort):
+        assert (cursor, size, sort) == ("", 2, "stars")
+        return {"items": recipes_list, "size": size, "nextCursor": "next"}
+    
+    monkeypatch.setattr(recipes.crud, "get_public_recipes_cursor", mock_get_public_recipes_cursor)
+    
+    response = test_app.get("/recipes/public/?cursor=&size=2&sort=stars", headers={"Content-Type": "application/json"})
+
+    assert response.status_code == 200
+    assert response.json() == {"items": recipes_list, "size": 2, "nextCursor": "next"}
+
+
+def test28_get_public_recipes_sorted_page(monkeypatch, test_app):
+    recipes_list = [{"recipeId": str(uuid.uuid4()), "title": "Test Recipe", "description": "Test Description", "cookingTime": 30, "preparationTime": 15, "imagePath": "test.jpg", "userId": "testuser", "stars": 3, "ratingAmount": 1, "userName": "chef"}]
+
+    async def mock_get_public_recipes(session, sort="title"):
+        assert sort == "stars"
+        return Page(items=recipes_list, page=1, pages=None, size=10, total=1)
+
+    monkeypatch.setattr(recipes.crud, "get_public_recipes", mock_get_public_recipes)
+
+    response = test_app.get("/recipes/public/?page=1&size=2&sort=stars", headers={"Content-Type": "application/json"})
+
+    assert response.status_code == 200
+    assert response.json()["items"] == recipes_list
+
+
+def test29_get_recipes_invalid_cursor(monkeypatch, test_app):
+
+    async def mock_get_recipes_cursor(session, cursor, size):
+        raise ValueError("Invalid cursor")
+    
+    monkeypatch.setattr(recipes.crud, "get_recipes_cursor", mock_get_recipes_cursor)
+    
+    response = test_app.get("/recipes/?cursor=invalid", headers={"Content-Type": "application/json"})
+
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid cursor"}
+
+
+def test30_search_recipes(monkeypatch, test_app):
+    recipes_list = [{"recipeId": str(uuid.uuid4()), "title": "Kartoffelsuppe", "description": "Test Description", "cookingTime": 30, "preparationTime": 15, "imagePath": "test.jpg", "userId": "testuser", "stars": 3, "ratingAmount": 1, "userName": "chef"}]
+
+    async def mock_search_public_recipes(session, q):
+        assert q == "suppe"
+        return Page(items=recipes_list, page=1, pages=None, size=10, total=1)
+
+    monkeypatch.setattr(recipes.crud, "search_public_recipes", mock_search_public_recipes)
+
+    response = test_app.get("/recipes/search?q=suppe", headers={"Content-Type": "application/json"})
+
+    assert response.status_code == 200
+    assert response.json() == Page(items=recipes_list, page=1, pages=None, size=10, total=1).dict()
+
+
+def test31_get_recipes_by_ingredients(monkeypatch, test_app):
+    have = [str(uuid.uuid4()), str(uuid.uuid4())]
+    recipes_list = [{"recipeId": str(uuid.uuid4()), "title": "Pfannkuchen", "description": "Test Description", "cookingTime": 30, "preparationTime": 15, "imagePath": "test.jpg", "userId": "testuser", "stars": 3, "ratingAmount": 1, "userName": "chef", "matchedIngredients": 2, "missingIngredients": 1}]
+
+    async def mock_get_public_recipes_by_ingredients(session, have_ids, max_missing):
+        assert [str(i) for i in have_ids] == have
+        assert max_missing == 1
+        return Page(items=recipes_list, page=1, pages=None, size=10, total=1)
+
+    monkeypatch.setattr(recipes.crud, "get_public_recipes_by_ingredients", mock_get_public_recipes_by_ingredients)
+
+    response = test_app.get(f"/recipes/by-ingredients?have={have[0]}&have={have[1]}&max_missing=1", headers={"Content-Type": "application/json"})
+
+    assert response.status_code == 200
+    assert response.json() == Page(items=recipes_list, page=1, pages=None, size=10, total=1).dict()
+
+
+def test32_get_recipes_by_ingredients_requires_have(test_app):
+    response = test_app.get("/recipes/by-ingredients", headers={"Content-Type": "application/json"})
+
+    assert response.status_code == 400
+    assert response.json() == {"detail": "No ingredients given"}
+
+
+def test33_read_recipe_full(monkeypatch, test_app):
+    recipe_id = str(uuid.uuid4())
+    recipe = {"recipeId": recipe_id, "title": "Test Recipe", "description": "Test Description", "cookingTime": 30, "preparationTime": 15, "imagePath": "test.jpg", "userId": "testuser", "stars": 3, "ratingAmount": 1, "userName": "chef",
+              "steps": [{"stepId": str(uuid.uuid4()), "recipeId": recipe_id, "stepNumber": 1, "description": "Test Step"}],
+              "ingredients": [{"recipeId": recipe_id, "ingredientId": str(uuid.uuid4()), "amount": 100, "unit": "g", "name": "Mehl"}],
+              "categories": [{"categoryId": str(uuid.uuid4()), "name": "Kuchen"}]}
+
+    async def mock_get_recipe_full(session, recipe_id):
+        return recipe
+
+    monkeypatch.setattr(recipes.crud, "get_recipe_full", mock_get_recipe_full)
+
+    response = test_app.get(f"/recipes/{recipe_id}/full", headers={"Content-Type": "application/json"})
+
+    assert response.status_code == 200
+    assert response.json() == recipe
+
+
+def test34_read_recipe_full_not_found(monkeypatch, test_app):
+
+    async def mock_get_recipe_full(session, recipe_id):
+        return None
+
+    monkeypatch.setattr(recipes.crud, "get_recipe_full", mock_get_recipe_full)
+
+    response = test_app.get(f"/recipes/{uuid.uuid4()}/full", headers={"Content-Type": "application/json"})
+
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Recipe not found"}
+
+
+def test35_create_recipe_full(monkeypatch, test_app):
+    recipe_id = str(uuid.uuid4())
+    ingredient_id = str(uuid.uuid4())
+    category_id = str(uuid.uuid4())
+    recipe_data = {"title": "Test Recipe", "description": "Test Description", "cookingTime": 30, "preparationTime": 15, "imagePath": "test.jpg", "userId": "testuser",
+                   "steps": [{"stepNumber": 1, "description": "Test Step"}],
+                   "ingredients": [{"ingredientId": ingredient_id, "amount": 100, "unit": "g"}],
+                   "categoryIds": [category_id]}
+    created = {"recipeId": recipe_id, "title": "Test Recipe", "description": "Test Description", "cookingTime": 30, "preparationTime": 15, "imagePath": "test.jpg", "userId": "testuser", "stars": 0, "ratingAmount": 0, "userName": "chef",
+               "steps": [{"stepId": str(uuid.uuid4()), "recipeId": recipe_id, "stepNumber": 1, "description": "Test Step"}],
+               "ingredients": [{"recipeId": recipe_id, "ingredientId": ingredient_id, "amount": 100, "unit": "g", "name": "Mehl"}],
+               "categories": [{"categoryId": category_id, "name": "Kuchen"}]}
+
+    async def mock_create_recipe_full(session, recipe):
+        assert len(recipe.steps) == 1 and len(recipe.ingredients) == 1 and len(recipe.categoryIds) == 1
+        return created
+
+    monkeypatch.setattr(recipes.crud, "create_recipe_full", mock_create_recipe_full)
+
+    response = test_app.post("/recipes/full", json=recipe_data, headers={"Content-Type": "application/json"})
+
+    assert response.status_code == 201
+    assert response.json() == created
+
+
+def test36_create_recipe_full_invalid_ingredient(monkeypatch, test_app):
+    recipe_data = {"title": "Test Recipe", "description": "Test Description", "cookingTime": 30, "preparationTime": 15, "imagePath": "test.jpg", "userId": "testuser",
+                   "ingredients": [{"ingredientId": str(uuid.uuid4()), "amount": 100, "unit": "g"}]}
+
+    async def mock_create_recipe_full(session, recipe):
+        return None
+
+    monkeypatch.setattr(recipes.crud, "create_recipe_full", mock_create_recipe_full)
+
+    response = test_app.post("/recipes/full", json=recipe_data, headers={"Content-Type": "application/json"})
+
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid ingredients or categories"}
+
+
+def test37_read_recipe_not_modified(monkeypatch, test_app):
+    recipe_id = str(uuid.uuid4())
+
+    async def mock_get_recipe(session, recipe_id, version):
+        raise AssertionError("recipe loaded for a 304")
+    
+    monkeypatch.setattr(recipes.crud, "get_recipe", mock_get_recipe)
+
+    async def mock_get_recipe_version(session, recipe_id):
+        return RecipeVersion(1, datetime(2024, 1, 1, tzinfo=timezone.utc))
+    
+    monkeypatch.setattr(recipes.crud, "get_recipe_version", mock_get_recipe_version)
+
+    etag = f'"{recipe_id}-1"'
+    response = test_app.get(f"/recipes/{recipe_id}", headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert response.headers["Last-Modified"] == "Mon, 01 Jan 2024 00:00:00 GMT"
+
+    response = test_app.get(f"/recipes/{recipe_id}", headers={"If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT"})
+
+    assert response.status_code == 304
+
+
+def test38_read_ingredients_etag_changes_with_version(monkeypatch, test_app):
+    recipe_id = str(uuid.uuid4())
+    ingredients = [{"recipeId": recipe_id, "ingredientId": str(uuid.uuid4()), "amount": 1, "unit": "g", "name": "Test Ingredient"}]
+    
+    async def mock_get_recipe_ingredients(session, recipe_id, version):
+        # the cache entry has to be the one of the version in the ETag
+        assert version == 2
+        return ingredients
+    
+    monkeypatch.setattr(recipes.crud, "get_recipe_ingredients", mock_get_recipe_ingredients)
+
+    async def mock_get_recipe_version(session, recipe_id):
+        return RecipeVersion(2, datetime(2024, 1, 2, tzinfo=timezone.utc))
+    
+    monkeypatch.setattr(recipes.crud, "get_recipe_version", mock_get_recipe_version)
+
+    response = test_app.get(f"/recipes/{recipe_id}/ingredients/", headers={"If-None-Match": f'"{recipe_id}-1"'})
+
+    assert response.status_code == 200
+    assert response.json() == ingredients
+    assert response.headers["ETag"] == f'"{recipe_id}-2"'
+    assert response.headers["Cache-Control"] == "no-cache"
+
+
+def test39_replace_preparation_steps(monkeypatch, test_app):
+    recipe_id = str(uuid.uuid4())
+    step_id = str(uuid.uuid4())
+    steps = [{"description": "Neu"}, {"stepId": step_id, "description": "Alt"}]
+    res_steps = [{"stepId": str(uuid.uuid4()), "recipeId": recipe_id, "stepNumber": 1, "description": "Neu"}, {"stepId": step_id, "recipeId": recipe_id, "stepNumber": 2, "description": "Alt"}]
+    calls = []
+
+    async def mock_validate_token(token):
+        return 200
+    
+    monkeypatch.setattr(recipes, "validate_token", mock_validate_token)
+
+    async def mock_replace_recipe_steps(session, recipe_id, steps):
+        calls.append([(step.stepId and str(step.stepId), step.description) for step in steps])
+        return res_steps
+    
+    monkeypatch.setattr(recipes.crud, "replace_recipe_steps", mock_replace_recipe_steps)
+
+    response = test_app.put(f"/recipes/{recipe_id}/preparation_steps/", data=json.dumps(steps), headers={"Content-Type": "application/json", "Authorization": "Bearer token"})
+
+    assert response.status_code == 200
+    assert response.json() == res_steps
+    assert calls == [[(None, "Neu"), (step_id, "Alt")]]
+
+
+def test40_replace_preparation_steps_errors(monkeypatch, test_app):
+    async def mock_validate_token(token):
+        return 200
+    
+    monkeypatch.setattr(recipes, "validate_token", mock_validate_token)
+
+    async def mock_replace_recipe_steps(session, recipe_id, steps):
+        if steps:
+            raise ValueError("Unknown preparation steps")
+        return None
+    
+    monkeypatch.setattr(recipes.crud, "replace_recipe_steps", mock_replace_recipe_steps)
+
+    response = test_app.put(f"/recipes/{uuid.uuid4()}/preparation_steps/", data=json.dumps([{"stepId": str(uuid.uuid4()), "description": "x"}]), headers={"Content-Type": "application/json", "Authorization": "Bearer token"})
+
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Unknown preparation steps"}
+
+    response = test_app.put(f"/recipes/{uuid.uuid4()}/preparation_steps/", data=json.dumps([]), headers={"Content-Type": "application/json", "Authorization": "Bearer token"})
+
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Recipe not found"}
+
+
+def test41_duplicate_step_numbers_are_rejected_before_writing(monkeypatch, test_app):
+    recipe_data = {"title": "Test Recipe", "description": "Test Description", "cookingTime": 30, "preparationTime": 15, "imagePath": "test.jpg", "userId": "testuser",
+                   "steps": [{"stepNumber": 1, "description": "Eins"}, {"stepNumber": 1, "description": "Auch eins"}]}
+    step_id = str(uuid.uuid4())
+
+    async def mock_validate_token(token):
+        return 200
+    
+    monkeypatch.setattr(recipes, "validate_token", mock_validate_token)
+
+    async def mock_write(*args):
+        raise AssertionError("written despite duplicate steps")
+    
+    monkeypatch.setattr(recipes.crud, "create_recipe_full", mock_write)
+    monkeypatch.setattr(recipes.crud, "replace_recipe_steps", mock_write)
+
+    response = test_app.post("/recipes/full", json=recipe_data, headers={"Content-Type": "application/json"})
+
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Duplicate step numbers"}
+
+    steps = [{"stepId": step_id, "description": "x"}, {"stepId": step_id, "description": "y"}]
+    response = test_app.put(f"/recipes/{uuid.uuid4()}/preparation_steps/", data=json.dumps(steps), headers={"Content-Type": "application/json", "Authorization": "Bearer token"})
+
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Duplicate preparation steps"}
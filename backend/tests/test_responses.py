@@ -0,0 +1,46 @@
+import json
+import uuid
+from fastapi_pagination import Page
+from decimal import Decimal
+
+import api.ingredients as ingredients
+from api.model import IngredientDB
+from api.responses import FastJSONResponse
+
+
+def test01_render_uuid_and_model():
+    ing_id = uuid.uuid4()
+    response = FastJSONResponse({"id": ing_id, "ingredient": IngredientDB(ingredientId=ing_id, name="Mehl"), "amount": Decimal("1.5")})
+
+    assert json.loads(response.body) == {"id": str(ing_id), "ingredient": {"ingredientId": str(ing_id), "name": "Mehl"}, "amount": 1.5}
+    assert response.media_type == "application/json"
+
+
+def test02_large_response_is_compressed(monkeypatch, test_app):
+    ings = [{"ingredientId": str(uuid.uuid4()), "name": f"Test Ingredient {i}"} for i in range(100)]
+
+    async def mock_get_ingredients(session, name_prefix):
+        return Page(items=ings, page=1, pages=1, size=100, total=len(ings))
+    
+    monkeypatch.setattr(ingredients.crud, "get_ingredients", mock_get_ingredients)
+
+    response = test_app.get("/ingredients/", headers={"Accept-Encoding": "gzip"})
+
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.json()["items"] == ings
+
+
+def test03_small_response_is_not_compressed(monkeypatch, test_app):
+    ings = [{"ingredientId": str(uuid.uuid4()), "name": "Test Ingredient"}]
+
+    async def mock_get_ingredients(session, name_prefix):
+        return Page(items=ings, page=1, pages=1, size=100, total=len(ings))
+    
+    monkeypatch.setattr(ingredients.crud, "get_ingredients", mock_get_ingredients)
+
+    response = test_app.get("/ingredients/", headers={"Accept-Encoding": "gzip"})
+
+    assert response.status_code == 200
+    assert "Content-Encoding" not in response.headers
+    assert response.json()["items"] == ings
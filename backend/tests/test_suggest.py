@@ -0,0 +1,81 @@
+import asyncio
+import time
+import uuid
+from starlette.concurrency import run_in_threadpool
+
+from crud import crud
+from crud.suggest import NameTrie
+
+
+def make_trie(*names):
+    trie = NameTrie()
+    ids = {name: uuid.uuid4() for name in names}
+    trie.rebuild((ingredient_id, name) for name, ingredient_id in ids.items())
+    return trie, ids
+
+
+def test01_search_prefix_ignores_case():
+    trie, ids = make_trie("Pfeffer", "pfefferminze", "Paprika")
+
+    assert trie.search("PFEF", 10) == [(ids["Pfeffer"], "Pfeffer"), (ids["pfefferminze"], "pfefferminze")]
+    assert trie.search("x", 10) == []
+
+
+def test02_search_matches_word_starts():
+    trie, ids = make_trie("Rote Zwiebel", "Zwiebel", "Knoblauch-Zehe")
+
+    assert [name for _, name in trie.search("zwie", 10)] == ["Rote Zwiebel", "Zwiebel"]
+    assert [name for _, name in trie.search("zehe", 10)] == ["Knoblauch-Zehe"]
+
+
+def test03_search_respects_limit_and_order():
+    trie, ids = make_trie(*[f"Salz {i}" for i in range(20)])
+
+    assert [name for _, name in trie.search("salz", 3)] == ["Salz 0", "Salz 1", "Salz 10"]
+
+
+def test04_remove_and_rename():
+    trie, ids = make_trie("Rote Zwiebel", "Rosmarin")
+    trie.remove(ids["Rote Zwiebel"], "Rote Zwiebel")
+    trie.add(ids["Rote Zwiebel"], "Weiße Zwiebel")
+
+    assert [name for _, name in trie.search("ro", 10)] == ["Rosmarin"]
+    assert [name for _, name in trie.search("zwiebel", 10)] == ["Weiße Zwiebel"]
+    assert "t" not in trie.root.children["r"].children["o"].children
+
+
+def test05_needs_reload_after_interval():
+    trie = NameTrie(reload_interval=0)
+    assert trie.needs_reload()
+
+    trie.rebuild([])
+    assert trie.needs_reload()
+
+    trie = NameTrie(reload_interval=60)
+    trie.rebuild([])
+    assert not trie.needs_reload()
+
+
+def test06_write_during_rebuild_is_kept(monkeypatch):
+    trie = NameTrie()
+    monkeypatch.setattr(crud, "ingredient_trie", trie)
+    new_id = uuid.uuid4()
+
+    def slow_rows():
+        time.sleep(0.05)
+        yield uuid.uuid4(), "Salz"
+
+    async def rebuild():
+        async with crud.trie_lock:
+            await run_in_threadpool(trie.rebuild, slow_rows())
+
+    async def main():
+        task = asyncio.create_task(rebuild())
+        await asyncio.sleep(0.01)
+        await crud.update_ingredient_trie(added=[(new_id, "Pfeffer")])
+        await task
+
+    asyncio.run(main())
+
+    assert trie.search("pfe", 10) == [(new_id, "Pfeffer")]
+    assert [name for _, name in trie.search("sal", 10)] == ["Salz"]
@@ -23,7 +23,7 @@ def test01_create_user(monkeypatch, test_app):
     
     monkeypatch.setattr(users, "validate_token", mock_validate_token)
 
-    async def mock_create_user(user):
+    async def mock_create_user(session, user):
         return user
     
     monkeypatch.setattr(users.crud, "create_user", mock_create_user)
@@ -52,7 +52,7 @@ def test02_create_user_user_exists(monkeypatch, test_app):
     
     monkeypatch.setattr(users, "validate_token", mock_validate_token)
 
-    async def mock_create_user(user):
+    async def mock_create_user(session, user):
         return None
     
     monkeypatch.setattr(users.crud, "create_user", mock_create_user)
@@ -79,7 +79,7 @@ def test03_read_user(monkeypatch, test_app):
     
     monkeypatch.setattr(users, "validate_token", mock_validate_token)
 
-    async def mock_get_user(userId):
+    async def mock_get_user(session, userId):
         return user
     
     monkeypatch.setattr(users.crud, "get_user", mock_get_user)
@@ -114,7 +114,7 @@ def test05_read_user_not_found(monkeypatch, test_app):
     
     monkeypatch.setattr(users, "validate_token", mock_validate_token)
 
-    async def mock_get_user(userId):
+    async def mock_get_user(session, userId):
         return None
 
     monkeypatch.setattr(users.crud, "get_user", mock_get_user)
@@ -144,7 +144,7 @@ def test06_read_users(monkeypatch, test_app):
     
     monkeypatch.setattr(users, "validate_token", mock_validate_token)
 
-    async def mock_get_users():
+    async def mock_get_users(session):
         return Page(items=users_list, page=1, pages=None, size=2, total=2)
 
     monkeypatch.setattr(users.crud, "get_users", mock_get_users)
@@ -181,7 +181,7 @@ def test08_update_user(monkeypatch, test_app):
     
     monkeypatch.setattr(users, "validate_token", mock_validate_token)
 
-    async def mock_update_user(userId, user_):
+    async def mock_update_user(session, userId, user_):
         return user
 
     monkeypatch.setattr(users.crud, "update_user", mock_update_user)
@@ -219,7 +219,7 @@ def test10_update_user_not_found(monkeypatch, test_app):
     
     monkeypatch.setattr(users, "validate_token", mock_validate_token)
 
-    async def mock_update_user(userId, user_):
+    async def mock_update_user(session, userId, user_):
         return None
 
     monkeypatch.setattr(users.crud, "update_user", mock_update_user)
@@ -247,7 +247,7 @@ def test11_delete_user(monkeypatch, test_app):
     
     monkeypatch.setattr(users, "validate_token", mock_validate_token)
 
-    async def mock_delete_user(userId):
+    async def mock_delete_user(session, userId):
         return user
 
     monkeypatch.setattr(users.crud, "delete_user", mock_delete_user)
@@ -284,7 +284,7 @@ def test13_delete_user_not_found(monkeypatch, test_app):
     
     monkeypatch.setattr(users, "validate_token", mock_validate_token)
 
-    async def mock_delete_user(userId):
+    async def mock_delete_user(session, userId):
         return None
 
     monkeypatch.setattr(users.crud, "delete_user", mock_delete_user)
@@ -313,7 +313,7 @@ def test14_get_user_recipes(monkeypatch, test_app):
     
     monkeypatch.setattr(users, "validate_token", mock_validate_token)
 
-    async def mock_get_user_recipes(userId):
+    async def mock_get_user_recipes(session, userId):
         return recipes
 
     monkeypatch.setattr(users.crud, "get_user_recipes", mock_get_user_recipes)
@@ -350,7 +350,7 @@ def test16_get_user_recipes_not_found(monkeypatch, test_app):
     
     monkeypatch.setattr(users, "validate_token", mock_validate_token)
 
-    async def mock_get_user_recipes(userId):
+    async def mock_get_user_recipes(session, userId):
         return None
     
     monkeypatch.setattr(users.crud, "get_user_recipes", mock_get_user_recipes)
@@ -379,7 +379,7 @@ def test17_get_user_ratings(monkeypatch, test_app):
     
     monkeypatch.setattr(users, "validate_token", mock_validate_token)
 
-    async def mock_get_user_ratings(userId):
+    async def mock_get_user_ratings(session, userId):
         return ratings
 
     monkeypatch.setattr(users.crud, "get_user_ratings", mock_get_user_ratings)
@@ -406,7 +406,7 @@ def test18_get_user_ratings_not_found(monkeypatch, test_app):
     
     monkeypatch.setattr(users, "validate_token", mock_validate_token)
     
-    async def mock_get_user_ratings(userId):
+    async def mock_get_user_ratings(session, userId):
         return None
 
     monkeypatch.setattr(users.crud, "get_user_ratings", mock_get_user_ratings)